@@ -0,0 +1,127 @@
+"""
+Deterministic stand-ins for the paid and remote parts of the pipeline, so benchmarks measure only
+this project's own overhead: a canned-answer chat model, a hashing embedder, a stub script
+executor and a synthetic documentation corpus.
+"""
+import hashlib
+import random
+import re
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+FAKE_EMBEDDING_DIMENSIONS = 256
+FAKE_EMBEDDING_MODEL = f"fake-hashing-{FAKE_EMBEDDING_DIMENSIONS}"
+
+_WORD_RE = re.compile(r"[A-Za-z0-9_]+")
+
+# Vocabulary of the synthetic corpus: real task names plus filler, so BM25 and the hashing
+# embedder see a realistic mix of rare identifiers and common words.
+_TASK_NAMES = ["SleepTask", "RandomSleepTask", "ShellCommand", "Ping", "OoklaSpeedtest", "NDT7SpeedTest",
+               "CloudflareSpeedTest", "StartCapture", "StopNamedCapture", "DummyTask", "Traceroute", "Iperf3Client"]
+_WORDS = ("pipeline experiment node task result deployment status prepare execute capture network latency "
+          "throughput server client environment docker shell command timeout interval measurement report "
+          "bandwidth packet interface filter upload download target host count duration flag").split()
+
+FAKE_SCRIPT = '''```python
+import time
+from pprint import pprint
+from netunicorn.client.remote import RemoteClient
+from netunicorn.base.experiment import Experiment, ExperimentStatus
+from netunicorn.base.pipeline import Pipeline
+from netunicorn.library.tasks.basic import SleepTask
+
+client = RemoteClient(endpoint="http://dry-run.invalid", login="dry-run", password="dry-run")
+pipeline = Pipeline().then(SleepTask(5))
+working_nodes = client.get_nodes().take(1)
+experiment = Experiment().map(pipeline, working_nodes)
+experiment_name = "nl4nu_benchmark"
+print(f"Preparing experiment: {experiment_name}")
+client.prepare_experiment(experiment, experiment_name)
+print(f"Starting execution of {experiment_name}")
+client.start_execution(experiment_name)
+while client.get_experiment_status(experiment_name).status != ExperimentStatus.FINISHED:
+    time.sleep(5)
+print(f"Final experiment status: {client.get_experiment_status(experiment_name).status}")
+```'''
+
+
+def make_fake_chat_model() -> FakeListChatModel:
+    """Chat model that answers every prompt (initial or retry) with the same valid script."""
+    return FakeListChatModel(responses=[FAKE_SCRIPT])
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Feature-hashing bag-of-words embedder: each word adds +-1 to a hashed dimension and the vector
+    is L2-normalized. Deterministic, dependency-free and fast, with similarity that still tracks
+    word overlap, so FAISS search over it behaves like a (weak) real embedding.
+    """
+
+    def __init__(self, dimensions: int = FAKE_EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in _WORD_RE.findall(text.lower()):
+            digest = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dimensions] += 1.0 if digest >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class StubScriptExecutor:
+    """
+    Drop-in for ScriptExecutor that never starts a process. Runs cycle through `fail_attempts`
+    failures with a recurring traceback followed by one success, so with max_retries >= fail_attempts
+    every generation walks the whole feedback loop without any execution time.
+    """
+
+    FAILURE_STDERR = ("Traceback (most recent call last):\n"
+                      '  File "nu_script.py", line 20, in <module>\n'
+                      "    pprint.pprint(processed_value)\n"
+                      "AttributeError: 'function' object has no attribute 'pprint'\n")
+
+    def __init__(self, fail_attempts: int = 0):
+        self.fail_attempts = fail_attempts
+        self.runs = 0
+
+    def run_script(self, script_content: str, script_filepath: str = None, cancel_event=None) -> dict:
+        self.runs += 1
+        failed = (self.runs - 1) % (self.fail_attempts + 1) < self.fail_attempts
+        return {
+            "success": not failed,
+            "stdout": "Preparing experiment: nl4nu_benchmark\nStarting execution of nl4nu_benchmark\n",
+            "stderr": self.FAILURE_STDERR if failed else "",
+            "filepath": script_filepath,
+            "exit_code": 1 if failed else 0,
+            "aborted_early": False,
+            "abort_reason": None,
+            "truncated": False,
+            "milestones": {},
+        }
+
+
+def synthetic_docs(count: int, seed: int = 0, words_per_doc: int = 95) -> List[dict]:
+    """
+    `count` documentation entries in the netunicorn_docs.json format. Each entry is ~900 characters,
+    just under CHUNK_SIZE, so the corpus splits into about one chunk per entry.
+    """
+    rng = random.Random(seed)
+    docs = []
+    for index in range(count):
+        task = rng.choice(_TASK_NAMES)
+        module = f"netunicorn.library.tasks.synthetic.group_{index % 97}"
+        words = " ".join(rng.choice(_WORDS) for _ in range(words_per_doc))
+        content = (f"## {task}{index}\n`from {module} import {task}{index}`\n"
+                   f"`{task}{index}(name=\"{task.lower()}_{index}\", timeout={rng.randint(1, 600)})` {words}")
+        docs.append({"source": f"synthetic/{task.lower()}_{index}", "content": content})
+    return docs
@@ -0,0 +1,305 @@
+"""
+Offline benchmarks of the project's own overhead: no API calls, no NetUnicorn endpoint.
+
+    python -m benchmarks.run_benchmarks                   # full run, scales 28 .. 100k documents
+    python -m benchmarks.run_benchmarks --quick           # scales 28 and 1000 only
+    python -m benchmarks.run_benchmarks --only index --scales 1000000 --index_type hnsw
+    python -m benchmarks.run_benchmarks --baseline benchmarks/results/<earlier>.json
+    python -m benchmarks.run_benchmarks --compare OLD.json NEW.json
+
+Chat and embedding models are the deterministic fakes in benchmarks/fakes.py and scripts go to a
+stub executor, so the numbers cover import/startup, index build and load, retrieval and the
+feedback-loop orchestration only. Each index scale and the orchestration run execute in a fresh
+spawned process, so their peak RSS is measured in isolation. Results are written as JSON to
+benchmarks/results/ and can be compared against a baseline; a comparison exits with status 1
+when a timing or memory metric regressed beyond the threshold.
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from nl4netunicorn_llm.src.vector_index import parse_index_params
+
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+REAL_DOCS_PATH = os.path.join(PROJECT_ROOT, "nl4netunicorn_llm", "data", "netunicorn_docs.json")
+
+DEFAULT_SCALES = [28, 1000, 10000, 100000]
+QUICK_SCALES = [28, 1000]
+RETRIEVAL_MODES = ["lexical", "vector", "hybrid"]
+# A metric regresses when it grows by more than this fraction and by more than the absolute floor.
+REGRESSION_THRESHOLD = 0.25
+REGRESSION_FLOOR = {"_s": 0.002, "_mb": 5.0}
+
+QUERIES = [
+    "Run a ping to 8.8.8.8 with 5 packets on two nodes",
+    "Measure download speed with OoklaSpeedtest",
+    "Capture packets with tcpdump while running a shell command",
+    "Sleep for a random time between 1 and 5 seconds on every node",
+    "Run CloudflareSpeedTest and print the results",
+    "Run traceroute to example.com from one node in a docker environment",
+    "Start a capture, run NDT7SpeedTest, then stop the named capture",
+    "Execute the shell command 'uname -a' with a timeout of 30 seconds",
+]
+PROMPT = "Create a NetUnicorn script that selects one available node and runs a sleep task for 5 seconds."
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _latency_summary(durations: List[float]) -> Dict[str, float]:
+    durations = sorted(durations)
+
+    def nearest_rank(fraction: float) -> float:
+        return durations[max(0, math.ceil(fraction * len(durations)) - 1)]
+
+    return {"count": len(durations), "p50_s": round(nearest_rank(0.5), 6), "p95_s": round(nearest_rank(0.95), 6),
+            "mean_s": round(sum(durations) / len(durations), 6)}
+
+
+def _timed(function: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    function()
+    return round(time.perf_counter() - started, 6)
+
+
+def _make_rag(workdir: str, docs_path: str, **kwargs):
+    """NetUnicornRAG wired to the fakes, writing every cache and script under `workdir`."""
+    # Dry-run mode supplies placeholder NetUnicorn credentials; the fake models need no real key.
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark-fake-key")
+    from benchmarks.fakes import FAKE_EMBEDDING_MODEL, HashingEmbeddings, make_fake_chat_model
+    from nl4netunicorn_llm.src.netunicorn_rag import NetUnicornRAG
+
+    rag = NetUnicornRAG(docs_path=docs_path, lazy=True, dry_run=True,
+                        generated_scripts_dir=os.path.join(workdir, "generated_scripts"),
+                        index_cache_dir=os.path.join(workdir, "index_cache"),
+                        embedding_model=FAKE_EMBEDDING_MODEL, embeddings=HashingEmbeddings(),
+                        chat_model=make_fake_chat_model(), **kwargs)
+    rag.feedback_attempts_path = os.path.join(workdir, "feedback_attempts")
+    rag.llm_cache_path = os.path.join(workdir, "llm_cache", "responses.sqlite3")
+    rag.fix_cache_path = os.path.join(workdir, "llm_cache", "fixes.sqlite3")
+    return rag
+
+
+def bench_startup(repeats: int) -> Dict[str, Any]:
+    """Cold-process import of netunicorn_rag and lazy NetUnicornRAG construction, median of `repeats` runs."""
+    probe = (
+        "import json, os, time\n"
+        "started = time.perf_counter()\n"
+        "import nl4netunicorn_llm.src.netunicorn_rag\n"
+        "imported = time.perf_counter()\n"
+        "import tempfile\n"
+        "from benchmarks.run_benchmarks import _make_rag, REAL_DOCS_PATH\n"
+        "rag = _make_rag(tempfile.mkdtemp(prefix='nl4nu_bench_'), REAL_DOCS_PATH)\n"
+        "print(json.dumps({'import_s': imported - started, 'construct_lazy_s': time.perf_counter() - imported}))\n"
+    )
+    samples: Dict[str, List[float]] = {"import_s": [], "construct_lazy_s": [], "process_wall_s": []}
+    for _ in range(repeats):
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", probe], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+        samples["process_wall_s"].append(time.perf_counter() - started)
+        for key, value in json.loads(completed.stdout.strip().splitlines()[-1]).items():
+            samples[key].append(value)
+    return {key: round(sorted(values)[len(values) // 2], 6) for key, values in samples.items()}
+
+
+def bench_index(scale: int, query_repeats: int, seed: int, index_type: str = "flat",
+                index_params: Dict[str, int] = None) -> Dict[str, Any]:
+    """Index build, cached index load and retrieval latency per mode for a corpus of `scale` documents."""
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    from benchmarks.fakes import synthetic_docs
+
+    workdir = tempfile.mkdtemp(prefix=f"nl4nu_bench_{scale}_")
+    if scale == 28:
+        docs_path = REAL_DOCS_PATH
+    else:
+        docs_path = os.path.join(workdir, "docs.json")
+        with open(docs_path, "w", encoding="utf-8") as f:
+            json.dump(synthetic_docs(scale, seed=seed), f)
+
+    rag = _make_rag(workdir, docs_path, index_type=index_type, index_params=index_params)
+    result: Dict[str, Any] = {"documents": scale}
+    result["load_documents_s"] = _timed(lambda: rag.docs)
+    result["split_s"] = _timed(lambda: rag.chunks)
+    result["chunks"] = len(rag.chunks)
+    result["lexical_index_build_s"] = _timed(lambda: rag.lexical_index)
+    result["vector_index_build_s"] = _timed(lambda: rag.vector_store)
+
+    reloaded = _make_rag(workdir, docs_path, index_type=index_type, index_params=index_params)
+    reloaded.docs
+    result["vector_index_load_s"] = _timed(lambda: reloaded.vector_store)
+
+    retrieval = {}
+    for mode in RETRIEVAL_MODES:
+        rag.retrieval_mode = mode
+        rag.retrieve(QUERIES[0])  # warm-up (query embedding paths, lazy imports)
+        retrieval[mode] = _latency_summary([_timed(lambda query=query: rag.retrieve(query))
+                                            for _ in range(query_repeats) for query in QUERIES])
+    result["retrieval"] = retrieval
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def bench_orchestration(prompts: int, fail_attempts: int) -> Dict[str, Any]:
+    """
+    Full generate_code runs against the fake chat model and a stub executor that fails
+    `fail_attempts` times per prompt, so every retry path runs but no time goes to an LLM or a script.
+    """
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    from benchmarks.fakes import StubScriptExecutor
+    from nl4netunicorn_llm.src.spans import phase_percentiles
+
+    workdir = tempfile.mkdtemp(prefix="nl4nu_bench_orchestration_")
+    # Templates and the response cache would skip the LLM path this benchmark is meant to measure.
+    rag = _make_rag(workdir, REAL_DOCS_PATH, use_templates=False, use_llm_cache=False)
+    rag.script_executor = StubScriptExecutor(fail_attempts=fail_attempts)
+    # Build the index and chains up front; the index benchmark measures those.
+    rag.retrieve(PROMPT)
+    rag.initial_docs_chain
+    rag.feedback_docs_chain
+
+    durations, attempts, spans = [], 0, []
+    for index in range(prompts):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = rag.generate_code(PROMPT, save_final_script=False, max_retries=fail_attempts,
+                                       work_tag=f"bench_{index:03d}")
+        durations.append(time.perf_counter() - started)
+        attempts += len(result["report_log"])
+        spans.extend(result["spans"])
+    return {
+        "prompts": prompts,
+        "attempts": attempts,
+        "per_prompt": _latency_summary(durations),
+        "per_attempt_s": round(sum(durations) / attempts, 6),
+        "phases": {name: {"p50_s": stats["p50_s"], "p95_s": stats["p95_s"]} for name, stats in phase_percentiles(spans).items()},
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _in_fresh_process(function: Callable, *args) -> Dict[str, Any]:
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(function, *args).result()
+
+
+def _git_revision() -> Dict[str, Any]:
+    def git(*args: str) -> str:
+        return subprocess.run(["git", *args], cwd=PROJECT_ROOT, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "--short", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def flatten_metrics(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Numeric timing (`*_s`) and memory (`*_mb`) leaves as {"index.1000.retrieval.hybrid.p95_s": value}."""
+    metrics = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            metrics.update(flatten_metrics(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and name.endswith(tuple(REGRESSION_FLOOR)):
+            metrics[name] = float(value)
+    return metrics
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Prints old/new/ratio for every shared metric and returns the names of the regressed ones."""
+    old, new = flatten_metrics(baseline["benchmarks"]), flatten_metrics(current["benchmarks"])
+    print(f"Comparing {baseline['meta'].get('commit')} -> {current['meta'].get('commit')} (threshold +{threshold:.0%})")
+    regressions = []
+    for name in sorted(set(old) & set(new)):
+        ratio = new[name] / old[name] if old[name] else float("inf") if new[name] else 1.0
+        floor = next(value for suffix, value in REGRESSION_FLOOR.items() if name.endswith(suffix))
+        regressed = ratio > 1 + threshold and new[name] - old[name] > floor
+        if regressed:
+            regressions.append(name)
+        print(f"  {'REGRESSED ' if regressed else ''}{name}: {old[name]:.6g} -> {new[name]:.6g} ({ratio:.2f}x)")
+    print(f"{len(regressions)} regression(s).")
+    return regressions
+
+
+def run(scales: List[int], only: List[str], query_repeats: int, repeats: int, prompts: int,
+        fail_attempts: int, seed: int, index_type: str = "flat", index_params: Dict[str, int] = None) -> Dict[str, Any]:
+    benchmarks: Dict[str, Any] = {}
+    if "startup" in only:
+        print("Benchmarking startup...")
+        benchmarks["startup"] = bench_startup(repeats)
+    if "index" in only:
+        benchmarks["index"] = {}
+        for scale in scales:
+            print(f"Benchmarking index build and retrieval with {scale} documents...")
+            benchmarks["index"][str(scale)] = _in_fresh_process(bench_index, scale, query_repeats, seed, index_type, index_params)
+    if "orchestration" in only:
+        print("Benchmarking feedback-loop orchestration...")
+        benchmarks["orchestration"] = _in_fresh_process(bench_orchestration, prompts, fail_attempts)
+    meta = {"generated": datetime.now().isoformat(), **_git_revision(), "python": platform.python_version(),
+            "platform": platform.platform(), "cpu_count": os.cpu_count(), "scales": scales, "seed": seed,
+            "query_repeats": query_repeats, "index_type": index_type, "index_params": index_params or {}}
+    return {"meta": meta, "benchmarks": benchmarks}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Offline benchmarks with fake LLM, fake embedder and stub executor')
+    parser.add_argument('--quick', dest='quick', help=f'Only scales {QUICK_SCALES}', action='store_true')
+    parser.add_argument('--scales', dest='scales', help='Comma-separated corpus sizes in documents (28 = the real docs)', type=str)
+    parser.add_argument('--only', dest='only', help='Comma-separated subset of: startup, index, orchestration', type=str, default='startup,index,orchestration')
+    parser.add_argument('--query_repeats', dest='query_repeats', help='Times each query is repeated per retrieval mode', type=int, default=5)
+    parser.add_argument('--repeats', dest='repeats', help='Cold-process startup samples', type=int, default=5)
+    parser.add_argument('--prompts', dest='prompts', help='generate_code runs in the orchestration benchmark', type=int, default=20)
+    parser.add_argument('--fail_attempts', dest='fail_attempts', help='Failed attempts per prompt before the stub executor succeeds', type=int, default=2)
+    parser.add_argument('--index_type', dest='index_type', help='FAISS index of the index benchmark: flat, ivf or hnsw', choices=['flat', 'ivf', 'hnsw'], default='flat')
+    parser.add_argument('--index_params', dest='index_params', help='Index parameters, e.g. "nprobe=32" or "ef_search=128"', type=parse_index_params)
+    parser.add_argument('--seed', dest='seed', help='Seed of the synthetic corpus', type=int, default=0)
+    parser.add_argument('-o', '--out', dest='out', help='Results JSON path (default: benchmarks/results/<timestamp>_<commit>.json)', type=str)
+    parser.add_argument('--baseline', dest='baseline', help='Results JSON to compare this run against', type=str)
+    parser.add_argument('--compare', dest='compare', help='Compare two results files without running anything', nargs=2, metavar=('OLD', 'NEW'))
+    parser.add_argument('--threshold', dest='threshold', help='Relative growth counted as a regression', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.compare[1], "r", encoding="utf-8") as f:
+            current = json.load(f)
+        sys.exit(1 if compare(baseline, current, args.threshold) else 0)
+
+    scales = [int(scale) for scale in args.scales.split(",")] if args.scales else (QUICK_SCALES if args.quick else DEFAULT_SCALES)
+    only = [name.strip() for name in args.only.split(",")]
+    results = run(scales, only, args.query_repeats, args.repeats, args.prompts, args.fail_attempts, args.seed,
+                  args.index_type, args.index_params)
+
+    out_path = args.out or os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{results['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results["benchmarks"], indent=2))
+    print(f"Results saved to: {out_path}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        sys.exit(1 if compare(baseline, results, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
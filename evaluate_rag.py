@@ -1,7 +1,14 @@
 import re
 from nl4netunicorn_llm.src.netunicorn_rag import NetUnicornRAG
+from nl4netunicorn_llm.src.rag_options import add_rag_arguments, rag_from_args
+from nl4netunicorn_llm.src.rag_service import RAGServiceClient
+from nl4netunicorn_llm.src.spans import format_phase_table, phase_percentiles, recording, write_jsonl, write_prometheus
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import os
+import json
+import time
+import threading
 import argparse
 
 OUTPUT_DIR = "evaluation_reports"
@@ -20,57 +27,202 @@ def parse_prompts(file_path: str) -> list[str]:
     return prompts
 
 
-def evaluate_rag(rag: NetUnicornRAG, prompts: list[str], out_path: str, save_script: bool, feedback_loop: bool, retries):
+def evaluate_prompt(rag: NetUnicornRAG, index: int, prompt: str, save_script: bool, feedback_loop: bool, retries) -> dict:
+    """
+    Runs retrieval logging and code generation for one prompt.
+    Each prompt gets its own work tag so concurrent workers never share script paths.
+    Timing spans of the retrieval and the generation are collected in entry["spans"].
+    """
+    started = time.perf_counter()
+    spans = []
+    entry = {
+        "index": index,
+        "prompt": prompt,
+        "worker": threading.current_thread().name,
+        "retrieved_context": None,
+        "retrieved_chunk_ids": [],
+        "success": False,
+        "final_code": None,
+        "final_script_path": None,
+        "error": None,
+        "spans": spans,
+    }
+    try:
+        # One retrieval per prompt, shared by the report and every generation attempt.
+        with recording(spans):
+            retrieved_docs = rag.retrieve(prompt)
+    except Exception as e:
+        entry["retrieved_context"] = f"Error retrieving documents: {e}"
+        entry["error"] = f"{e}"
+        entry["duration_s"] = round(time.perf_counter() - started, 3)
+        return entry
+    entry["retrieved_context"] = rag.log_retrieved_chunks(prompt, k=3, retrieved_docs=retrieved_docs)
+    kwargs = {
+        "user_prompt": prompt,
+        "retrieved_docs": retrieved_docs,
+        "save_final_script": save_script,
+        "enable_feedback_loop": feedback_loop,
+        "work_tag": f"prompt_{index:03d}",
+    }
+    if retries:
+        kwargs["max_retries"] = retries
+    try:
+        with recording(spans):
+            result = rag.generate_code(**kwargs)
+        entry["success"] = result.get("success", False)
+        entry["final_code"] = result.get("final_code", "")
+        entry["final_script_path"] = result.get("final_script_path")
+        entry["attempts"] = len(result.get("report_log", []))
+        entry["retrieved_chunk_ids"] = result.get("retrieved_chunk_ids", [])
+        entry["generation_source"] = result.get("generation_source")
+    except Exception as e:
+        entry["error"] = f"{e}"
+    entry["duration_s"] = round(time.perf_counter() - started, 3)
+    return entry
+
+
+def evaluate_prompt_remote(client: RAGServiceClient, index: int, prompt: str, save_script: bool, feedback_loop: bool, retries) -> dict:
+    """
+    evaluate_prompt against a running RAG service: the service retrieves once, logs the context
+    and generates, and the entry gets the same fields (spans come back with the result).
+    """
+    started = time.perf_counter()
+    entry = {
+        "index": index,
+        "prompt": prompt,
+        "worker": threading.current_thread().name,
+        "retrieved_context": None,
+        "retrieved_chunk_ids": [],
+        "success": False,
+        "final_code": None,
+        "final_script_path": None,
+        "error": None,
+        "spans": [],
+    }
+    try:
+        result = client.generate(prompt, save_final_script=save_script, enable_feedback_loop=feedback_loop,
+                                 max_retries=retries or None, work_tag=f"prompt_{index:03d}", context_log=True)
+        entry["retrieved_context"] = result.get("retrieved_context") or ""
+        entry["success"] = result.get("success", False)
+        entry["final_code"] = result.get("final_code", "")
+        entry["final_script_path"] = result.get("final_script_path")
+        entry["attempts"] = len(result.get("report_log", []))
+        entry["retrieved_chunk_ids"] = result.get("retrieved_chunk_ids", [])
+        entry["generation_source"] = result.get("generation_source")
+        entry["spans"] = result.get("spans", [])
+        entry["service"] = result.get("service")
+    except Exception as e:
+        entry["retrieved_context"] = entry["retrieved_context"] or f"Error retrieving documents: {e}"
+        entry["error"] = f"{e}"
+    entry["duration_s"] = round(time.perf_counter() - started, 3)
+    return entry
+
+
+def write_markdown_report(entries: list[dict], out_path: str, concurrency: int, wall_time: float):
     with open(out_path, "w") as f:
         f.write(f"# NetUnicorn RAG Evaluation Report\n")
-        f.write(f"Generated: {datetime.now().isoformat()}\n\n")
+        f.write(f"Generated: {datetime.now().isoformat()}\n")
+        f.write(f"Concurrency: {concurrency}, wall time: {wall_time:.1f}s\n\n")
+
+        for entry in entries:
+            f.write(f"Prompt: {entry['prompt']}\n\n")
 
-        for prompt in prompts:
-            f.write(f"Prompt: {prompt}\n\n")
-        
             f.write("### Retrieved Context:\n")
-            chunk_log = rag.log_retrieved_chunks(prompt, k=3)
-            f.write(chunk_log + "\n")
-
-            # Generate code
-            try:
-                if retries:
-                    code = rag.generate_code(
-                        user_prompt=prompt,
-                        save_final_script=save_script,
-                        enable_feedback_loop=feedback_loop,
-                        max_retries=retries
-                        )
-                else:
-                    code = rag.generate_code(
-                        user_prompt=prompt,
-                        save_final_script=save_script,
-                        enable_feedback_loop=feedback_loop
-                        )
-                f.write("### Generated Code:\n")
-                f.write("```python\n" + code + "\n```\n\n")
-            except Exception as e:
-                f.write(f"Error generating code: {e}\n\n")
+            f.write(entry["retrieved_context"] + "\n")
+
+            if entry["error"]:
+                f.write(f"Error generating code: {entry['error']}\n\n")
+            else:
+                f.write(f"### Generated Code (success: {entry['success']}, {entry['duration_s']}s):\n")
+                f.write("```python\n" + (entry["final_code"] or "") + "\n```\n\n")
 
             f.write("---\n\n")
 
-if __name__ == "__main__":
-    rag = NetUnicornRAG()
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    out_file = f"{OUTPUT_DIR}/rag_eval_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
 
+def evaluate_rag(rag: NetUnicornRAG | RAGServiceClient, prompts: list[str], out_path: str, save_script: bool, feedback_loop: bool, retries, concurrency: int = 1) -> list[dict]:
+    """
+    Evaluates all prompts with up to `concurrency` prompts in flight at once and writes the
+    Markdown report to `out_path` plus a JSON report next to it. Both are in prompt order
+    regardless of completion order. The timing spans of all prompts are written next to it as
+    JSON lines (.spans.jsonl) and Prometheus text (.prom), and p50/p95 per phase are printed.
+    With a RAGServiceClient the prompts are sent to the service, whose queue bounds the concurrency.
+    """
+    concurrency = max(1, concurrency)
+    remote = isinstance(rag, RAGServiceClient)
+    evaluate = evaluate_prompt_remote if remote else evaluate_prompt
+    if concurrency > 1 and not remote:
+        # Build the shared indexes and chains once, before workers race to do it. Lexical mode
+        # never touches the vector store (or the embeddings).
+        rag.lexical_index
+        if rag.retrieval_mode != "lexical":
+            rag.vector_store
+        rag.initial_docs_chain
+        rag.feedback_docs_chain
+        if rag.retry_mode == "patch":
+            rag.patch_docs_chain
+
+    started = time.perf_counter()
+    entries: list[dict] = [None] * len(prompts)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="eval_worker") as pool:
+        futures = {
+            pool.submit(evaluate, rag, index, prompt, save_script, feedback_loop, retries): index
+            for index, prompt in enumerate(prompts)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            entries[index] = future.result()
+            print(f"[{sum(e is not None for e in entries)}/{len(prompts)}] Finished prompt {index}: success={entries[index]['success']}")
+    wall_time = time.perf_counter() - started
+
+    write_markdown_report(entries, out_path, concurrency, wall_time)
+    json_path = os.path.splitext(out_path)[0] + ".json"
+    with open(json_path, "w") as f:
+        json.dump({"generated": datetime.now().isoformat(), "concurrency": concurrency,
+                   "wall_time_s": round(wall_time, 3), "results": entries}, f, indent=2)
+    print(f"JSON report saved to: {json_path}")
+
+    all_spans = [record for entry in entries for record in entry["spans"]]
+    spans_path = os.path.splitext(out_path)[0] + ".spans.jsonl"
+    metrics_path = os.path.splitext(out_path)[0] + ".prom"
+    write_jsonl(all_spans, spans_path)
+    write_prometheus(all_spans, metrics_path)
+    print(f"Per-phase timings across {len(entries)} prompt(s):")
+    print(format_phase_table(phase_percentiles(all_spans)))
+    print(f"Timing spans saved to: {spans_path} (Prometheus metrics: {metrics_path})")
+    return entries
+
+if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Generating and Evaluating LLM-Generated Scripts')
     parser.add_argument('-i', '--input', dest='file', help='Prompts File: Each prompt should be in a new line', type=str, required=True)
     parser.add_argument('-s', '--save_script', dest='save_script', help='Disable saving the generated script in a file', action='store_false')
     parser.add_argument('-f', '--feedback_loop', dest='feedback_loop', help='Disable feedback loop', action='store_false')
     parser.add_argument('-r', '--retries', dest='retries', help='Max number of retries', type=int)
+    parser.add_argument('-c', '--concurrency', dest='concurrency', help='Number of prompts evaluated in parallel', type=int, default=1)
+    add_rag_arguments(parser)
+    parser.add_argument('--startup_report', dest='startup_report', help='Print import and component build times', action='store_true')
+    parser.add_argument('--server', dest='server', help='Send prompts to a running rag_server.py (http://host:port or unix:/path) instead of loading the RAG system here; RAG options are then the server\'s', type=str)
 
     args = parser.parse_args()
+    if args.server:
+        rag = RAGServiceClient(args.server)
+    else:
+        rag = rag_from_args(args)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    out_file = f"{OUTPUT_DIR}/rag_eval_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
     input_file = args.file
     save_script = args.save_script
     feedback_loop = args.feedback_loop
     retries = args.retries
 
     labeled_prompts = parse_prompts(input_file)
-    evaluate_rag(rag, labeled_prompts, out_file, save_script, feedback_loop, retries)
-    print(f"Evaluation saved to: {out_file}")
\ No newline at end of file
+    evaluate_rag(rag, labeled_prompts, out_file, save_script, feedback_loop, retries, concurrency=args.concurrency)
+    print(f"Evaluation saved to: {out_file}")
+    if args.server:
+        print(f"RAG service: {rag.health()}")
+    else:
+        if rag.llm_cache is not None:
+            print(f"LLM response cache: {rag.llm_cache.stats()}")
+        if rag.fix_cache is not None:
+            print(f"Fix cache: {rag.fix_cache.stats()}")
+        if args.startup_report:
+            print(rag.startup_report())
\ No newline at end of file
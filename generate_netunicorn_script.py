@@ -9,13 +9,17 @@ project_root = os.path.dirname(os.path.dirname(current_dir))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from nl4netunicorn_llm.src.netunicorn_rag import NetUnicornRAG
+from nl4netunicorn_llm.src.rag_options import add_rag_arguments, rag_from_args
+from nl4netunicorn_llm.src.rag_service import RAGServiceClient, RAGServiceError
+from nl4netunicorn_llm.src.spans import format_phase_table, phase_percentiles, write_jsonl, write_prometheus
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 def print_results(result_dict):
     logger.info(f"Overall Success: {result_dict.get('success')}")
+    if result_dict.get("generation_source"):
+        logger.info(f"Initial script source: {result_dict['generation_source']}")
     logger.info(f"Final Generated Code:\n{result_dict.get('final_code')}")
     final_script_path = result_dict.get('final_script_path')
     if final_script_path:
@@ -40,37 +44,83 @@ def print_results(result_dict):
                 logger.info(f"    STDERR: {stderr[:200]}{'...' if len(stderr) > 200 else ''}")
         elif not entry.get('error_in_generation') and not entry.get('error_in_regeneration'):
             logger.info("    Execution Result: Not available (Code may not have been run due to prior error or configuration)")
+    stream_timings = result_dict.get("stream_timings")
+    if stream_timings and stream_timings.get("time_to_first_output") is not None:
+        syntax = "OK" if not stream_timings.get("syntax_error") else f"error: {stream_timings['syntax_error']}"
+        logger.info(f"Time to first output: {stream_timings['time_to_first_output']:.2f}s, "
+                    f"time to validation: {stream_timings['time_to_validation']:.2f}s (syntax {syntax})")
+    if result_dict.get("llm_cache_stats"):
+        logger.info(f"LLM Response Cache: {result_dict['llm_cache_stats']}")
+    if result_dict.get("fix_cache_stats"):
+        logger.info(f"Fix Cache: {result_dict['fix_cache_stats']}")
+    if result_dict.get("spans"):
+        logger.info("Per-phase timings:\n" + format_phase_table(phase_percentiles(result_dict["spans"])))
     logger.info("-------------------------------------------")
 
+def stream_code(chunk):
+    sys.stdout.write(chunk)
+    sys.stdout.flush()
+
+def generate_locally(args):
+    """Builds the RAG system in this process and generates the script. Returns (results, rag_system)."""
+    logger.info("Initializing NetUnicornRAG system...")
+    rag_system = rag_from_args(args)
+    prompt = args.prompt
+    save_script = args.save_script
+    feedback_loop = args.feedback_loop
+    retries = args.retries
+    on_code_chunk = stream_code if args.stream else None
+    if not retries:
+        results = rag_system.generate_code(
+            user_prompt=prompt,
+            save_final_script=save_script,
+            enable_feedback_loop=feedback_loop,
+            on_code_chunk=on_code_chunk
+        )
+    else:
+        results = rag_system.generate_code(
+            user_prompt=prompt,
+            save_final_script=save_script,
+            enable_feedback_loop=feedback_loop,
+            max_retries=retries,
+            on_code_chunk=on_code_chunk
+        )
+    return results, rag_system
+
 def main():
     try:
-        logger.info("Initializing NetUnicornRAG system...")
-        rag_system = NetUnicornRAG()
         parser = argparse.ArgumentParser(description='Generate netUnicorn Script')
         parser.add_argument('-p', '--prompt', dest='prompt', help='Prompt', type=str, required=True)
         parser.add_argument('-s', '--save_script', dest='save_script', help='Disable saving the generated script in a file', action='store_false')
         parser.add_argument('-f', '--feedback_loop', dest='feedback_loop', help='Disable feedback loop', action='store_false')
         parser.add_argument('-r', '--retries', dest='retries', help='Max number of retries', type=int)
+        add_rag_arguments(parser)
+        parser.add_argument('--no_stream', dest='stream', help='Do not print generated code while the model writes it', action='store_false')
+        parser.add_argument('--spans_out', dest='spans_out', help='Write the per-phase timing spans to this file as JSON lines', type=str)
+        parser.add_argument('--metrics_out', dest='metrics_out', help='Write the per-phase timings to this file in Prometheus text format', type=str)
+        parser.add_argument('--startup_report', dest='startup_report', help='Print import and component build times', action='store_true')
+        parser.add_argument('--server', dest='server', help='Send the request to a running rag_server.py (http://host:port or unix:/path) instead of loading the RAG system here; RAG options are then the server\'s', type=str)
 
         args = parser.parse_args()
-        prompt = args.prompt
-        save_script = args.save_script
-        feedback_loop = args.feedback_loop
-        retries = args.retries
-        if not retries:
-            results = rag_system.generate_code(
-                user_prompt=prompt,
-                save_final_script=save_script,
-                enable_feedback_loop=feedback_loop
-            )
+        rag_system = None
+        if args.server:
+            logger.info(f"Sending request to RAG service at {args.server}...")
+            results = RAGServiceClient(args.server).generate(args.prompt,
+                                                             save_final_script=args.save_script,
+                                                             enable_feedback_loop=args.feedback_loop,
+                                                             max_retries=args.retries or None)
+            logger.info(f"Service timing: {results.get('service')}")
         else:
-            results = rag_system.generate_code(
-                user_prompt=prompt,
-                save_final_script=save_script,
-                enable_feedback_loop=feedback_loop,
-                max_retries=retries
-            )
+            results, rag_system = generate_locally(args)
         print_results(results)
+        if args.spans_out:
+            write_jsonl(results.get("spans", []), args.spans_out)
+            logger.info(f"Timing spans saved to: {args.spans_out}")
+        if args.metrics_out:
+            write_prometheus(results.get("spans", []), args.metrics_out)
+            logger.info(f"Prometheus metrics saved to: {args.metrics_out}")
+        if args.startup_report and rag_system is not None:
+            logger.info(rag_system.startup_report())
         # # Test Case 1: Feedback loop with default retries (3)
         # logger.info("\n--- Example 1: Generating with Feedback Loop (default max_retries=3) ---")
         # prompt1 = "Create a NetUnicorn script that connects to the server, selects one available node, and runs a sleep task for 10 seconds. Ensure all results are printed."
@@ -114,6 +164,8 @@ def main():
         logger.error(f"ERROR: A required file was not found. {e}. Please ensure your .env file (in project root) and documentation JSON (e.g., nl4netunicorn_llm/data/netunicorn_docs.json) exist and paths are correct.")
         import traceback
         traceback.print_exc()
+    except RAGServiceError as e:
+        logger.error(f"{e}")
     except ValueError as e:
         logger.error(f"Configuration Error: {e}")
         import traceback
@@ -1,9 +1,11 @@
+from __future__ import annotations
+
 import argparse
+import functools
 import os
 import sys
 import logging
 from dotenv import load_dotenv
-import re
 
 # Ensure the project root is in the Python path
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -12,28 +14,61 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from nl4netunicorn_llm.src.netunicorn_rag import NetUnicornRAG
-from langchain_openai import ChatOpenAI
-from langchain_core.documents import Document
+from nl4netunicorn_llm.src.context_judge import ContextJudge, DEFAULT_JUDGE_MODEL
+from nl4netunicorn_llm.src.rag_service import RAGServiceClient, RAGServiceError
+from nl4netunicorn_llm.src.judge_batch import (JudgeResultStore, RateLimiter, format_score_summary, run_judge_batch,
+                                               summarize_scores, write_csv)
+from evaluate_rag import parse_prompts
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def format_retrieved_docs_for_judge(retrieved_docs: list[Document]) -> str:
-    """Formats retrieved documents for presentation to the LLM judge."""
-    if not retrieved_docs:
-        return "No documents retrieved."
-    
-    formatted_output = []
-    for i, doc in enumerate(retrieved_docs):
-        source = doc.metadata.get('source', 'unknown source')
-        content_preview = doc.page_content.strip().replace('\n', ' ')
-        formatted_output.append(f"Chunk {i+1} (Source: {source}):\n{content_preview}\n---")
-    return "\n".join(formatted_output)
+def print_judgement(prompt: str, num_chunks: int, judge_model_name: str, judgement: dict):
+    scores = judgement["scores"] if judgement["scores"] is not None else "No scores found in the response."
+    print("\n" + "="*80)
+    print("LLM JUDGE CONTEXT APTNESS EVALUATION")
+    print("="*80)
+    print(f"\nOriginal User Prompt:\n---\n{prompt}\n---")
+    print(f"\nRetrieved Context (Top {num_chunks} chunks shown to judge):\n---\n{judgement['context']}\n---")
+    print(f"\nLLM Judge's Assessment (Model: {judge_model_name}):\n---\n{judgement['assessment']}\n---")
+    print("="*80)
+    print(f"\nScores:\n---\n{scores}\n---")
+
+def judge_prompts_file(args, rag_system: NetUnicornRAG, judge: ContextJudge):
+    """Batch mode: judges every prompt of args.prompts_file with one retriever, resuming from args.out."""
+    prompts = parse_prompts(args.prompts_file)
+    out_path = args.out
+    csv_path = args.csv_out or os.path.splitext(out_path)[0] + ".csv"
+    store = JudgeResultStore(out_path)
+    batch = run_judge_batch(prompts,
+                            retrieve=functools.partial(rag_system.retrieve, k=args.num_chunks),
+                            chunk_id=NetUnicornRAG._chunk_id,
+                            judge=judge,
+                            store=store,
+                            k=args.num_chunks,
+                            concurrency=args.concurrency,
+                            rate_limiter=RateLimiter(args.rate_limit),
+                            rejudge=args.rejudge)
+    write_csv(batch["records"], csv_path)
+    print("\n" + "="*80)
+    print(f"LLM JUDGE BATCH ({len(prompts)} prompts, model: {judge.model_name}, top {args.num_chunks} chunks)")
+    print("="*80)
+    print(f"Judged: {batch['judged']}, already judged (skipped): {batch['skipped']}, failed: {batch['failed']}, "
+          f"wall time: {batch['wall_time_s']:.1f}s")
+    print(f"\n{format_score_summary(summarize_scores(batch['records']))}")
+    print(f"\nJudgements appended to {out_path}; CSV written to {csv_path}")
 
 def main():
     parser = argparse.ArgumentParser(description="Evaluate RAG context aptness using an LLM judge.")
-    parser.add_argument("-p", "--prompt", type=str, required=True, help="The user's natural language prompt.")
+    prompt_source = parser.add_mutually_exclusive_group(required=True)
+    prompt_source.add_argument("-p", "--prompt", type=str, help="The user's natural language prompt.")
+    prompt_source.add_argument(
+        "-i",
+        "--prompts_file",
+        type=str,
+        help="Batch mode: judge every prompt of this file (one per line) with a single retriever."
+    )
     parser.add_argument(
         "--docs_path", 
         type=str, 
@@ -43,7 +78,7 @@ def main():
     parser.add_argument(
         "--judge_model_name", 
         type=str, 
-        default="gpt-3.5-turbo", # Sensible default
+        default=DEFAULT_JUDGE_MODEL, # Sensible default
         help="The model name for the LLM judge (e.g., gpt-3.5-turbo, gpt-4)."
     )
     parser.add_argument(
@@ -53,13 +88,65 @@ def main():
         default=3, 
         help="Number of top context chunks to retrieve and show to the judge."
     )
+    parser.add_argument(
+        "--retrieval_mode",
+        choices=["hybrid", "vector", "lexical"],
+        default="hybrid",
+        help="Context retrieval: hybrid (BM25 + vector), vector, or lexical (no embedding calls)."
+    )
+    parser.add_argument(
+        "--embedding_provider",
+        choices=["openai", "local"],
+        default="openai",
+        help="Embedding backend: openai, or local (CPU sentence-transformers, no network)."
+    )
+    parser.add_argument("--startup_report", action="store_true", help="Print import and component build times.")
+    parser.add_argument(
+        "--server",
+        type=str,
+        help="Send the request to a running rag_server.py (http://host:port or unix:/path) instead of loading the RAG system here; retrieval options are then the server's."
+    )
+    
+    parser.add_argument(
+        "--out",
+        type=str,
+        default="judge_results/judgements.jsonl",
+        help="Batch mode: JSON lines file judgements are appended to; prompts already judged there with the same chunks and model are skipped."
+    )
+    parser.add_argument("--csv_out", type=str, help="Batch mode: CSV of the judgements (default: --out with a .csv extension).")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Batch mode: judge calls in flight at once.")
+    parser.add_argument(
+        "--rate_limit",
+        type=float,
+        default=0,
+        help="Batch mode: at most this many judge calls per minute (0 = no limit)."
+    )
+    parser.add_argument("--rejudge", action="store_true", help="Batch mode: judge every prompt again, ignoring earlier judgements in --out.")
     
     args = parser.parse_args()
+    if args.server and args.prompts_file:
+        parser.error("--prompts_file runs the retriever locally and cannot be combined with --server.")
+    if args.prompts_file and not os.path.isfile(args.prompts_file):
+        parser.error(f"Prompts file not found: {args.prompts_file}")
 
     logger.info("Starting context aptness evaluation...")
-    logger.info(f"User Prompt: {args.prompt}")
+    if args.prompts_file:
+        logger.info(f"Prompts file: {args.prompts_file}")
+    else:
+        logger.info(f"User Prompt: {args.prompt}")
     logger.info(f"Number of chunks to retrieve: {args.num_chunks}")
     logger.info(f"LLM Judge Model: {args.judge_model_name}")
+    logger.info(f"Retrieval mode: {args.retrieval_mode}")
+
+    if args.server:
+        try:
+            judgement = RAGServiceClient(args.server).judge(args.prompt, k=args.num_chunks, judge_model_name=args.judge_model_name)
+        except RAGServiceError as e:
+            logger.error(f"{e}")
+            return
+        logger.info(f"Service timing: {judgement.get('service')}")
+        print_judgement(args.prompt, args.num_chunks, args.judge_model_name, judgement)
+        return
 
     # Load environment variables (e.g., OPENAI_API_KEY)
     # NetUnicornRAG constructor also calls load_dotenv, but good to ensure it's loaded.
@@ -83,81 +170,39 @@ def main():
             rag_docs_path = os.path.join(project_root, rag_docs_path)
         
         logger.info(f"Initializing NetUnicornRAG with docs path: {rag_docs_path}")
-        rag_system = NetUnicornRAG(docs_path=rag_docs_path)
+        # Only the retriever is needed here, so let the RAG system skip the LLM and chain setup
+        # (and the NetUnicorn credentials, as no script is run).
+        rag_system = NetUnicornRAG(docs_path=rag_docs_path, lazy=True, retrieval_mode=args.retrieval_mode,
+                                   embedding_provider=args.embedding_provider,
+                                   require_netunicorn_credentials=False)
+
+        if args.prompts_file:
+            judge = ContextJudge(args.judge_model_name, os.getenv("OPENAI_API_KEY"))
+            judge_prompts_file(args, rag_system, judge)
+            if args.startup_report:
+                print(rag_system.startup_report())
+            return
         
         # Retrieve context chunks
         logger.info(f"Retrieving top {args.num_chunks} context chunks for the prompt...")
-        retriever = rag_system.vector_store.as_retriever(search_kwargs={"k": args.num_chunks})
-        retrieved_docs = retriever.invoke(args.prompt) # Returns a list of Document objects
+        retrieved_docs = rag_system.retrieve(args.prompt, k=args.num_chunks) # Returns a list of Document objects
 
         if not retrieved_docs:
             logger.warning("No context chunks were retrieved for the given prompt.")
-            formatted_chunks_for_judge = "No documents retrieved."
         else:
             logger.info(f"Successfully retrieved {len(retrieved_docs)} chunks.")
-            formatted_chunks_for_judge = format_retrieved_docs_for_judge(retrieved_docs)
 
-        # Initialize the LLM Judge
+        # Initialize the LLM Judge and send the request
         logger.info(f"Initializing LLM Judge with model: {args.judge_model_name}...")
-        judge_llm = ChatOpenAI(
-            openai_api_key=os.getenv("OPENAI_API_KEY"), 
-            model_name=args.judge_model_name, 
-            temperature=0.1 # Low temperature for more deterministic evaluation
-        )
-
-        # Create the master prompt for the LLM Judge
-        judge_master_prompt = f"""
-You are an expert evaluator for Retrieval Augmented Generation (RAG) systems.
-Your task is to assess if the provided "Retrieved Context" is relevant, sufficient, and helpful for an LLM to generate a NetUnicorn script based on the "Original User Prompt".
-
-Original User Prompt:
----
-{args.prompt}
----
-
-Retrieved Context:
----
-{formatted_chunks_for_judge}
----
-
-Please provide your evaluation focusing on these aspects:
-1.  **Relevance**: Is each piece of context directly related to the user's request? Point out any irrelevant chunks.
-2.  **Sufficiency**: Does the context, as a whole, contain enough information for an LLM to successfully and completely address the user's prompt? Identify any key missing pieces of information that should have been retrieved.
-3.  **Helpfulness**: Overall, how helpful would this context be for an LLM to generate the correct NetUnicorn script? Would it guide the LLM effectively or potentially mislead it?
-4.  **Overall Assessment & Suggestions**: Concisely state if the retrieved context is Good, Adequate, or Poor. If not Good, suggest what kind of information is missing or what could be improved in the retrieval.
-
-
-Finally, end your evaluation with scores for each of the 4 aspects, on a scale of 0-5, where 0 is the worst and 5 is the best. For this, give the scores in the following format: 
-<scores>
-    Relevance: <score_1>
-    Sufficiency: <score_2>
-    Helpfulness: <score_3>
-    Overall: <score_4>
-</scores>
-
-Provide your evaluation as a structured response.
-"""
-        
+        judge = ContextJudge(args.judge_model_name, os.getenv("OPENAI_API_KEY"))
         logger.info("Sending request to LLM Judge...")
-        judge_assessment_response = judge_llm.invoke(judge_master_prompt)
-        judge_assessment = judge_assessment_response.content
-        extracted_scores = re.search(r'<scores>(.*?)</scores>', judge_assessment, re.DOTALL)
-        if extracted_scores:
-            scores = extracted_scores.group(1)
-        else:
-            scores = "No scores found in the response."
-
+        judgement = judge.judge(args.prompt, retrieved_docs)
         logger.info("Received assessment from LLM Judge.")
 
         # Print the results
-        print("\n" + "="*80)
-        print("LLM JUDGE CONTEXT APTNESS EVALUATION")
-        print("="*80)
-        print(f"\nOriginal User Prompt:\n---\n{args.prompt}\n---")
-        print(f"\nRetrieved Context (Top {args.num_chunks} chunks shown to judge):\n---\n{formatted_chunks_for_judge}\n---")
-        print(f"\nLLM Judge's Assessment (Model: {args.judge_model_name}):\n---\n{judge_assessment}\n---")
-        print("="*80)
-        print(f"\nScores:\n---\n{scores}\n---")
+        print_judgement(args.prompt, args.num_chunks, args.judge_model_name, judgement)
+        if args.startup_report:
+            print(rag_system.startup_report())
 
     except FileNotFoundError as e:
         logger.error(f"ERROR: A required file was not found. {e}. Ensure documentation JSON exists and paths are correct.")
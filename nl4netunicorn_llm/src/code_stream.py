@@ -0,0 +1,116 @@
+import time
+from typing import Callable, Dict, List, Optional
+
+FENCE = "```"
+
+
+class CodeStream:
+    """
+    Incremental version of stripping a Markdown code fence from an LLM answer. Chunks are fed as
+    they arrive; code is passed to `on_code` as soon as it can no longer be part of a fence line.
+    The opening fence line (e.g. ```python) is dropped, and everything from the closing fence (a
+    bare ``` line) on is ignored. Text before an opening fence is a preamble ("Here is the
+    script:") and is discarded. Until a fence arrives, text is held back because it may still
+    turn out to be a preamble; an answer without any fence is passed on as code at close(). The
+    syntax check runs the moment the closing fence arrives (or at close() if the answer had no
+    fence), not after the rest of the answer.
+    """
+
+    def __init__(self, on_code: Optional[Callable[[str], None]] = None, started_at: Optional[float] = None):
+        """
+        Args:
+            on_code: Optional callback invoked with each piece of code as it becomes available.
+            started_at: time.perf_counter() value the reported timings are relative to (default: now).
+        """
+        self.on_code = on_code
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.first_output_at: Optional[float] = None
+        self.validated_at: Optional[float] = None
+        self.syntax_error: Optional[str] = None
+        self._parts: List[str] = []
+        # Complete lines seen before any fence: a preamble if a fence follows, the code otherwise.
+        self._unfenced: List[str] = []
+        self._pending = ""
+        self._started = False
+        self._fenced = False
+        # True while the start of the current line was already emitted; only a line seen from its
+        # first character can be a fence.
+        self._mid_line = False
+        self._closed = False
+
+    def _emit(self, text: str) -> None:
+        if not text:
+            return
+        if self.first_output_at is None:
+            self.first_output_at = time.perf_counter()
+        self._parts.append(text)
+        if self.on_code:
+            self.on_code(text)
+
+    def _finish(self) -> None:
+        self._closed = True
+        self._pending = ""
+        try:
+            compile(self.code, "<generated script>", "exec")
+        except SyntaxError as e:
+            self.syntax_error = f"{e.msg} (line {e.lineno})"
+        self.validated_at = time.perf_counter()
+
+    def feed(self, chunk: str) -> None:
+        if self._closed or not chunk:
+            return
+        self._pending += chunk
+        if not self._started:
+            self._pending = self._pending.lstrip()
+            if not self._pending:
+                return
+            self._started = True
+
+        while "\n" in self._pending:
+            line, self._pending = self._pending.split("\n", 1)
+            if not self._fenced:
+                if self._is_fence(line):
+                    # Drop the opening fence line (with its language tag) and any preamble.
+                    self._unfenced = []
+                    self._fenced = True
+                else:
+                    self._unfenced.append(line + "\n")
+                continue
+            if not self._mid_line and self._is_fence(line):
+                self._finish()
+                return
+            self._emit(line + "\n")
+            self._mid_line = False
+        # Inside the fence, hold back a partial line only while it could still be the closing fence.
+        if self._fenced and (self._mid_line or not FENCE.startswith(self._pending.strip())):
+            self._emit(self._pending)
+            self._pending = ""
+            self._mid_line = True
+
+    def _is_fence(self, line: str) -> bool:
+        """Inside a fence only a bare ``` line closes it; before one, any ``` line opens it."""
+        line = line.strip()
+        return line == FENCE if self._fenced else line.startswith(FENCE)
+
+    def close(self) -> str:
+        """Ends the stream (flushing any held-back text) and returns the code."""
+        if not self._closed:
+            if not self._fenced:
+                # No fence came, so the held-back text was the code (unless it ends in a bare opening fence).
+                if not self._is_fence(self._pending):
+                    self._emit("".join(self._unfenced) + self._pending)
+            elif self._pending and (self._mid_line or not self._is_fence(self._pending)):
+                self._emit(self._pending)
+            self._finish()
+        return self.code
+
+    @property
+    def code(self) -> str:
+        return "".join(self._parts).strip()
+
+    def timings(self) -> Dict[str, Optional[float]]:
+        """Seconds from `started_at` to the first code output and to the finished syntax check."""
+        return {
+            "time_to_first_output": None if self.first_output_at is None else self.first_output_at - self.started_at,
+            "time_to_validation": None if self.validated_at is None else self.validated_at - self.started_at,
+        }
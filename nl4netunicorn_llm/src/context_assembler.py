@@ -0,0 +1,134 @@
+import functools
+import logging
+
+# Per-section prompt budgets, in tokens of the generation model's tokenizer.
+CONTEXT_TOKEN_BUDGET = 1500
+STDOUT_TOKEN_BUDGET = 600
+STDERR_TOKEN_BUDGET = 600
+
+# Adjacent chunks from one source are merged when one ends with at least this many characters the next starts with.
+MIN_MERGE_OVERLAP_CHARS = 20
+
+TRACEBACK_HEADER = "Traceback (most recent call last):"
+
+
+@functools.lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        logging.warning("tiktoken is not installed; token counts are estimated as characters / 4.")
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+class ContextAssembler:
+    """
+    Shrinks what goes into a prompt without losing information the model needs: merges retrieved
+    chunks that the splitter's overlap split apart, drops duplicated text, and fits each section
+    (documentation context, STDOUT, STDERR) into a token budget counted with the model's tokenizer.
+    """
+
+    def __init__(self, model: str,
+                 context_budget: int = CONTEXT_TOKEN_BUDGET,
+                 stdout_budget: int = STDOUT_TOKEN_BUDGET,
+                 stderr_budget: int = STDERR_TOKEN_BUDGET):
+        self.model = model
+        self.context_budget = context_budget
+        self.stdout_budget = stdout_budget
+        self.stderr_budget = stderr_budget
+
+    def count_tokens(self, text: str) -> int:
+        encoding = _encoding(self.model)
+        if encoding is None:
+            return (len(text) + 3) // 4
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def _truncate_tokens(self, text: str, budget: int, from_end: bool = False) -> str:
+        """Keeps the first (or last) `budget` tokens of `text`."""
+        encoding = _encoding(self.model)
+        if encoding is None:
+            chars = budget * 4
+            return text[-chars:] if from_end else text[:chars]
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= budget:
+            return text
+        return encoding.decode(tokens[-budget:] if from_end else tokens[:budget])
+
+    @staticmethod
+    def _overlap(left: str, right: str) -> int:
+        """Length of the longest suffix of `left` that is a prefix of `right`."""
+        for size in range(min(len(left), len(right)), MIN_MERGE_OVERLAP_CHARS - 1, -1):
+            if left.endswith(right[:size]):
+                return size
+        return 0
+
+    def pack_documents(self, docs: list) -> list:
+        """
+        Merges overlapping chunks of the same source, removes duplicate or contained chunks, and
+        keeps chunks in retrieval order until the context budget is spent (the last one is cut to fit).
+        """
+        merged: list = []
+        for doc in docs:
+            text = doc.page_content
+            source = doc.metadata.get("source")
+            absorbed = False
+            for index, kept in enumerate(merged):
+                if kept.metadata.get("source") != source:
+                    continue
+                kept_text = kept.page_content
+                if text in kept_text:
+                    absorbed = True
+                elif kept_text in text:
+                    merged[index] = type(doc)(page_content=text, metadata=kept.metadata)
+                    absorbed = True
+                elif self._overlap(kept_text, text):
+                    merged[index] = type(doc)(page_content=kept_text + text[self._overlap(kept_text, text):], metadata=kept.metadata)
+                    absorbed = True
+                elif self._overlap(text, kept_text):
+                    merged[index] = type(doc)(page_content=text + kept_text[self._overlap(text, kept_text):], metadata=kept.metadata)
+                    absorbed = True
+                if absorbed:
+                    break
+            if not absorbed:
+                merged.append(doc)
+
+        packed: list = []
+        remaining = self.context_budget
+        for doc in merged:
+            if remaining <= 0:
+                break
+            tokens = self.count_tokens(doc.page_content)
+            if tokens > remaining:
+                doc = type(doc)(page_content=self._truncate_tokens(doc.page_content, remaining) + " ...", metadata=doc.metadata)
+                tokens = remaining
+            packed.append(doc)
+            remaining -= tokens
+        return packed
+
+    def trim_stdout(self, stdout: str) -> str:
+        """Keeps the head and tail of STDOUT within the budget."""
+        return self._head_tail(stdout or "", self.stdout_budget)
+
+    def trim_stderr(self, stderr: str) -> str:
+        """Keeps the last traceback (and what follows it) of STDERR, then its tail, within the budget."""
+        stderr = stderr or ""
+        traceback_start = stderr.rfind(TRACEBACK_HEADER)
+        relevant = stderr[traceback_start:] if traceback_start > 0 else stderr
+        omitted = "[... earlier STDERR omitted ...]\n" if traceback_start > 0 else ""
+        if self.count_tokens(relevant) <= self.stderr_budget:
+            return omitted + relevant
+        # Keep the traceback header so the model still sees it is a traceback, then the tail.
+        header = TRACEBACK_HEADER + "\n" if relevant.startswith(TRACEBACK_HEADER) else ""
+        tail = self._truncate_tokens(relevant, self.stderr_budget - self.count_tokens(header), from_end=True)
+        return "[... STDERR truncated ...]\n" + header + tail
+
+    def _head_tail(self, text: str, budget: int) -> str:
+        if self.count_tokens(text) <= budget:
+            return text
+        half = budget // 2
+        return (self._truncate_tokens(text, half) + "\n[... output truncated ...]\n"
+                + self._truncate_tokens(text, budget - half, from_end=True))
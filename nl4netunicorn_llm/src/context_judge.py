@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+DEFAULT_JUDGE_MODEL = "gpt-3.5-turbo"
+
+# Aspects the judge scores, in the order of its <scores> block.
+JUDGE_ASPECTS = ("Relevance", "Sufficiency", "Helpfulness", "Overall")
+
+_SCORES_RE = re.compile(r'<scores>(.*?)</scores>', re.DOTALL)
+_SCORE_LINE_RE = re.compile(r'^\W*(\w+)\W*:\s*(\d+(?:\.\d+)?)', re.MULTILINE)
+
+_JUDGE_PROMPT_TEMPLATE = """
+You are an expert evaluator for Retrieval Augmented Generation (RAG) systems.
+Your task is to assess if the provided "Retrieved Context" is relevant, sufficient, and helpful for an LLM to generate a NetUnicorn script based on the "Original User Prompt".
+
+Original User Prompt:
+---
+{prompt}
+---
+
+Retrieved Context:
+---
+{context}
+---
+
+Please provide your evaluation focusing on these aspects:
+1.  **Relevance**: Is each piece of context directly related to the user's request? Point out any irrelevant chunks.
+2.  **Sufficiency**: Does the context, as a whole, contain enough information for an LLM to successfully and completely address the user's prompt? Identify any key missing pieces of information that should have been retrieved.
+3.  **Helpfulness**: Overall, how helpful would this context be for an LLM to generate the correct NetUnicorn script? Would it guide the LLM effectively or potentially mislead it?
+4.  **Overall Assessment & Suggestions**: Concisely state if the retrieved context is Good, Adequate, or Poor. If not Good, suggest what kind of information is missing or what could be improved in the retrieval.
+
+
+Finally, end your evaluation with scores for each of the 4 aspects, on a scale of 0-5, where 0 is the worst and 5 is the best. For this, give the scores in the following format:
+<scores>
+    Relevance: <score_1>
+    Sufficiency: <score_2>
+    Helpfulness: <score_3>
+    Overall: <score_4>
+</scores>
+
+Provide your evaluation as a structured response.
+"""
+
+
+def format_retrieved_docs_for_judge(retrieved_docs: list[Document]) -> str:
+    """Formats retrieved documents for presentation to the LLM judge."""
+    if not retrieved_docs:
+        return "No documents retrieved."
+
+    formatted_output = []
+    for i, doc in enumerate(retrieved_docs):
+        source = doc.metadata.get('source', 'unknown source')
+        content_preview = doc.page_content.strip().replace('\n', ' ')
+        formatted_output.append(f"Chunk {i+1} (Source: {source}):\n{content_preview}\n---")
+    return "\n".join(formatted_output)
+
+
+def parse_scores(scores_text: Optional[str]) -> Dict[str, float]:
+    """
+    Parses the inside of a <scores> block ("Relevance: 4" lines, tolerating Markdown emphasis) into
+    {aspect: score} for the aspects in JUDGE_ASPECTS. Missing or out-of-range (not 0-5) scores are left out.
+    """
+    aspects = {aspect.lower(): aspect for aspect in JUDGE_ASPECTS}
+    scores = {}
+    for name, value in _SCORE_LINE_RE.findall(scores_text or ""):
+        aspect = aspects.get(name.lower())
+        if aspect and aspect not in scores and 0 <= float(value) <= 5:
+            scores[aspect] = float(value)
+    return scores
+
+
+class ContextJudge:
+    """
+    Asks an LLM to rate how apt retrieved context is for a prompt (relevance, sufficiency,
+    helpfulness, overall; 0-5 each). Shared by judge_evaluate_retrieved_context.py and the RAG service.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_JUDGE_MODEL, openai_api_key: str = None, chat_model=None):
+        """
+        Args:
+            model_name: OpenAI chat model used as the judge.
+            openai_api_key: API key for the judge model.
+            chat_model: Prebuilt chat model to use instead of ChatOpenAI (e.g. a fake in benchmarks).
+        """
+        self.model_name = model_name
+        self.openai_api_key = openai_api_key
+        self._llm = chat_model
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            from langchain_openai import ChatOpenAI
+            # Low temperature for more deterministic evaluation
+            self._llm = ChatOpenAI(openai_api_key=self.openai_api_key, model_name=self.model_name, temperature=0.1)
+        return self._llm
+
+    @staticmethod
+    def build_prompt(user_prompt: str, formatted_chunks: str) -> str:
+        return _JUDGE_PROMPT_TEMPLATE.format(prompt=user_prompt, context=formatted_chunks)
+
+    def judge(self, user_prompt: str, retrieved_docs: list[Document]) -> Dict[str, Any]:
+        """
+        Returns {"context": <chunks as shown to the judge>, "assessment": <full answer>,
+        "scores": <text inside <scores>...</scores>, or None if the judge gave none>,
+        "score_values": <the scores parsed by parse_scores, {} if none>}.
+        """
+        formatted_chunks = format_retrieved_docs_for_judge(retrieved_docs)
+        assessment = self.llm.invoke(self.build_prompt(user_prompt, formatted_chunks)).content
+        extracted_scores = _SCORES_RE.search(assessment)
+        scores = extracted_scores.group(1) if extracted_scores else None
+        return {
+            "context": formatted_chunks,
+            "assessment": assessment,
+            "scores": scores,
+            "score_values": parse_scores(scores),
+        }
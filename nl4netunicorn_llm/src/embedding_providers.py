@@ -0,0 +1,70 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class LocalSentenceTransformerEmbeddings(Embeddings):
+    """
+    CPU sentence-transformers backend. Documents are encoded in batches, vectors are L2-normalized
+    with NumPy (so FAISS L2 distance ranks like cosine similarity), and query vectors are kept in
+    an in-process LRU cache. No network access is needed once the model is in the local HF cache.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 64,
+                 device: str = "cpu", query_cache_size: int = 1024):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.device = device
+        self.query_cache_size = query_cache_size
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._query_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    logging.info(f"Loading local embedding model '{self.model_name}' on {self.device}")
+                    self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True, show_progress_bar=False)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._query_cache_lock:
+            cached = self._query_cache.get(text)
+            if cached is not None:
+                self._query_cache.move_to_end(text)
+                return cached
+        vector = self._encode([text])[0].tolist()
+        with self._query_cache_lock:
+            self._query_cache[text] = vector
+            if len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+        return vector
+
+
+def create_embeddings(provider: str, model: str, openai_api_key: str = None) -> Embeddings:
+    """Returns the langchain `Embeddings` implementation for `provider` ("openai" or "local")."""
+    if provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(openai_api_key=openai_api_key, model=model)
+    if provider == "local":
+        return LocalSentenceTransformerEmbeddings(model_name=model)
+    raise ValueError(f"Unknown embedding provider '{provider}'. Expected 'openai' or 'local'.")
@@ -0,0 +1,105 @@
+import hashlib
+import logging
+import os
+import sqlite3
+from array import array
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+
+def chunk_text_hash(text: str) -> str:
+    """Content address of a chunk: sha256 of its text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Persistent, content-addressed store of chunk embeddings.
+
+    Vectors are keyed by (embedding model, sha256 of the chunk text), so a chunk
+    is only ever embedded once per model no matter how often the docs file or the
+    splitter settings change around it.
+    """
+
+    def __init__(self, db_path: str, model: str):
+        """
+        Args:
+            db_path: Path of the SQLite file holding the vectors. Parent directories are created.
+            model: Name of the embedding model the vectors belong to.
+        """
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_path = db_path
+        self.model = model
+        self.logger = logging.getLogger(f"EmbeddingStore.{id(self)}")
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL,"
+                " text_hash TEXT NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, text_hash))"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """One transaction on a fresh connection, which is closed afterwards (sqlite3's own context manager only commits)."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, text_hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """Returns the stored vectors for the given hashes; unknown hashes are simply absent."""
+        text_hashes = list(dict.fromkeys(text_hashes))
+        found: Dict[str, List[float]] = {}
+        with self._connect() as conn:
+            # Stay well below SQLite's bound-parameter limit.
+            for start in range(0, len(text_hashes), 500):
+                batch = text_hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [self.model, *batch],
+                )
+                for text_hash, blob in rows:
+                    found[text_hash] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, vectors: Dict[str, List[float]]) -> None:
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [(self.model, text_hash, array("f", vector).tobytes()) for text_hash, vector in vectors.items()],
+            )
+
+    def embed_texts(self, texts: List[str], embed_fn: Callable[[List[str]], List[List[float]]]) -> Tuple[List[List[float]], int]:
+        """
+        Returns one vector per text, calling `embed_fn` only for texts not already in the store.
+
+        Args:
+            texts: Chunk texts to embed.
+            embed_fn: Batch embedding function, e.g. `OpenAIEmbeddings.embed_documents`.
+
+        Returns:
+            A tuple (vectors in the order of `texts`, number of texts that had to be embedded).
+        """
+        hashes = [chunk_text_hash(text) for text in texts]
+        known = self.get_many(hashes)
+
+        missing: Dict[str, str] = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in known and text_hash not in missing:
+                missing[text_hash] = text
+
+        if missing:
+            self.logger.info(f"Embedding {len(missing)} new chunk(s); {len(set(hashes)) - len(missing)} reused from store.")
+            new_vectors = embed_fn(list(missing.values()))
+            fresh = dict(zip(missing.keys(), new_vectors))
+            self.put_many(fresh)
+            known.update(fresh)
+
+        return [known[text_hash] for text_hash in hashes], len(missing)
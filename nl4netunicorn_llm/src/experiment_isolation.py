@@ -0,0 +1,97 @@
+import ast
+import re
+from typing import Dict, Optional, Tuple
+
+# Printed by isolated scripts so the experiment name (usually built from a timestamp at run time)
+# can be recovered from a cancelled run's output for cleanup.
+EXPERIMENT_NAME_MARKER = "[nl4nu] experiment_name="
+_MARKER_RE = re.compile(re.escape(EXPERIMENT_NAME_MARKER) + r"(\S+)")
+
+_CLEANUP_SCRIPT_TEMPLATE = '''from netunicorn.client.remote import RemoteClient
+
+client = RemoteClient(endpoint={endpoint!r}, login={login!r}, password={password!r})
+for action in ("cancel_experiment", "delete_experiment"):
+    try:
+        getattr(client, action)({experiment_name!r})
+        print(f"{{action}}: {experiment_name}")
+    except Exception as e:
+        print(f"{{action}} failed for {experiment_name}: {{e}}")
+'''
+
+
+def _prepare_call(tree: ast.AST) -> Optional[ast.Call]:
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr == "prepare_experiment" and len(node.args) >= 2):
+            return node
+    return None
+
+
+def isolate_experiment(code: str, suffix: str) -> Tuple[str, Optional[str], bool]:
+    """
+    Makes the experiment name of `code` unique by appending `suffix`, so several candidate scripts
+    for the same prompt can be prepared side by side (their timestamp-based names would collide).
+
+    The name passed to client.prepare_experiment is rewritten where it is defined. A string literal
+    gets the suffix at every use of that literal. For a variable (usually `experiment_name`), a
+    reassignment plus a marker print are inserted after its last assignment before the call.
+
+    Returns (code, the name if it is a literal else None, whether the script was changed).
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return code, None, False
+    call = _prepare_call(tree)
+    if call is None:
+        return code, None, False
+    lines = code.splitlines(keepends=True)
+    name_arg = call.args[1]
+
+    if isinstance(name_arg, ast.Constant) and isinstance(name_arg.value, str):
+        name = f"{name_arg.value}{suffix}"
+        # Every use of the literal (prepare, start_execution, status polling) gets the new name.
+        uses = [node for node in ast.walk(tree) if isinstance(node, ast.Constant) and node.value == name_arg.value]
+        if any(node.lineno != node.end_lineno for node in uses):
+            return code, None, False
+        for node in sorted(uses, key=lambda node: (node.lineno, node.col_offset), reverse=True):
+            # col offsets are UTF-8 byte offsets.
+            encoded = lines[node.lineno - 1].encode("utf-8")
+            encoded = encoded[:node.col_offset] + repr(name).encode("utf-8") + encoded[node.end_col_offset:]
+            lines[node.lineno - 1] = encoded.decode("utf-8")
+        return "".join(lines), name, True
+
+    if not isinstance(name_arg, ast.Name):
+        return code, None, False
+    assignments = [node for node in ast.walk(tree)
+                   if isinstance(node, (ast.Assign, ast.AnnAssign)) and node.lineno < call.lineno
+                   and any(isinstance(target, ast.Name) and target.id == name_arg.id
+                           for target in (node.targets if isinstance(node, ast.Assign) else [node.target]))]
+    if not assignments:
+        return code, None, False
+    assignment = max(assignments, key=lambda node: node.end_lineno)
+    indent = " " * assignment.col_offset
+    variable = name_arg.id
+    inserted = (f"{indent}{variable} = f\"{{{variable}}}{suffix}\"\n"
+                f"{indent}print(f\"{EXPERIMENT_NAME_MARKER}{{{variable}}}\")\n")
+    if not lines[assignment.end_lineno - 1].endswith("\n"):
+        lines[assignment.end_lineno - 1] += "\n"
+    lines.insert(assignment.end_lineno, inserted)
+    isolated = "".join(lines)
+    try:
+        compile(isolated, "<isolated script>", "exec")
+    except SyntaxError:
+        return code, None, False
+    return isolated, None, True
+
+
+def experiment_name_from_output(stdout: str) -> Optional[str]:
+    """The experiment name an isolated script printed, if it got that far."""
+    match = _MARKER_RE.search(stdout or "")
+    return match.group(1) if match else None
+
+
+def cleanup_script(credentials: Dict[str, str], experiment_name: str) -> str:
+    """A script that cancels and deletes `experiment_name`, tolerating either step failing."""
+    return _CLEANUP_SCRIPT_TEMPLATE.format(endpoint=credentials["endpoint"], login=credentials["login"],
+                                           password=credentials["password"], experiment_name=experiment_name)
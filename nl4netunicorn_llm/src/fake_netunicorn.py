@@ -0,0 +1,313 @@
+"""
+Dry-run bootstrap for generated NetUnicorn scripts. Started as a standalone script:
+
+    python fake_netunicorn.py <script.py>
+
+with the scenario as JSON in the NL4NU_DRY_RUN_SCENARIO environment variable. It replaces
+`netunicorn.client.remote.RemoteClient` with FakeRemoteClient, makes `time.sleep` advance a virtual
+clock instead of blocking, and runs the script as __main__. The fake walks experiments through
+PREPARING -> READY -> RUNNING -> FINISHED (or the scenario's outcome) in virtual time, so the
+script's polling loops finish in milliseconds and API misuse surfaces without real infrastructure.
+Real `netunicorn.base` / `returns` types are used when installed; otherwise small stand-ins are.
+"""
+import enum
+import json
+import os
+import runpy
+import sys
+import time
+import traceback
+import types
+
+SCENARIO_ENV_VAR = "NL4NU_DRY_RUN_SCENARIO"
+
+DEFAULT_SCENARIO = {
+    "nodes": [
+        {"name": "dryrun-node-1", "properties": {"location": "dry-run"}},
+        {"name": "dryrun-node-2", "properties": {"location": "dry-run"}},
+        {"name": "dryrun-node-3", "properties": {"location": "dry-run"}},
+    ],
+    "prepare_seconds": 5,
+    "run_seconds": 10,
+    # If set, the experiment still becomes READY after prepare_seconds (as with the real client),
+    # but every deployment reports prepared=False with this message as its error.
+    "prepare_error": None,
+    # Status after RUNNING: FINISHED, or e.g. UNKNOWN to simulate a broken experiment.
+    "final_status": "FINISHED",
+    # Per-node task outcome; "default" applies to nodes without their own entry.
+    "node_results": {"default": {"success": True, "value": "dry-run result", "logs": ["dry-run: task executed"]}},
+    # Guard against polling loops without sleep.
+    "max_status_polls": 10000,
+}
+
+
+class _VirtualClock:
+    """Makes time.sleep advance time.time/time.monotonic instead of blocking."""
+
+    def __init__(self):
+        self.offset = 0.0
+        self._real_time = time.time
+        self._real_monotonic = time.monotonic
+        self._real_perf_counter = time.perf_counter
+
+    def install(self) -> None:
+        time.sleep = self.sleep
+        time.time = lambda: self._real_time() + self.offset
+        time.monotonic = lambda: self._real_monotonic() + self.offset
+        time.perf_counter = lambda: self._real_perf_counter() + self.offset
+
+    def sleep(self, seconds: float) -> None:
+        if seconds < 0:
+            raise ValueError("sleep length must be non-negative")
+        self.offset += seconds
+
+    def now(self) -> float:
+        return self._real_monotonic() + self.offset
+
+
+CLOCK = _VirtualClock()
+
+
+def _import_or_none(module_name: str):
+    try:
+        return __import__(module_name, fromlist=["_"])
+    except Exception:
+        return None
+
+
+_experiment_module = _import_or_none("netunicorn.base.experiment")
+_nodes_module = _import_or_none("netunicorn.base.nodes")
+_returns_result = _import_or_none("returns.result")
+
+if _experiment_module is not None and hasattr(_experiment_module, "ExperimentStatus"):
+    ExperimentStatus = _experiment_module.ExperimentStatus
+else:
+    class ExperimentStatus(enum.Enum):
+        UNKNOWN = 0
+        PREPARING = 1
+        READY = 2
+        RUNNING = 3
+        FINISHED = 4
+
+
+class RemoteClientException(Exception):
+    pass
+
+
+class FakeNode:
+    def __init__(self, name: str, properties: dict):
+        self.name = name
+        self.properties = properties
+        self.architecture = "linux_amd64"
+
+    def __getitem__(self, item):
+        return self.properties[item]
+
+    def __repr__(self):
+        return f"{self.name}"
+
+
+class FakeNodePool:
+    """Subset of netunicorn's CountableNodePool used by generated scripts."""
+
+    def __init__(self, nodes: list):
+        self.nodes = list(nodes)
+
+    def take(self, count: int) -> list:
+        return self.nodes[:count]
+
+    def filter(self, function) -> "FakeNodePool":
+        return FakeNodePool([node for node in self.nodes if function(node)])
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __getitem__(self, index):
+        return self.nodes[index]
+
+    def __repr__(self):
+        return f"<Uncountable node pool with {len(self.nodes)} nodes: {self.nodes}>"
+
+
+def _make_node(spec: dict):
+    if _nodes_module is not None and hasattr(_nodes_module, "Node"):
+        try:
+            return _nodes_module.Node(name=spec["name"], properties=dict(spec.get("properties", {})))
+        except Exception:
+            pass
+    return FakeNode(spec["name"], dict(spec.get("properties", {})))
+
+
+def _make_result(outcome: dict):
+    value = outcome.get("value")
+    if _returns_result is not None:
+        return _returns_result.Success(value) if outcome.get("success", True) else _returns_result.Failure(value)
+    return value
+
+
+class FakeDeploymentResult:
+    def __init__(self, node, result, error=None):
+        self.node = node
+        self.result = result
+        self.error = error
+
+    def __repr__(self):
+        return f"DeploymentExecutionResult(node={self.node}, result={self.result}, error={self.error})"
+
+
+class FakeExecutionInformation:
+    def __init__(self, status, experiment, execution_result=None, error=None):
+        self.status = status
+        self.experiment = experiment
+        self.execution_result = execution_result
+        self.error = error
+
+    def __repr__(self):
+        return f"ExperimentExecutionInformation(status={self.status}, execution_result={self.execution_result})"
+
+
+class _FakeExperimentState:
+    def __init__(self, experiment, prepared_at: float):
+        self.experiment = experiment
+        self.prepared_at = prepared_at
+        self.started_at = None
+
+
+class FakeRemoteClient:
+    """In-process stand-in for netunicorn.client.remote.RemoteClient driven by a scenario dict."""
+
+    def __init__(self, endpoint: str = None, login: str = None, password: str = None, *args, **kwargs):
+        self.endpoint = endpoint
+        self.login = login
+        self.scenario = dict(DEFAULT_SCENARIO, **json.loads(os.environ.get(SCENARIO_ENV_VAR) or "{}"))
+        self.experiments = {}
+        self.status_polls = 0
+        print(f"[dry-run] Using fake NetUnicorn client (endpoint {endpoint!r} is not contacted).", file=sys.stderr)
+
+    def healthcheck(self) -> bool:
+        return True
+
+    def get_nodes(self):
+        return FakeNodePool([_make_node(spec) for spec in self.scenario["nodes"]])
+
+    def get_experiments(self) -> dict:
+        return {name: self.get_experiment_status(name) for name in self.experiments}
+
+    def prepare_experiment(self, experiment, experiment_id: str) -> str:
+        if not isinstance(experiment_id, str):
+            raise RemoteClientException(f"experiment_id must be a string, got {type(experiment_id).__name__}")
+        if experiment_id in self.experiments:
+            raise RemoteClientException(f"Experiment with name {experiment_id} already exists")
+        deployments = list(experiment) if hasattr(experiment, "__iter__") else []
+        if not deployments:
+            raise RemoteClientException("Experiment has no deployments; map a pipeline to at least one node first.")
+        self.experiments[experiment_id] = _FakeExperimentState(experiment, CLOCK.now())
+        return experiment_id
+
+    def _state(self, experiment_id: str) -> _FakeExperimentState:
+        if experiment_id not in self.experiments:
+            raise RemoteClientException(f"Experiment {experiment_id} not found")
+        return self.experiments[experiment_id]
+
+    def start_execution(self, experiment_id: str) -> str:
+        state = self._state(experiment_id)
+        if self._status(state) != ExperimentStatus.READY:
+            raise RemoteClientException(f"Experiment {experiment_id} is not READY (status: {self._status(state)}); poll until READY before start_execution.")
+        state.started_at = CLOCK.now()
+        return experiment_id
+
+    def _status(self, state: _FakeExperimentState):
+        now = CLOCK.now()
+        if state.started_at is None:
+            if now - state.prepared_at < self.scenario["prepare_seconds"]:
+                return ExperimentStatus.PREPARING
+            return ExperimentStatus.READY
+        if now - state.started_at < self.scenario["run_seconds"]:
+            return ExperimentStatus.RUNNING
+        return getattr(ExperimentStatus, self.scenario["final_status"])
+
+    def _mark_deployments(self, state: _FakeExperimentState, status) -> None:
+        # Deployments are only reported as prepared (or failed) once preparation is over.
+        prepare_error = self.scenario.get("prepare_error") if status != ExperimentStatus.PREPARING else None
+        for deployment in state.experiment:
+            try:
+                deployment.prepared = status != ExperimentStatus.PREPARING and not prepare_error
+                deployment.error = prepare_error
+            except AttributeError:
+                pass
+
+    def get_experiment_status(self, experiment_id: str):
+        self.status_polls += 1
+        if self.status_polls > self.scenario["max_status_polls"]:
+            raise RuntimeError(f"[dry-run] get_experiment_status called {self.status_polls} times; the polling loop does not terminate.")
+        state = self._state(experiment_id)
+        status = self._status(state)
+        self._mark_deployments(state, status)
+
+        execution_result = None
+        if status == ExperimentStatus.FINISHED:
+            results = self.scenario["node_results"]
+            execution_result = []
+            for deployment in state.experiment:
+                node = getattr(deployment, "node", deployment)
+                if self.scenario.get("prepare_error"):
+                    # Deployments that failed to prepare never ran.
+                    execution_result.append(FakeDeploymentResult(node, None, self.scenario["prepare_error"]))
+                    continue
+                outcome = results.get(getattr(node, "name", str(node)), results["default"])
+                execution_result.append(FakeDeploymentResult(node, (_make_result(outcome), list(outcome.get("logs", []))), outcome.get("error")))
+        return FakeExecutionInformation(status, state.experiment, execution_result)
+
+    def delete_experiment(self, experiment_id: str) -> None:
+        if experiment_id not in self.experiments:
+            raise RemoteClientException(f"Experiment {experiment_id} not found")
+        del self.experiments[experiment_id]
+
+    def cancel_experiment(self, experiment_id: str) -> None:
+        self._state(experiment_id)
+
+
+def install() -> None:
+    """Patches the NetUnicorn client (or provides it if netunicorn-client is not installed) and the clock."""
+    global RemoteClientException
+    CLOCK.install()
+    remote = _import_or_none("netunicorn.client.remote")
+    if remote is None:
+        remote = types.ModuleType("netunicorn.client.remote")
+        remote.RemoteClientException = RemoteClientException
+        for name in ("netunicorn", "netunicorn.client"):
+            if name not in sys.modules:
+                module = types.ModuleType(name)
+                module.__path__ = []
+                sys.modules[name] = module
+        sys.modules["netunicorn.client.remote"] = remote
+        sys.modules["netunicorn.client"].remote = remote
+    else:
+        # Keep raising the exception type scripts catch.
+        RemoteClientException = remote.RemoteClientException
+    remote.RemoteClient = FakeRemoteClient
+
+
+def main() -> None:
+    script_path = os.path.abspath(sys.argv[1])
+    install()
+    sys.argv = [script_path]
+    sys.path[0] = os.path.dirname(script_path)
+    try:
+        runpy.run_path(script_path, run_name="__main__")
+    except SystemExit:
+        raise
+    except BaseException:
+        exc_type, exc_value, tb = sys.exc_info()
+        script_tb = tb
+        while script_tb is not None and script_tb.tb_frame.f_code.co_filename != script_path:
+            script_tb = script_tb.tb_next
+        traceback.print_exception(exc_type, exc_value, script_tb or tb)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
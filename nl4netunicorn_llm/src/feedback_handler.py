@@ -1,10 +1,25 @@
+import asyncio
+import contextvars
 import datetime
 import os
 import sys
+import threading
+import time
 import traceback
 import logging
 
-from typing import Callable, Dict, Any, List
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Tuple
+
+from .experiment_isolation import cleanup_script, experiment_name_from_output, isolate_experiment
+from .fix_cache import failure_signature
+from .spans import add_span, span
+
+# (span name, start milestone or None for process start, end milestone) derived from ScriptExecutor milestones.
+EXECUTION_PHASES = [
+    ("execute.startup", None, "first_output"),
+    ("execute.prepare", "prepare_started", "execution_started"),
+    ("execute.poll", "execution_started", "finished"),
+]
 
 class FeedbackHandler:
     def __init__(self,
@@ -12,7 +27,15 @@ class FeedbackHandler:
                  feedback_code_generator: Callable[[str, str, str, str, Dict[str, str]], str],
                  script_executor: Any,
                  netunicorn_credentials: Dict[str, str],
-                 max_retries: int = 3):
+                 max_retries: int = 3,
+                 script_validator: Any = None,
+                 script_repairer: Any = None,
+                 fix_cache: Any = None,
+                 candidates: int = 1,
+                 speculate_on_failure: bool = False,
+                 async_initial_code_generator: Callable[[str, Dict[str, str]], Awaitable[str]] = None,
+                 async_feedback_code_generator: Callable[[str, str, str, str, Dict[str, str]], Awaitable[str]] = None,
+                 work_tag: str = None):
         """
         Initializes the FeedbackHandler.
 
@@ -24,12 +47,40 @@ class FeedbackHandler:
             script_executor: An instance of the ScriptExecutor class.
             netunicorn_credentials: Dict containing 'endpoint', 'login', 'password'.
             max_retries: Maximum number of retries after the initial attempt.
+            script_validator: Optional. An instance of ScriptValidator. If provided, each script is checked
+                              statically first and scripts with findings are not executed; the findings are
+                              passed to the feedback generator as STDERR instead.
+            script_repairer: Optional. An instance of ImportRepairer. If provided, each script's imports and
+                             environment definition are repaired from the task catalog before validation.
+            fix_cache: Optional. An instance of FailureFixCache. If provided, a failure whose signature has a
+                       known fix is retried with that fix applied locally instead of asking the LLM, and
+                       fixes from successful LLM retries are recorded for later runs.
+            candidates: Number of generate/execute/feedback chains raced per prompt; the first to succeed
+                        wins and the rest are cancelled. The generators receive a `candidate` keyword
+                        (the chain's index) when this is above 1.
+            speculate_on_failure: With candidates > 1, start the extra chains only once candidate 0's
+                                  first attempt has failed, instead of all at once.
+            async_initial_code_generator: Optional. Coroutine function counterpart of initial_code_generator,
+                                          used by arun_generation_with_feedback. Without it the blocking
+                                          generator runs in a worker thread.
+            async_feedback_code_generator: Optional. Coroutine function counterpart of feedback_code_generator.
+            work_tag: Optional. Appended to the experiment name of every executed script (see
+                      experiment_isolation.isolate_experiment), so concurrent runs whose scripts name
+                      their experiments after the current second do not share a NetUnicorn experiment.
         """
         self.initial_code_generator = initial_code_generator
         self.feedback_code_generator = feedback_code_generator
         self.script_executor = script_executor
         self.max_retries = max_retries
         self.netunicorn_credentials = netunicorn_credentials
+        self.script_validator = script_validator
+        self.script_repairer = script_repairer
+        self.fix_cache = fix_cache
+        self.candidates = max(1, candidates)
+        self.speculate_on_failure = speculate_on_failure
+        self.async_initial_code_generator = async_initial_code_generator
+        self.async_feedback_code_generator = async_feedback_code_generator
+        self.work_tag = work_tag
         self.logger = logging.getLogger(f"FeedbackHandler.{id(self)}") 
         if not logging.getLogger().hasHandlers():
             logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -74,6 +125,73 @@ class FeedbackHandler:
             return None
         return filepath
 
+    def _validate_script(self, code: str, script_filepath: str = None) -> Dict[str, Any] | None:
+        """
+        Runs the static validator. Returns None if the script may be executed, otherwise an
+        execution-result-shaped dict (same keys as ScriptExecutor.run_script) describing the findings.
+        """
+        if self.script_validator is None:
+            return None
+        findings = self.script_validator.validate(code)
+        if not findings:
+            return None
+        if script_filepath:
+            try:
+                os.makedirs(os.path.dirname(script_filepath) or ".", exist_ok=True)
+                with open(script_filepath, "w", encoding="utf-8") as f:
+                    f.write(code)
+            except IOError as e:
+                self.logger.error(f"Failed to save rejected script to {script_filepath}: {e}")
+        stderr = "Static validation failed before execution (the script was NOT run):\n" + "\n".join(f"- {finding}" for finding in findings)
+        return {
+            "success": False,
+            "stdout": "",
+            "stderr": stderr,
+            "filepath": script_filepath,
+            "exit_code": None,
+            "validation_errors": findings
+        }
+
+    def _execute(self, code: str, script_filepath: str, attempt: int, cancel_event: threading.Event = None) -> Dict[str, Any]:
+        """
+        Runs the script inside an "execute" span. The executor's output milestones are turned into
+        child spans for interpreter startup, remote prepare and result polling.
+        """
+        with span("execute", attempt=attempt) as attributes:
+            started = time.time()
+            if cancel_event is None:
+                execution_result = self.script_executor.run_script(code, script_filepath=script_filepath)
+            else:
+                execution_result = self.script_executor.run_script(code, script_filepath=script_filepath,
+                                                                   cancel_event=cancel_event)
+            self._record_execution(attributes, started, execution_result, attempt)
+        return execution_result
+
+    async def _aexecute(self, code: str, script_filepath: str, attempt: int) -> Dict[str, Any]:
+        """
+        Asyncio counterpart of _execute. Executors without arun_script (e.g. test stubs) run in a
+        worker thread.
+        """
+        with span("execute", attempt=attempt) as attributes:
+            started = time.time()
+            if hasattr(self.script_executor, "arun_script"):
+                execution_result = await self.script_executor.arun_script(code, script_filepath=script_filepath)
+            else:
+                execution_result = await asyncio.to_thread(self.script_executor.run_script, code,
+                                                           script_filepath=script_filepath)
+            self._record_execution(attributes, started, execution_result, attempt)
+        return execution_result
+
+    @staticmethod
+    def _record_execution(attributes: Dict[str, Any], started: float, execution_result: Dict[str, Any], attempt: int):
+        attributes.update(success=execution_result["success"], exit_code=execution_result["exit_code"])
+        milestones = execution_result.get("milestones") or {}
+        for name, start_milestone, end_milestone in EXECUTION_PHASES:
+            start_offset = 0.0 if start_milestone is None else milestones.get(start_milestone)
+            end_offset = milestones.get(end_milestone)
+            if start_offset is not None and end_offset is not None:
+                add_span(name, started + start_offset, end_offset - start_offset, attempt=attempt)
+
     def run_generation_with_feedback(self, 
                                      user_prompt: str, 
                                      save_script_base_path: str = None,
@@ -81,10 +199,15 @@ class FeedbackHandler:
         """
         Manages the code generation, execution, and feedback loop.
 
+        With candidates > 1, several independent generate/execute/feedback chains run concurrently
+        (all at once, or the extra ones only after candidate 0's first failure when speculate_on_failure
+        is set). The first chain to succeed wins; the others are cancelled and their experiments cleaned up.
+
         Args:
             user_prompt: The initial user prompt for code generation.
             save_script_base_path: If provided, path to directory where scripts from each attempt are saved. 
                                    Example: "nl4netunicorn_llm/generated_scripts/feedback_attempts"
+                                   Candidates save into candidate_<i> subdirectories.
             final_script_name_override: If save_script_base_path is also provided, this will be the name
                                         of the final successful script (or last attempt if all fail).
                                         If None, a default name based on the last attempt is used.
@@ -97,87 +220,37 @@ class FeedbackHandler:
                 - "success": bool (True if any attempt was successful)
                 - "last_execution_output": dict (output from the last execution attempt or successful one)
                 - "final_script_path": str (path to the final saved script, if saving was enabled)
+                - "winner", "candidates": only with candidates > 1; the winning candidate's index (None if
+                  none succeeded) and a summary per candidate. The other keys describe the winner, or
+                  candidate 0 if none succeeded.
         """
-        report_log: List[Dict[str, Any]] = []
-        current_code = ""
-        execution_result = None
-        overall_success = False
-        final_script_path = None
+        if self.candidates > 1:
+            outcome = self._run_candidates(user_prompt, save_script_base_path)
+        else:
+            outcome = self._run_attempts(user_prompt, save_script_base_path)
+        return self._finalize(outcome, save_script_base_path, final_script_name_override)
 
-        # Initial attempt (Attempt 0)
-        print(f"FeedbackHandler: Initial code generation for prompt: '{user_prompt}'")
-        try:
-            current_code = self.initial_code_generator(user_prompt, self.netunicorn_credentials)
-        except Exception as e:
-            error_msg = f"Error during initial code generation: {e}\n{traceback.format_exc()}"
-            print(error_msg, file=sys.stderr)
-            report_log.append({
-                "attempt": 0,
-                "prompt": user_prompt,
-                "code_generated": False,
-                "error_in_generation": error_msg,
-                "execution_result": None
-            })
-            return {
-                "final_code": "",
-                "report_log": report_log,
-                "success": False,
-                "last_execution_output": None,
-                "final_script_path": None
-            }
+    async def arun_generation_with_feedback(self,
+                                            user_prompt: str,
+                                            save_script_base_path: str = None,
+                                            final_script_name_override: str = None) -> Dict[str, Any]:
+        """
+        Asyncio counterpart of run_generation_with_feedback (same arguments and result). Generation
+        awaits the async generators and execution awaits the executor's arun_script, so many feedback
+        loops can interleave on one event loop. Always a single chain (`candidates` is not used).
+
+        Cancelling the awaiting task stops the loop at its current step; a running script is killed.
+        """
+        outcome = await self._arun_attempts(user_prompt, save_script_base_path)
+        return self._finalize(outcome, save_script_base_path, final_script_name_override)
+
+    def _finalize(self, outcome: Dict[str, Any], save_script_base_path: str = None,
+                  final_script_name_override: str = None) -> Dict[str, Any]:
+        """Moves (or, if all attempts failed, writes) the final script to its override name."""
+        overall_success = outcome["success"]
+        report_log = outcome["report_log"]
+        final_script_path = outcome["final_script_path"]
 
-        for attempt in range(self.max_retries + 1): # +1 because 0 is initial, then N retries
-            print(f"\nFeedbackHandler: Attempt {attempt} (Max retries: {self.max_retries})")
-            
-            filepath_for_this_attempt = None
-            if save_script_base_path:
-                filepath_for_this_attempt = self._get_script_filepath(save_script_base_path, user_prompt, attempt)
-                print(f"FeedbackHandler: Script for attempt {attempt} will be saved to/run from: {filepath_for_this_attempt}")
-            
-            attempt_log = {
-                "attempt": attempt,
-                "code": current_code,
-                "filepath_this_attempt": filepath_for_this_attempt,
-                "execution_result": None,
-                "error_in_generation": None 
-            }
-
-            print(f"FeedbackHandler: Executing code for attempt {attempt}...")
-            execution_result = self.script_executor.run_script(current_code, script_filepath=filepath_for_this_attempt)
-            attempt_log["execution_result"] = execution_result
-            print(f"FeedbackHandler: Execution result for attempt {attempt}: Success={execution_result['success']}, ExitCode={execution_result['exit_code']}")
-            if execution_result.get("stdout"):
-                print("STDOUT:\n" + execution_result["stdout"])
-            if execution_result.get("stderr"):
-                print("STDERR:\n" + execution_result["stderr"])
-
-            if execution_result["success"]:
-                print(f"FeedbackHandler: Attempt {attempt} successful.")
-                overall_success = True
-                report_log.append(attempt_log)
-                final_script_path = filepath_for_this_attempt # This attempt's script is the one that succeeded
-                break  # Exit loop on success
-            else:
-                print(f"FeedbackHandler: Attempt {attempt} failed. Exit code: {execution_result['exit_code']}")
-                report_log.append(attempt_log)
-                if attempt < self.max_retries:
-                    print(f"FeedbackHandler: Requesting code regeneration (Retry {attempt + 1}/{self.max_retries})...")
-                    try:
-                        current_code = self.feedback_code_generator(
-                            user_prompt,
-                            current_code,
-                            execution_result["stdout"],
-                            execution_result["stderr"],
-                            self.netunicorn_credentials
-                        )
-                    except Exception as e:
-                        error_msg = f"Error during feedback code generation (attempt {attempt+1}): {e}\n{traceback.format_exc()}"
-                        print(error_msg, file=sys.stderr)
-                        attempt_log["error_in_regeneration"] = error_msg 
-                        break
-                else:
-                    print(f"FeedbackHandler: Max retries reached ({self.max_retries}).")
-        
         if overall_success and save_script_base_path and final_script_name_override and final_script_path:
             overridden_path = os.path.join(save_script_base_path, final_script_name_override)
             try:
@@ -191,7 +264,7 @@ class FeedbackHandler:
                 print(f"FeedbackHandler: Error renaming successful script to '{overridden_path}': {e}. Keeping original name: '{final_script_path}'.", file=sys.stderr)
         elif not overall_success and save_script_base_path and final_script_name_override:
             # If all attempts failed, but we have an override name, save the *last* attempted code there.
-            last_attempt_code = report_log[-1]["code"] if report_log else ""
+            last_attempt_code = report_log[-1].get("code", "") if report_log else ""
             if last_attempt_code:
                 overridden_path = os.path.join(save_script_base_path, final_script_name_override)
                 try:
@@ -202,15 +275,347 @@ class FeedbackHandler:
                     final_script_path = overridden_path
                 except IOError as e:
                     print(f"FeedbackHandler: Error saving last attempted script to '{overridden_path}': {e}.", file=sys.stderr)
-                    final_script_path = report_log[-1]["filepath_this_attempt"] if report_log else None # Fallback to last attempt's temp name
+                    final_script_path = report_log[-1].get("filepath_this_attempt") if report_log else None # Fallback to last attempt's temp name
+
+        return {**outcome, "final_script_path": final_script_path}
+
+    def _run_attempts(self, user_prompt: str, save_script_base_path: str = None, run: "_CandidateRun" = None) -> Dict[str, Any]:
+        """One generate/execute/feedback chain. `run` is set when it is one of several candidates."""
+        chain = _AttemptChain(user_prompt, run)
+        log_prefix = chain.log_prefix
+
+        # Initial attempt (Attempt 0)
+        print(f"{log_prefix}: Initial code generation for prompt: '{user_prompt}'")
+        try:
+            chain.current_code = self.initial_code_generator(user_prompt, self.netunicorn_credentials, **chain.variant)
+        except Exception as e:
+            return self._initial_generation_failed(chain, e)
+        if run is not None and save_script_base_path:
+            save_script_base_path = os.path.join(save_script_base_path, f"candidate_{run.index}")
+
+        for attempt in range(self.max_retries + 1): # +1 because 0 is initial, then N retries
+            if run is not None and run.race.cancel_event.is_set():
+                print(f"{log_prefix}: Another candidate succeeded; stopping before attempt {attempt}.")
+                run.cancelled = True
+                break
+            attempt_log, execution_result = self._prepare_attempt(chain, attempt, save_script_base_path)
+            if execution_result is not None:
+                pass # Rejected by static validation
+            elif run is None:
+                print(f"{log_prefix}: Executing code for attempt {attempt}...")
+                code, _ = self._isolate(chain.current_code)
+                execution_result = self._execute(code, attempt_log["filepath_this_attempt"], attempt)
+            else:
+                execution_result = self._execute_candidate(run, chain.current_code, attempt_log["filepath_this_attempt"], attempt)
+                if execution_result is None or execution_result.get("abort_reason") == "cancelled":
+                    print(f"{log_prefix}: Another candidate succeeded; attempt {attempt} cancelled.")
+                    attempt_log["execution_result"] = execution_result
+                    attempt_log["cancelled"] = True
+                    chain.report_log.append(attempt_log)
+                    run.cancelled = True
+                    break
+            if self._record_attempt(chain, attempt, attempt_log, execution_result):
+                break  # Exit loop on success
+            if attempt == self.max_retries:
+                print(f"{log_prefix}: Max retries reached ({self.max_retries}).")
+                break
+            if self._apply_cached_fix(chain, attempt, attempt_log):
+                continue
+            print(f"{log_prefix}: Requesting code regeneration (Retry {attempt + 1}/{self.max_retries})...")
+            try:
+                failed_code = chain.current_code
+                regeneration_started = time.perf_counter()
+                chain.current_code = self.feedback_code_generator(
+                    user_prompt,
+                    failed_code,
+                    chain.execution_result["stdout"],
+                    chain.execution_result["stderr"],
+                    self.netunicorn_credentials,
+                    **chain.variant
+                )
+                self._regenerated(chain, failed_code, regeneration_started)
+            except Exception as e:
+                self._regeneration_failed(attempt, attempt_log, e)
+                break
+
+        return chain.outcome()
+
+    async def _arun_attempts(self, user_prompt: str, save_script_base_path: str = None) -> Dict[str, Any]:
+        """Asyncio counterpart of _run_attempts (single chain)."""
+        chain = _AttemptChain(user_prompt)
+        log_prefix = chain.log_prefix
+
+        print(f"{log_prefix}: Initial code generation for prompt: '{user_prompt}'")
+        try:
+            chain.current_code = await self._agenerate(self.async_initial_code_generator, self.initial_code_generator,
+                                                       user_prompt, self.netunicorn_credentials)
+        except Exception as e:
+            return self._initial_generation_failed(chain, e)
+
+        for attempt in range(self.max_retries + 1):
+            attempt_log, execution_result = self._prepare_attempt(chain, attempt, save_script_base_path)
+            if execution_result is None:
+                print(f"{log_prefix}: Executing code for attempt {attempt}...")
+                code, _ = self._isolate(chain.current_code)
+                execution_result = await self._aexecute(code, attempt_log["filepath_this_attempt"], attempt)
+            if self._record_attempt(chain, attempt, attempt_log, execution_result):
+                break
+            if attempt == self.max_retries:
+                print(f"{log_prefix}: Max retries reached ({self.max_retries}).")
+                break
+            if self._apply_cached_fix(chain, attempt, attempt_log):
+                continue
+            print(f"{log_prefix}: Requesting code regeneration (Retry {attempt + 1}/{self.max_retries})...")
+            try:
+                failed_code = chain.current_code
+                regeneration_started = time.perf_counter()
+                chain.current_code = await self._agenerate(
+                    self.async_feedback_code_generator, self.feedback_code_generator,
+                    user_prompt,
+                    failed_code,
+                    chain.execution_result["stdout"],
+                    chain.execution_result["stderr"],
+                    self.netunicorn_credentials
+                )
+                self._regenerated(chain, failed_code, regeneration_started)
+            except Exception as e:
+                self._regeneration_failed(attempt, attempt_log, e)
+                break
+
+        return chain.outcome()
 
+    @staticmethod
+    async def _agenerate(async_generator: Callable[..., Awaitable[str]] | None, generator: Callable[..., str], *args) -> str:
+        """Awaits the async generator, or runs the blocking one in a worker thread if there is none."""
+        if async_generator is not None:
+            return await async_generator(*args)
+        return await asyncio.to_thread(generator, *args)
+
+    def _initial_generation_failed(self, chain: "_AttemptChain", e: Exception) -> Dict[str, Any]:
+        error_msg = f"Error during initial code generation: {e}\n{traceback.format_exc()}"
+        print(error_msg, file=sys.stderr)
+        chain.report_log.append({
+            "attempt": 0,
+            "prompt": chain.user_prompt,
+            "code_generated": False,
+            "error_in_generation": error_msg,
+            "execution_result": None
+        })
         return {
-            "final_code": current_code, # This will be the last generated code (successful or last attempt)
-            "report_log": report_log,
-            "success": overall_success,
-            "last_execution_output": execution_result, # Output of the last script that was run
-            "final_script_path": final_script_path
+            "final_code": "",
+            "report_log": chain.report_log,
+            "success": False,
+            "last_execution_output": None,
+            "final_script_path": None
+        }
+
+    def _prepare_attempt(self, chain: "_AttemptChain", attempt: int, save_script_base_path: str = None):
+        """
+        Repairs and statically validates the chain's current code for `attempt`. Returns the attempt's
+        log entry and, if validation rejected the script, the validation result (else None).
+        """
+        log_prefix = chain.log_prefix
+        print(f"\n{log_prefix}: Attempt {attempt} (Max retries: {self.max_retries})")
+
+        filepath_for_this_attempt = None
+        if save_script_base_path:
+            filepath_for_this_attempt = self._get_script_filepath(save_script_base_path, chain.user_prompt, attempt)
+            print(f"{log_prefix}: Script for attempt {attempt} will be saved to/run from: {filepath_for_this_attempt}")
+
+        repairs = []
+        if self.script_repairer is not None:
+            with span("repair", attempt=attempt) as attributes:
+                chain.current_code, repairs = self.script_repairer.repair(chain.current_code)
+                attributes["fixes"] = len(repairs)
+            for repair in repairs:
+                print(f"{log_prefix}: Repaired attempt {attempt}: {repair}")
+
+        attempt_log = {
+            "attempt": attempt,
+            "code": chain.current_code,
+            "repairs": repairs,
+            "filepath_this_attempt": filepath_for_this_attempt,
+            "execution_result": None,
+            "error_in_generation": None 
+        }
+
+        with span("validate", attempt=attempt) as attributes:
+            validation_result = self._validate_script(chain.current_code, filepath_for_this_attempt)
+            attributes["passed"] = validation_result is None
+        if validation_result is not None:
+            print(f"{log_prefix}: Static validation rejected attempt {attempt} ({len(validation_result['validation_errors'])} finding(s)); skipping execution.")
+        return attempt_log, validation_result
+
+    def _record_attempt(self, chain: "_AttemptChain", attempt: int, attempt_log: Dict[str, Any],
+                        execution_result: Dict[str, Any]) -> bool:
+        """Logs an executed (or rejected) attempt and settles a pending fix. Returns True on success."""
+        log_prefix = chain.log_prefix
+        chain.execution_result = execution_result
+        attempt_log["execution_result"] = execution_result
+        print(f"{log_prefix}: Execution result for attempt {attempt}: Success={execution_result['success']}, ExitCode={execution_result['exit_code']}")
+        if execution_result.get("aborted_early"):
+            print(f"{log_prefix}: Attempt {attempt} was aborted early ({execution_result['abort_reason']}).")
+        if execution_result.get("stdout"):
+            print("STDOUT:\n" + execution_result["stdout"])
+        if execution_result.get("stderr"):
+            print("STDERR:\n" + execution_result["stderr"])
+
+        if chain.pending_fix is not None:
+            signature, failed_code, fix_id = chain.pending_fix
+            chain.pending_fix = None
+            if fix_id is not None:
+                self.fix_cache.report(fix_id, execution_result["success"])
+            elif execution_result["success"] and self.fix_cache.learn(signature, failed_code, chain.current_code):
+                print(f"{log_prefix}: Recorded the fix for '{signature}' in the fix cache.")
+
+        chain.report_log.append(attempt_log)
+        if execution_result["success"]:
+            print(f"{log_prefix}: Attempt {attempt} successful.")
+            chain.success = True
+            chain.final_script_path = attempt_log["filepath_this_attempt"] # This attempt's script is the one that succeeded
+            return True
+        print(f"{log_prefix}: Attempt {attempt} failed. Exit code: {execution_result['exit_code']}")
+        if chain.run is not None and chain.run.index == 0:
+            # With speculate_on_failure, the other candidates start now.
+            chain.run.race.speculate.set()
+        return False
+
+    def _apply_cached_fix(self, chain: "_AttemptChain", attempt: int, attempt_log: Dict[str, Any]) -> bool:
+        """
+        Replaces the failed code with a cached fix for its failure signature, if there is one that was
+        not tried yet in this chain. Returns True if the next attempt should run the fixed code.
+        """
+        chain.signature = failure_signature(chain.execution_result["stderr"]) if self.fix_cache is not None else None
+        # Each signature gets one local fix per run; if that does not help, the LLM retries.
+        known_fix = None
+        if chain.signature and chain.signature not in chain.tried_signatures:
+            chain.tried_signatures.add(chain.signature)
+            with span("fix_cache.apply", attempt=attempt) as attributes:
+                known_fix = self.fix_cache.apply(chain.signature, chain.current_code)
+                attributes["hit"] = known_fix is not None
+        if known_fix is None:
+            return False
+        print(f"{chain.log_prefix}: Applying cached fix for '{chain.signature}' (Retry {attempt + 1}/{self.max_retries}, no LLM call).")
+        attempt_log["local_fix"] = {"signature": chain.signature, "fix_id": known_fix[1]}
+        chain.pending_fix = (chain.signature, chain.current_code, known_fix[1])
+        chain.current_code = known_fix[0]
+        return True
+
+    def _regenerated(self, chain: "_AttemptChain", failed_code: str, regeneration_started: float):
+        if chain.signature:
+            self.fix_cache.record_retry_time(time.perf_counter() - regeneration_started)
+            chain.pending_fix = (chain.signature, failed_code, None)
+
+    @staticmethod
+    def _regeneration_failed(attempt: int, attempt_log: Dict[str, Any], e: Exception):
+        error_msg = f"Error during feedback code generation (attempt {attempt+1}): {e}\n{traceback.format_exc()}"
+        print(error_msg, file=sys.stderr)
+        attempt_log["error_in_regeneration"] = error_msg 
+
+    def _execute_candidate(self, run: "_CandidateRun", code: str, script_filepath: str, attempt: int) -> Dict[str, Any] | None:
+        """
+        Executes a candidate's script under a unique experiment name so it cannot collide with the other
+        candidates. Returns None if the race was decided before execution started. A run cancelled
+        mid-way has its experiment cancelled and deleted before this returns.
+        """
+        code, run.experiment_name = self._isolate(code, candidate=run.index)
+        run.idle.clear()
+        try:
+            if run.race.cancel_event.is_set():
+                run.cancelled = True
+                return None
+            print(f"FeedbackHandler[candidate {run.index}]: Executing code for attempt {attempt}...")
+            execution_result = self._execute(code, script_filepath, attempt, cancel_event=run.race.cancel_event)
+            if execution_result.get("abort_reason") == "cancelled":
+                run.cancelled = True
+                self._cleanup_candidate(run, execution_result)
+            return execution_result
+        finally:
+            run.idle.set()
+
+    def _isolate(self, code: str, candidate: int = None) -> Tuple[str, Optional[str]]:
+        """
+        Makes the script's experiment name unique to this run: `_<work_tag>` plus `_c<i>` for a
+        candidate. Returns (code, the experiment name if it is a literal). Without a work tag a
+        single chain's script is left as is.
+        """
+        suffix = (f"_{self.work_tag}" if self.work_tag else "") + (f"_c{candidate}" if candidate is not None else "")
+        if not suffix:
+            return code, None
+        isolated_code, experiment_name, isolated = isolate_experiment(code, suffix)
+        if not isolated:
+            owner = f"Candidate {candidate}" if candidate is not None else f"Run {self.work_tag}"
+            self.logger.warning(f"{owner}: could not make the experiment name unique; it may collide with "
+                                f"concurrent runs.")
+        return isolated_code, experiment_name
+
+    def _cleanup_candidate(self, run: "_CandidateRun", execution_result: Dict[str, Any]):
+        """Cancels and deletes the experiment a cancelled candidate had prepared, if it got that far."""
+        experiment_name = run.experiment_name or experiment_name_from_output(execution_result.get("stdout"))
+        if not experiment_name:
+            return
+        with span("candidate.cleanup", candidate=run.index, experiment=experiment_name) as attributes:
+            result = self.script_executor.run_script(cleanup_script(self.netunicorn_credentials, experiment_name))
+            attributes.update(success=result["success"])
+        run.cleaned_up = experiment_name
+        print(f"FeedbackHandler[candidate {run.index}]: Cleaned up experiment '{experiment_name}'.")
+
+    def _run_candidate(self, run: "_CandidateRun", user_prompt: str, save_script_base_path: str):
+        with span("candidate", candidate=run.index) as attributes:
+            try:
+                if run.index > 0:
+                    run.race.speculate.wait()
+                if run.race.cancel_event.is_set():
+                    run.cancelled = True
+                else:
+                    run.started = True
+                    run.outcome = self._run_attempts(user_prompt, save_script_base_path, run=run)
+            except Exception as e:
+                print(f"FeedbackHandler[candidate {run.index}]: Failed: {e}\n{traceback.format_exc()}", file=sys.stderr)
+            finally:
+                success = bool(run.outcome and run.outcome["success"])
+                attributes.update(started=run.started, success=success, cancelled=run.cancelled)
+                if run.index == 0 and not success:
+                    # Candidate 0 may fail before its first execution (e.g. generation error).
+                    run.race.speculate.set()
+                run.race.finish(run, success)
+
+    def _run_candidates(self, user_prompt: str, save_script_base_path: str = None) -> Dict[str, Any]:
+        """
+        Races `self.candidates` chains and returns the winner's outcome (candidate 0's if none succeeded).
+        Returns once the race is decided and every cancelled execution has been cleaned up; chains that
+        are still generating code are left to notice the cancellation on their own.
+        """
+        race = _CandidateRace()
+        if not self.speculate_on_failure:
+            race.speculate.set()
+        runs = [_CandidateRun(i, race) for i in range(self.candidates)]
+        for run in runs:
+            # Each thread runs in a copy of the caller's context so its spans join the caller's recording.
+            threading.Thread(target=contextvars.copy_context().run,
+                             args=(self._run_candidate, run, user_prompt, save_script_base_path),
+                             name=f"candidate-{run.index}", daemon=True).start()
+        with race.condition:
+            race.condition.wait_for(lambda: race.winner is not None or all(run.done for run in runs))
+        # Decided: stop the others and release chains still waiting to speculate.
+        race.cancel_event.set()
+        race.speculate.set()
+        for run in runs:
+            run.idle.wait()
+
+        chosen = race.winner if race.winner is not None else runs[0]
+        outcome = chosen.outcome or {
+            "final_code": "",
+            "report_log": list(chosen.report_log),
+            "success": False,
+            "last_execution_output": None,
+            "final_script_path": None
         }
+        if race.winner is not None:
+            print(f"FeedbackHandler: Candidate {race.winner.index} succeeded first.")
+        return {**outcome,
+                "winner": race.winner.index if race.winner is not None else None,
+                "candidates": [run.summary() for run in runs]}
 
     def _rename_final_script(self, current_filepath: str, final_name_override: str, is_successful: bool) -> str | None:
         """Helper to rename a script to its final_name_override and log appropriately."""
@@ -240,4 +645,82 @@ class FeedbackHandler:
         except OSError as e:
             status_log = "successful" if is_successful else "last failed"
             self.logger.error(f"Failed to rename {status_log} script '{current_filepath}' to '{new_final_path}': {e}. Keeping original attempt name.")
-            return current_filepath 
\ No newline at end of file
+            return current_filepath 
+
+
+class _CandidateRace:
+    """State shared by the candidates of one run_generation_with_feedback call."""
+
+    def __init__(self):
+        self.cancel_event = threading.Event()
+        # Set when the candidates after the first may start.
+        self.speculate = threading.Event()
+        self.condition = threading.Condition()
+        self.winner = None
+
+    def finish(self, run: "_CandidateRun", success: bool):
+        with self.condition:
+            run.done = True
+            if success and self.winner is None:
+                self.winner = run
+                self.cancel_event.set()
+            self.condition.notify_all()
+
+
+class _CandidateRun:
+    """One candidate chain: its progress, and whether it is between executions (idle)."""
+
+    def __init__(self, index: int, race: _CandidateRace):
+        self.index = index
+        self.race = race
+        self.idle = threading.Event()
+        self.idle.set()
+        self.report_log: List[Dict[str, Any]] = []
+        self.experiment_name = None
+        self.started = False
+        self.cancelled = False
+        self.cleaned_up = None
+        self.done = False
+        self.outcome = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "candidate": self.index,
+            "started": self.started,
+            "success": bool(self.outcome and self.outcome["success"]),
+            "cancelled": self.cancelled,
+            "attempts": len(self.report_log),
+            "cleaned_up_experiment": self.cleaned_up,
+        }
+
+
+class _AttemptChain:
+    """State of one generate/execute/feedback chain, shared by the sync and async loops."""
+
+    def __init__(self, user_prompt: str, run: "_CandidateRun" = None):
+        self.user_prompt = user_prompt
+        self.run = run
+        # Candidates pass their index to the generators (which vary temperature / context by it).
+        self.variant = {} if run is None else {"candidate": run.index}
+        self.log_prefix = "FeedbackHandler" if run is None else f"FeedbackHandler[candidate {run.index}]"
+        self.report_log: List[Dict[str, Any]] = []
+        if run is not None:
+            run.report_log = self.report_log
+        self.current_code = ""
+        self.execution_result = None
+        self.success = False
+        self.final_script_path = None
+        # Failure signature of the last failed attempt (None without a fix cache).
+        self.signature = None
+        # (failure signature, failed code, id of the locally replayed fix or None) of the last failed attempt.
+        self.pending_fix = None
+        self.tried_signatures = set()
+
+    def outcome(self) -> Dict[str, Any]:
+        return {
+            "final_code": self.current_code,
+            "report_log": self.report_log,
+            "success": self.success,
+            "last_execution_output": self.execution_result,
+            "final_script_path": self.final_script_path
+        }
@@ -0,0 +1,282 @@
+import difflib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .script_patcher import PatchError, ScriptPatcher
+
+# A retry that rewrote more lines than this is a regeneration, not a reusable fix.
+MAX_FIX_CHANGED_LINES = 12
+# Fixes whose replays failed this many times more often than they succeeded (the learning run
+# counts as one success) are dropped.
+MAX_FIX_FAILURES = 3
+
+_EXCEPTION_LINE = re.compile(r"^([A-Za-z_][\w.]*(?:Error|Exception|Exit))(?::\s*(.*))?$")
+_TRACEBACK_HEADER = "Traceback (most recent call last):"
+_VALIDATION_HEADER = "Static validation failed"
+_QUOTED = re.compile(r"(['\"])(.*?)\1")
+_HEX = re.compile(r"\b0x[0-9a-fA-F]+\b")
+_NUMBER = re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b")
+_LINE_NUMBER = re.compile(r"\(line \d+\)")
+_IDENTIFIER = re.compile(r"^[\w.]{1,40}$")
+_IMPORT_NAME = re.compile(r"(?:No module named|cannot import name) '([\w.]+)'(?: from '([\w.]+)')?")
+_TOKEN = re.compile(r"\w+|\S")
+
+
+def _mask_literal(match: re.Match) -> str:
+    """Keeps quoted identifiers (attribute, module and type names), masks quoted data."""
+    quote, value = match.group(1), match.group(2)
+    return match.group(0) if _IDENTIFIER.match(value) else f"{quote}<str>{quote}"
+
+
+def failure_signature(stderr: str) -> Optional[str]:
+    """
+    Normalizes a failing run's STDERR into a signature: the last exception's type and message with
+    data literals (numbers, addresses, free-text strings, paths) masked, plus the failing import for
+    import errors. Static validation failures are signed by their findings without line numbers.
+    Returns None if no exception or finding can be recognized.
+    """
+    if not stderr:
+        return None
+    if stderr.lstrip().startswith(_VALIDATION_HEADER):
+        findings = sorted({_LINE_NUMBER.sub("", line[2:]).strip()
+                           for line in stderr.splitlines() if line.startswith("- ")})
+        return "Validation: " + " | ".join(findings) if findings else None
+
+    tail = stderr[stderr.rfind(_TRACEBACK_HEADER):] if _TRACEBACK_HEADER in stderr else stderr
+    exception_type, message = None, ""
+    for line in tail.splitlines():
+        match = _EXCEPTION_LINE.match(line.rstrip())
+        if match:
+            exception_type, message = match.group(1), match.group(2) or ""
+    if exception_type is None:
+        return None
+    message = _QUOTED.sub(_mask_literal, message)
+    message = _NUMBER.sub("<num>", _HEX.sub("<addr>", message))
+    signature = f"{exception_type.split('.')[-1]}: {message}".strip()
+    import_match = _IMPORT_NAME.search(message)
+    if import_match:
+        signature += f" [import: {import_match.group(2) or import_match.group(1)}]"
+    return signature
+
+
+def _token_rule(old_line: str, new_line: str) -> Optional[Dict[str, str]]:
+    """
+    Turns a one-line change into a regex substitution over the changed tokens plus one token of
+    context on each side (e.g. `pprint.pprint(` -> `pprint(`), so it also applies to lines that
+    differ elsewhere (other variable names, other arguments).
+    """
+    old_spans = [m.span() for m in _TOKEN.finditer(old_line)]
+    new_spans = [m.span() for m in _TOKEN.finditer(new_line)]
+    old_tokens = [old_line[a:b] for a, b in old_spans]
+    new_tokens = [new_line[a:b] for a, b in new_spans]
+    changes = [op for op in difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False).get_opcodes() if op[0] != "equal"]
+    if len(changes) != 1:
+        return None
+    _, i1, i2, j1, j2 = changes[0]
+    before = min(1, i1, j1)
+    after = min(1, len(old_tokens) - i2, len(new_tokens) - j2)
+    old_context, new_context = old_tokens[i1 - before:i2 + after], (j1 - before, j2 + after)
+    # Without an identifier in the pattern the rule would rewrite unrelated punctuation.
+    if not any(len(token) > 1 and token[0].isalpha() for token in old_context):
+        return None
+    pattern = r"\s*".join(re.escape(token) for token in old_context)
+    if old_context[0][0].isalnum() or old_context[0][0] == "_":
+        pattern = r"\b" + pattern
+    if old_context[-1][-1].isalnum() or old_context[-1][-1] == "_":
+        pattern += r"\b"
+    start, end = new_context
+    replacement = new_line[new_spans[start][0]:new_spans[end - 1][1]] if end > start else ""
+    return {"kind": "token", "pattern": pattern, "replacement": replacement}
+
+
+def extract_fix(failed_code: str, fixed_code: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Diffs the failed script against the script that later succeeded and returns the change as
+    replayable rules: token substitutions for one-line changes, SEARCH/REPLACE line edits otherwise
+    (insertions are anchored on the preceding line). Returns None for no change or a rewrite.
+    """
+    old_lines, new_lines = failed_code.splitlines(), fixed_code.splitlines()
+    matcher = difflib.SequenceMatcher(None, [line.strip() for line in old_lines], [line.strip() for line in new_lines], autojunk=False)
+    opcodes = [op for op in matcher.get_opcodes() if op[0] != "equal"]
+    changed = sum(max(i2 - i1, j2 - j1) for _, i1, i2, j1, j2 in opcodes)
+    if not opcodes or changed > MAX_FIX_CHANGED_LINES:
+        return None
+    rules: List[Dict[str, Any]] = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "replace" and i2 - i1 == 1 and j2 - j1 == 1:
+            rule = _token_rule(old_lines[i1], new_lines[j1])
+            if rule:
+                rules.append(rule)
+                continue
+        if tag == "insert":
+            if i1 == 0:
+                continue
+            rules.append({"kind": "lines", "search": old_lines[i1 - 1:i1], "replace": old_lines[i1 - 1:i1] + new_lines[j1:j2]})
+        else:
+            rules.append({"kind": "lines", "search": old_lines[i1:i2], "replace": new_lines[j1:j2]})
+    return rules or None
+
+
+class FailureFixCache:
+    """
+    Persistent SQLite store of fixes learned across feedback runs.
+
+    When a retry succeeds, the change from the failed script to the successful one is recorded
+    under the failure's signature (see failure_signature). The next time a run fails with the same
+    signature, the known fix is replayed locally and the LLM retry is skipped. Each fix keeps
+    success and failure counts; fixes whose failures outnumber their successes by MAX_FIX_FAILURES are dropped.
+    """
+
+    def __init__(self, db_path: str, patcher: Optional[ScriptPatcher] = None):
+        """
+        Args:
+            db_path: Path of the SQLite file. Parent directories are created.
+            patcher: ScriptPatcher used to locate line edits. Defaults to one with the standard fuzzy ratio.
+        """
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_path = db_path
+        self.patcher = patcher or ScriptPatcher()
+        self.lookups = 0
+        self.hits = 0
+        self.fixes_succeeded = 0
+        self.fixes_failed = 0
+        self.learned = 0
+        self.time_saved_s = 0.0
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(f"FailureFixCache.{id(self)}")
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fixes ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " signature TEXT NOT NULL,"
+                " rules TEXT NOT NULL,"
+                " successes INTEGER NOT NULL DEFAULT 0,"
+                " failures INTEGER NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL,"
+                " last_used REAL,"
+                " UNIQUE (signature, rules))"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS retry_timings (total_s REAL NOT NULL, count INTEGER NOT NULL)")
+            if conn.execute("SELECT COUNT(*) FROM retry_timings").fetchone()[0] == 0:
+                conn.execute("INSERT INTO retry_timings (total_s, count) VALUES (0, 0)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """One transaction on a fresh connection, which is closed afterwards (sqlite3's own context manager only commits)."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, counter: str, amount: float = 1) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def _apply_rules(self, code: str, rules: List[Dict[str, Any]]) -> Tuple[str, int]:
+        """Applies every rule that matches; returns the new code and the number of rules applied."""
+        applied = 0
+        for rule in rules:
+            if rule["kind"] == "token":
+                code, count = re.subn(rule["pattern"], lambda _: rule["replacement"], code)
+                applied += bool(count)
+                continue
+            edit = "<<<<<<< SEARCH\n" + "\n".join(rule["search"]) + "\n=======\n" + "\n".join(rule["replace"]) + "\n>>>>>>> REPLACE"
+            try:
+                code = self.patcher.apply(code, edit)
+                applied += 1
+            except PatchError:
+                continue
+        return code, applied
+
+    def apply(self, signature: str, code: str) -> Optional[Tuple[str, int]]:
+        """
+        Replays the best known fix for `signature` on `code`. Fixes are tried by success count; the
+        first one that changes the script and still compiles wins.
+
+        Returns:
+            (fixed code, fix id), or None if no known fix applies.
+        """
+        self._count("lookups")
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, rules FROM fixes WHERE signature = ? ORDER BY successes - failures DESC, created_at DESC",
+                (signature,),
+            ).fetchall()
+        for fix_id, rules in rows:
+            fixed, applied = self._apply_rules(code, json.loads(rules))
+            if not applied or fixed == code:
+                continue
+            try:
+                compile(fixed, "<fix_cache>", "exec")
+            except SyntaxError:
+                continue
+            with self._connect() as conn:
+                conn.execute("UPDATE fixes SET last_used = ? WHERE id = ?", (time.time(), fix_id))
+            self._count("hits")
+            return fixed, fix_id
+        return None
+
+    def learn(self, signature: str, failed_code: str, fixed_code: str) -> bool:
+        """Records the change from `failed_code` to `fixed_code` as a fix for `signature`. Returns True if stored."""
+        rules = extract_fix(failed_code, fixed_code)
+        if not rules:
+            return False
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO fixes (signature, rules, successes, created_at) VALUES (?, ?, 1, ?)",
+                (signature, json.dumps(rules, sort_keys=True), time.time()),
+            )
+            stored = bool(cursor.rowcount)
+        if stored:
+            self._count("learned")
+            self.logger.info(f"Learned a {len(rules)}-rule fix for: {signature}")
+        return stored
+
+    def report(self, fix_id: int, success: bool) -> None:
+        """Records the outcome of a replayed fix; a success is credited with one average LLM retry of saved time."""
+        with self._connect() as conn:
+            column = "successes" if success else "failures"
+            conn.execute(f"UPDATE fixes SET {column} = {column} + 1 WHERE id = ?", (fix_id,))
+            conn.execute("DELETE FROM fixes WHERE id = ? AND failures - successes >= ?", (fix_id, MAX_FIX_FAILURES))
+        if success:
+            self._count("fixes_succeeded")
+            self._count("time_saved_s", self.average_retry_seconds())
+        else:
+            self._count("fixes_failed")
+
+    def record_retry_time(self, seconds: float) -> None:
+        """Adds one LLM retry duration to the persistent average used to estimate time saved."""
+        with self._connect() as conn:
+            conn.execute("UPDATE retry_timings SET total_s = total_s + ?, count = count + 1", (seconds,))
+
+    def average_retry_seconds(self) -> float:
+        with self._connect() as conn:
+            total, count = conn.execute("SELECT total_s, count FROM retry_timings").fetchone()
+        return total / count if count else 0.0
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM fixes")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "misses": self.lookups - self.hits,
+            "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+            "fixes_succeeded": self.fixes_succeeded,
+            "fixes_failed": self.fixes_failed,
+            "learned": self.learned,
+            "time_saved_s": round(self.time_saved_s, 3),
+        }
@@ -0,0 +1,157 @@
+import ast
+from typing import Dict, List, Optional, Tuple
+
+from .script_validator import find_undefined_names
+from .task_catalog import STDLIB_IMPORTS, TaskCatalog
+
+REPAIRED_PACKAGES = ("netunicorn", "returns")
+
+
+class ImportRepairer:
+    """
+    AST pass over a generated script that fixes what the task catalog already knows, without an LLM
+    retry: moves `from <wrong module> import Task` to the task's documented module, adds imports for
+    catalogued or standard-library names that are used but never imported, and sets (or fixes) the
+    experiment's environment definition when a task requires one.
+    """
+
+    def __init__(self, catalog: Optional[TaskCatalog] = None):
+        """
+        Args:
+            catalog: Task catalog to repair against. Defaults to the shared data/task_catalog.json.
+        """
+        self.catalog = catalog or TaskCatalog.load()
+
+    def _target_module(self, name: str, module: str) -> Optional[str]:
+        """The documented module for `name` if `module` is wrong, else None."""
+        modules = self.catalog.modules_for(name)
+        if not modules or module in modules:
+            return None
+        if len(modules) == 1:
+            return next(iter(modules))
+        # Several documented homes (e.g. tcpdump/tshark StartCapture): only fix if one shares the most path.
+        def shared(candidate: str) -> int:
+            count = 0
+            for left, right in zip(candidate.split("."), module.split(".")):
+                if left != right:
+                    break
+                count += 1
+            return count
+        ranked = sorted(modules, key=shared, reverse=True)
+        return ranked[0] if shared(ranked[0]) > shared(ranked[1]) else None
+
+    def repair(self, code: str) -> Tuple[str, List[str]]:
+        """
+        Returns the repaired script and a list of human-readable descriptions of the fixes made.
+        Scripts that do not parse are returned unchanged.
+        """
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return code, []
+
+        lines = code.splitlines()
+        fixes: List[str] = []
+        # (first line index, last line index, replacement lines); insertions have last = first - 1.
+        edits: List[Tuple[int, int, List[str]]] = []
+
+        for node in ast.walk(tree):
+            if not (isinstance(node, ast.ImportFrom) and node.module and node.level == 0
+                    and node.module.split(".")[0] in REPAIRED_PACKAGES):
+                continue
+            groups: Dict[str, List[str]] = {}
+            changed = False
+            for alias in node.names:
+                target = self._target_module(alias.name, node.module)
+                if target:
+                    changed = True
+                    fixes.append(f"Moved import of {alias.name} from {node.module} to {target}.")
+                text = alias.name + (f" as {alias.asname}" if alias.asname else "")
+                groups.setdefault(target or node.module, []).append(text)
+            if changed:
+                indent = " " * node.col_offset
+                edits.append((node.lineno - 1, node.end_lineno - 1,
+                              [f"{indent}from {module} import {', '.join(names)}" for module, names in groups.items()]))
+
+        missing = self._missing_imports(tree)
+        environment_edits = self._environment_edits(tree, lines, missing, fixes)
+        if missing:
+            for statement in missing:
+                fixes.append(f"Added missing import: {statement}")
+            top_level_imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+            if top_level_imports:
+                insert_at = max(node.end_lineno for node in top_level_imports)
+            elif tree.body and isinstance(tree.body[0], ast.Expr) and isinstance(tree.body[0].value, ast.Constant):
+                insert_at = tree.body[0].end_lineno
+            else:
+                insert_at = 0
+            edits.append((insert_at, insert_at - 1, missing))
+        edits.extend(environment_edits)
+
+        if not edits:
+            return code, []
+        # Apply bottom-up so earlier line numbers stay valid.
+        for first, last, replacement in sorted(edits, key=lambda edit: (edit[0], edit[1]), reverse=True):
+            lines[first:last + 1] = replacement
+        return "\n".join(lines) + ("\n" if code.endswith("\n") else ""), fixes
+
+    def _missing_imports(self, tree: ast.AST) -> List[str]:
+        undefined = {node.id for node in find_undefined_names(tree)}
+        attribute_bases = {node.value.id for node in ast.walk(tree)
+                           if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name)}
+        statements: List[str] = []
+        from_imports: Dict[str, List[str]] = {}
+        for name in sorted(undefined):
+            if name in STDLIB_IMPORTS:
+                # `pprint.pprint(...)` needs the module, `pprint(...)` the function.
+                statements.append(f"import {name}" if name in attribute_bases else STDLIB_IMPORTS[name])
+                continue
+            module = self.catalog.unique_module(name)
+            if module:
+                from_imports.setdefault(module, []).append(name)
+        statements.extend(f"from {module} import {', '.join(names)}" for module, names in from_imports.items())
+        return statements
+
+    def _environment_edits(self, tree: ast.AST, lines: List[str], missing: List[str],
+                           fixes: List[str]) -> List[Tuple[int, int, List[str]]]:
+        required = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+                environment = self.catalog.environment_for(node.func.id)
+                if environment:
+                    required.add(environment)
+
+        edits: List[Tuple[int, int, List[str]]] = []
+        assigned = False
+        for node in ast.walk(tree):
+            if not (isinstance(node, ast.Assign) and any(
+                    isinstance(target, ast.Attribute) and target.attr == "environment_definition" for target in node.targets)):
+                continue
+            assigned = True
+            value = node.value
+            # `experiment.environment_definition = ShellExecution` assigns the class, not an instance.
+            if (isinstance(value, ast.Name) and self.catalog.unique_module(value.id) == "netunicorn.base.environment_definitions"
+                    and value.lineno == value.end_lineno):
+                line = lines[value.lineno - 1]
+                edits.append((value.lineno - 1, value.lineno - 1,
+                              [line[:value.end_col_offset] + "()" + line[value.end_col_offset:]]))
+                fixes.append(f"Instantiated {value.id} in the environment definition (line {value.lineno}).")
+
+        if len(required) != 1 or assigned:
+            return edits
+        environment = required.pop()
+        for node in ast.walk(tree):
+            if not (isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)):
+                continue
+            if any(isinstance(call, ast.Call) and isinstance(call.func, ast.Name) and call.func.id == "Experiment"
+                   for call in ast.walk(node.value)):
+                indent = " " * node.col_offset
+                edits.append((node.end_lineno, node.end_lineno - 1,
+                              [f"{indent}{node.targets[0].id}.environment_definition = {environment}()"]))
+                fixes.append(f"Set {node.targets[0].id}.environment_definition = {environment}() required by the pipeline's tasks.")
+                bound = {alias.asname or alias.name for imp in ast.walk(tree) if isinstance(imp, ast.ImportFrom) for alias in imp.names}
+                module = self.catalog.unique_module(environment)
+                if environment not in bound and module and not any(environment in statement for statement in missing):
+                    missing.append(f"from {module} import {environment}")
+                break
+        return edits
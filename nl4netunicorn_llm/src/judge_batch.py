@@ -0,0 +1,199 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List
+
+from .context_judge import JUDGE_ASPECTS
+
+CSV_FIELDS = ["prompt", "judge_model", "k", *JUDGE_ASPECTS, "latency_s", "judged_at", "chunk_ids", "key", "error"]
+
+
+class RateLimiter:
+    """Spaces calls at least 60 / requests_per_minute seconds apart, across threads (0 = no limit)."""
+
+    def __init__(self, requests_per_minute: float = 0):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def judgement_key(prompt: str, chunk_ids: List[str], judge_model: str) -> str:
+    """Identifies a judgement: the same prompt, shown the same chunks (in order), by the same model."""
+    payload = json.dumps({"prompt": prompt, "chunk_ids": chunk_ids, "judge_model": judge_model}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class JudgeResultStore:
+    """
+    Append-only JSON lines file of judgements. Successful judgements found in the file are not
+    repeated, so an interrupted sweep resumes where it stopped; failed ones are retried.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut off by an interrupted run.
+                        logging.warning(f"Judge results: skipping unreadable line {line_number} of {path}.")
+                        continue
+                    if not record.get("error"):
+                        self._records[record["key"]] = record
+
+    def get(self, key: str) -> Dict[str, Any] | None:
+        return self._records.get(key)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+            if not record.get("error"):
+                self._records[record["key"]] = record
+
+
+def write_csv(records: Iterable[Dict[str, Any]], path: str) -> None:
+    """One row per judgement with a column per aspect (empty if the judge gave no score)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for record in records:
+            row = {field: record.get(field) for field in CSV_FIELDS if field not in JUDGE_ASPECTS}
+            row.update({aspect: record.get("scores", {}).get(aspect) for aspect in JUDGE_ASPECTS})
+            row["chunk_ids"] = ";".join(record.get("chunk_ids", []))
+            writer.writerow(row)
+
+
+def summarize_scores(records: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Per aspect: number of scored judgements, mean, and how many got each score 0-5."""
+    values = {aspect: [] for aspect in JUDGE_ASPECTS}
+    for record in records:
+        for aspect, score in (record.get("scores") or {}).items():
+            if aspect in values:
+                values[aspect].append(score)
+    summary = {}
+    for aspect, scores in values.items():
+        distribution = {str(score): 0 for score in range(6)}
+        for score in scores:
+            # Half-up, so 2.5 and 3.5 both land on the higher score (round() would split them).
+            distribution[str(int(score + 0.5))] += 1
+        summary[aspect] = {
+            "count": len(scores),
+            "mean": round(sum(scores) / len(scores), 3) if scores else None,
+            "distribution": distribution,
+        }
+    return summary
+
+
+def format_score_summary(summary: Dict[str, Dict[str, Any]]) -> str:
+    lines = [f"{'aspect':<12} {'n':>4} {'mean':>6}   " + " ".join(f"{score:>4}" for score in range(6))]
+    for aspect, stats in summary.items():
+        mean = f"{stats['mean']:.2f}" if stats["mean"] is not None else "-"
+        counts = " ".join(f"{stats['distribution'][str(score)]:>4}" for score in range(6))
+        lines.append(f"{aspect:<12} {stats['count']:>4} {mean:>6}   {counts}")
+    return "\n".join(lines)
+
+
+def run_judge_batch(prompts: List[str],
+                    retrieve: Callable[[str], list],
+                    chunk_id: Callable[[Any], str],
+                    judge: Any,
+                    store: JudgeResultStore,
+                    k: int,
+                    concurrency: int = 4,
+                    rate_limiter: RateLimiter = None,
+                    rejudge: bool = False) -> Dict[str, Any]:
+    """
+    Judges the retrieved context of every prompt. Retrieval runs first, one prompt after another
+    with the one retriever; judge calls then run `concurrency` at a time, spaced by `rate_limiter`.
+    Prompts already judged with the same chunks and model are taken from `store` unless `rejudge`.
+
+    Args:
+        prompts: The prompts to judge.
+        retrieve: Returns the chunks for a prompt (e.g. functools.partial(rag.retrieve, k=k)).
+        chunk_id: Stable id of a retrieved chunk.
+        judge: A ContextJudge.
+        store: Where judgements are read from and appended to.
+        k: Number of chunks retrieved (recorded with each judgement).
+        concurrency: Judge calls in flight at once.
+        rate_limiter: Optional. Spaces the judge calls.
+        rejudge: Judge every prompt again even if the store has a matching judgement.
+
+    Returns:
+        {"records": [one judgement per prompt, in prompt order], "judged": int, "skipped": int,
+         "failed": int, "wall_time_s": float}
+    """
+    started = time.perf_counter()
+    rate_limiter = rate_limiter or RateLimiter()
+    records: List[Dict[str, Any] | None] = [None] * len(prompts)
+    pending = []
+    for index, prompt in enumerate(prompts):
+        docs = retrieve(prompt)
+        chunk_ids = [chunk_id(doc) for doc in docs]
+        key = judgement_key(prompt, chunk_ids, judge.model_name)
+        existing = None if rejudge else store.get(key)
+        if existing is not None:
+            records[index] = existing
+        else:
+            pending.append((index, prompt, docs, chunk_ids, key))
+    skipped = len(prompts) - len(pending)
+    logging.info(f"Judge batch: {len(prompts)} prompt(s), {skipped} already judged, {len(pending)} to judge.")
+
+    def judge_one(prompt: str, docs: list, chunk_ids: List[str], key: str) -> Dict[str, Any]:
+        rate_limiter.wait()
+        call_started = time.perf_counter()
+        record = {"key": key, "prompt": prompt, "judge_model": judge.model_name, "k": k, "chunk_ids": chunk_ids}
+        try:
+            judgement = judge.judge(prompt, docs)
+            record.update(scores=judgement["score_values"], scores_text=judgement["scores"],
+                          assessment=judgement["assessment"], error=None)
+        except Exception as e:
+            record.update(scores={}, scores_text=None, assessment=None, error=f"{type(e).__name__}: {e}")
+        record.update(latency_s=round(time.perf_counter() - call_started, 3), judged_at=datetime.now().isoformat())
+        store.add(record)
+        return record
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="judge_worker") as pool:
+        futures = {pool.submit(judge_one, prompt, docs, chunk_ids, key): index
+                   for index, prompt, docs, chunk_ids, key in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            records[futures[future]] = record
+            if record["error"]:
+                failed += 1
+                logging.error(f"Judge batch: [{done}/{len(pending)}] failed: {record['error']}")
+            else:
+                logging.info(f"Judge batch: [{done}/{len(pending)}] {record['scores']} ({record['latency_s']}s)")
+
+    return {
+        "records": records,
+        "judged": len(pending) - failed,
+        "skipped": skipped,
+        "failed": failed,
+        "wall_time_s": round(time.perf_counter() - started, 3),
+    }
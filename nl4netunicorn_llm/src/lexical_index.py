@@ -0,0 +1,75 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+_WORD_RE = re.compile(r"[A-Za-z0-9_]+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by can for from has have if in into is it its of on or so such that the then "
+    "this to was were will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens. Identifiers are kept whole and also split into their parts, so that
+    `OoklaSpeedtest` matches both the exact class name and a query like "ookla speedtest", and
+    `netunicorn.library.tasks.basic` matches each path component.
+    """
+    tokens: List[str] = []
+    for word in _WORD_RE.findall(text):
+        lowered = word.lower()
+        if lowered in _STOPWORDS:
+            continue
+        tokens.append(lowered)
+        parts = [part.lower() for piece in word.split("_") for part in _CAMEL_RE.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part not in _STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """In-process inverted index with Okapi BM25 scoring over a fixed list of texts."""
+
+    def __init__(self, texts: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(texts)
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.doc_lengths: List[int] = []
+
+        for doc_index, text in enumerate(texts):
+            term_counts = Counter(tokenize(text))
+            self.doc_lengths.append(sum(term_counts.values()))
+            for term, count in term_counts.items():
+                self.postings.setdefault(term, []).append((doc_index, count))
+
+        self.avg_doc_length = (sum(self.doc_lengths) / self.size) if self.size else 0.0
+        self.idf: Dict[str, float] = {
+            term: math.log(1 + (self.size - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[int, float]]:
+        """Returns up to `k` (text index, score) pairs with a positive score, best first."""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            for doc_index, count in postings:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_index] / (self.avg_doc_length or 1.0)
+                scores[doc_index] = scores.get(doc_index, 0.0) + idf * count * (self.k1 + 1) / (count + self.k1 * length_norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int, rrf_k: int = 60) -> List[str]:
+    """Fuses several ranked id lists into one (Reciprocal Rank Fusion) and returns the top `k` ids."""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking):
+            fused[item_id] = fused.get(item_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(fused, key=lambda item_id: fused[item_id], reverse=True)[:k]
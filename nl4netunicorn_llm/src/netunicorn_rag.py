@@ -1,28 +1,85 @@
+from __future__ import annotations
+
+import time
+
+_MODULE_IMPORT_START = time.perf_counter()
+
+import asyncio
 import os
 import json
+import hashlib
 import datetime
+import functools
+import importlib
 import logging 
+import pickle
+import threading
 import sys 
 import traceback 
 from dotenv import load_dotenv
-from typing import Dict, Any 
+from typing import Dict, Any, Callable, TYPE_CHECKING
 
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.chains import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from langchain_core.documents import Document
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
 
-from .script_executor import ScriptExecutor
+from .script_executor import ScriptExecutor, DryRunScriptExecutor
+from .script_validator import ScriptValidator
+from .warm_executor import WarmScriptExecutor
 from .feedback_handler import FeedbackHandler
+from .embedding_store import EmbeddingStore
+from .llm_cache import LLMResponseCache
+from .lexical_index import BM25Index, reciprocal_rank_fusion
+from .context_assembler import ContextAssembler
+from .script_patcher import ScriptPatcher, PatchError
+from .code_stream import CodeStream
+from .template_synthesizer import TemplateSynthesizer
+from .task_catalog import TaskCatalog
+from .import_repair import ImportRepairer
+from .fix_cache import FailureFixCache
+from .vector_index import VectorIndexBuilder
+from .spans import recording, span
 
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 GENERATED_SCRIPTS_DIR = "nl4netunicorn_llm/generated_scripts" 
 FEEDBACK_ATTEMPTS_DIR = "nl4netunicorn_llm/generated_scripts/feedback_attempts"
+INDEX_CACHE_DIR = "nl4netunicorn_llm/index_cache"
+LLM_CACHE_PATH = "nl4netunicorn_llm/llm_cache/responses.sqlite3"
+FIX_CACHE_PATH = "nl4netunicorn_llm/llm_cache/fixes.sqlite3"
+
+LLM_MODEL = "gpt-3.5-turbo"
+EMBEDDING_MODEL = "text-embedding-ada-002"
+LOCAL_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_PROVIDERS = ("openai", "local")
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+RETRIEVAL_K = 4  # Same as the langchain retriever default used before hybrid retrieval.
+RETRIEVAL_MODES = ("hybrid", "vector", "lexical")
+RETRY_MODES = ("full", "patch")
+# Sampling temperatures of speculative candidates 1, 2, 3, ... (candidate 0 keeps temperature 0).
+CANDIDATE_TEMPERATURES = (0.4, 0.7, 1.0)
+
+
+# Seconds spent importing each heavy dependency, filled in by _lazy_import.
+_IMPORT_TIMINGS: Dict[str, float] = {}
+
+
+def _lazy_import(module_name: str, attribute: str):
+    """Imports `attribute` from `module_name` on first use, recording how long the import took."""
+    if module_name not in _IMPORT_TIMINGS:
+        start = time.perf_counter()
+        importlib.import_module(module_name)
+        _IMPORT_TIMINGS[module_name] = time.perf_counter() - start
+    return getattr(sys.modules[module_name], attribute)
+
+
+def load_dry_run_scenario(path: str = None) -> Dict[str, Any] | None:
+    """Reads a dry-run scenario JSON file (see fake_netunicorn.DEFAULT_SCENARIO for the keys)."""
+    if not path:
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
 
 
 _INITIAL_SYSTEM_PROMPT_TEMPLATE = """
@@ -139,7 +196,6 @@ Key script structure:
 # Poll for Completion (while loop, client.get_experiment_status, check .status != ExperimentStatus.RUNNING, time.sleep)
 # Process Results (get final_status_info, check .status, iterate .execution_result, use report.node.name, unpack report.result, handle returns.Result with is_successful/unwrap/failure, print logs from log_list)
 ```
-The user request is: {input}
 Generate the full Python script now.
 """
 
@@ -200,8 +256,64 @@ If you believe the previous code was correct and no changes are needed, respond
 Corrected Python script or "PREVIOUS_CODE_CORRECT":
 """
 
+_PATCH_RETRY_SYSTEM_PROMPT_TEMPLATE = """
+You are an expert Python programmer specializing in the NetUnicorn library.
+Your task is to fix a previously generated NetUnicorn Python script based on execution feedback by returning ONLY the edits needed, not the whole script.
+The original user request was: {original_request}
+The relevant documentation context (if any was used for the previous attempt) is:
+<context>
+{context}
+</context>
+
+The PREVIOUSLY generated script was:
+```python
+{previous_code}
+```
+
+When this script was executed, it produced the following output:
+STDOUT:
+```text
+{execution_stdout}
+```
+STDERR:
+```text
+{execution_stderr}
+```
+
+Identify the cause of the error or failure and fix it with the smallest possible change. Keep the credentials, experiment naming, cleanup, polling and result processing unchanged unless they cause the failure.
+Answer with one or more SEARCH/REPLACE blocks in exactly this format:
+<<<<<<< SEARCH
+lines copied exactly from the previous script, with enough surrounding lines to be unique
+=======
+the lines that replace them
+>>>>>>> REPLACE
+
+To add a missing import, SEARCH for an existing import line and REPLACE it with that line plus the new import.
+Do not include any explanatory text before or after the blocks.
+If you believe the previous code was correct and no changes are needed, respond with the special string "PREVIOUS_CODE_CORRECT" instead.
+
+Edits or "PREVIOUS_CODE_CORRECT":
+"""
+
 class NetUnicornRAG:
-    def __init__(self, docs_path="nl4netunicorn_llm/data/netunicorn_docs.json", generated_scripts_dir=None):
+    def __init__(self, docs_path="nl4netunicorn_llm/data/netunicorn_docs.json", generated_scripts_dir=None,
+                 index_cache_dir=None, use_index_cache=True, lazy=False,
+                 use_llm_cache=True, llm_cache_bypass=False, retrieval_mode="hybrid",
+                 embedding_provider="openai", embedding_model=None, validate_scripts=True,
+                 warm_workers=0, dry_run=False, dry_run_scenario=None, retry_mode="full",
+                 use_templates=True, repair_imports=True, use_fix_cache=True,
+                 chat_model=None, embeddings=None, index_type="flat", index_params=None, mmap_index=True,
+                 candidates=1, speculate_on_failure=False, require_netunicorn_credentials=True):
+        init_start = time.perf_counter()
+        self.startup_timings: Dict[str, float] = {}
+        self._components: Dict[str, Any] = {}
+        # Re-entrant because building one component (e.g. the vector store) touches others.
+        self._components_lock = threading.RLock()
+        # Injected models (e.g. the deterministic fakes in benchmarks/) replace the OpenAI/local clients.
+        if chat_model is not None:
+            self._components["llm"] = chat_model
+        if embeddings is not None:
+            self._components["embeddings"] = embeddings
         load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", "..", ".env"))
 
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
@@ -211,13 +323,36 @@ class NetUnicornRAG:
         self.netunicorn_endpoint = os.getenv("NETUNICORN_ENDPOINT")
         self.netunicorn_login = os.getenv("NETUNICORN_LOGIN")
         self.netunicorn_password = os.getenv("NETUNICORN_PASSWORD")
-        if not all([self.netunicorn_endpoint, self.netunicorn_login, self.netunicorn_password]):
+        if dry_run and not all([self.netunicorn_endpoint, self.netunicorn_login, self.netunicorn_password]):
+            # Dry runs never contact NetUnicorn, so placeholder credentials are enough.
+            self.netunicorn_endpoint = self.netunicorn_endpoint or "http://dry-run.invalid"
+            self.netunicorn_login = self.netunicorn_login or "dry-run"
+            self.netunicorn_password = self.netunicorn_password or "dry-run"
+        # Retrieval-only users (e.g. the context judge) never run scripts and may skip the check;
+        # generate_code still refuses to run without credentials.
+        if require_netunicorn_credentials and not self._has_netunicorn_credentials():
             raise ValueError("NetUnicorn credentials not found. Ensure .env is in the project root.")
 
         project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
         
         self.generated_scripts_base_path = os.path.join(project_root, generated_scripts_dir or GENERATED_SCRIPTS_DIR)
         self.feedback_attempts_path = os.path.join(project_root, FEEDBACK_ATTEMPTS_DIR)
+        self.index_cache_path = os.path.join(project_root, index_cache_dir or INDEX_CACHE_DIR)
+        self.use_index_cache = use_index_cache
+        # flat (exact), ivf or hnsw; raises ValueError for unknown types or parameters.
+        self.index_builder = VectorIndexBuilder(index_type, index_params)
+        # Cache hits memory-map the stored index read-only, so processes share one copy of the vectors.
+        self.mmap_index = mmap_index
+        self.llm_cache_path = os.path.join(project_root, LLM_CACHE_PATH)
+        self.use_llm_cache = use_llm_cache
+        self.llm_cache_bypass = llm_cache_bypass
+        self.fix_cache_path = os.path.join(project_root, FIX_CACHE_PATH)
+        self.use_fix_cache = use_fix_cache
+        if candidates < 1:
+            raise ValueError(f"candidates must be at least 1, got {candidates}")
+        # candidates > 1 races that many generate/execute/feedback chains per prompt (see FeedbackHandler).
+        self.candidates = candidates
+        self.speculate_on_failure = speculate_on_failure
 
         os.makedirs(self.generated_scripts_base_path, exist_ok=True)
         os.makedirs(self.feedback_attempts_path, exist_ok=True)
@@ -225,85 +360,572 @@ class NetUnicornRAG:
         logging.info(f"Generated scripts will be saved in: {self.generated_scripts_base_path}")
         logging.info(f"Feedback attempt scripts will be saved in: {self.feedback_attempts_path}")
 
-        self.llm = ChatOpenAI(openai_api_key=self.openai_api_key, model_name="gpt-3.5-turbo", temperature=0.0)
-        self.embeddings = OpenAIEmbeddings(openai_api_key=self.openai_api_key)
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval_mode '{retrieval_mode}'. Expected one of: {', '.join(RETRIEVAL_MODES)}")
+        self.retrieval_mode = retrieval_mode
+        if embedding_provider not in EMBEDDING_PROVIDERS:
+            raise ValueError(f"Unknown embedding_provider '{embedding_provider}'. Expected one of: {', '.join(EMBEDDING_PROVIDERS)}")
+        self.embedding_provider = embedding_provider
+        if retry_mode not in RETRY_MODES:
+            raise ValueError(f"Unknown retry_mode '{retry_mode}'. Expected one of: {', '.join(RETRY_MODES)}")
+        # "patch" asks retries for SEARCH/REPLACE edits instead of the whole script.
+        self.retry_mode = retry_mode
+        self.script_patcher = ScriptPatcher()
+        self.llm_model = LLM_MODEL
+        self.embedding_model = embedding_model or (LOCAL_EMBEDDING_MODEL if embedding_provider == "local" else EMBEDDING_MODEL)
 
         if not os.path.isabs(docs_path):
             docs_path = os.path.join(project_root, docs_path if docs_path.startswith("nl4netunicorn_llm/") else os.path.join("nl4netunicorn_llm", docs_path))
+        self.docs_path = docs_path
         
-        self.docs = self._load_documents(docs_path)
-        self.vector_store = self._create_vector_store(self.docs)
-        
-        self.initial_rag_chain = self._setup_initial_rag_chain()
-        self.feedback_rag_chain = self._setup_feedback_rag_chain()
-        
-        self.script_executor = ScriptExecutor()
+        # warm_workers > 0 runs attempts in children forked from interpreters that already imported netunicorn.
+        # dry_run runs them against the local fake NetUnicorn client instead of the real endpoint.
+        if dry_run:
+            if warm_workers > 0:
+                logging.warning("RAG: warm_workers is ignored in dry-run mode.")
+            self.script_executor = DryRunScriptExecutor(scenario=dry_run_scenario)
+        elif warm_workers > 0:
+            self.script_executor = WarmScriptExecutor(pool_size=warm_workers)
+        else:
+            self.script_executor = ScriptExecutor()
+        self.script_validator = ScriptValidator() if validate_scripts else None
+        # Fixes task import paths, missing imports and environment definitions from the task catalog.
+        self.import_repairer = ImportRepairer(TaskCatalog.load()) if repair_imports else None
+        # Plain "N nodes, tasks A then B" requests are filled into a fixed skeleton without calling the LLM.
+        self.template_synthesizer = TemplateSynthesizer(self.script_validator) if use_templates else None
+        # Merges/dedupes retrieved chunks and keeps context, STDOUT and STDERR within token budgets.
+        self.context_assembler = ContextAssembler(self.llm_model)
+
+        # In lazy mode every heavy component (and the import behind it) is built on first access.
+        if not lazy:
+            self.llm
+            self.lexical_index
+            if self.retrieval_mode != "lexical":
+                self.vector_store
+            self.initial_docs_chain
+            self.feedback_docs_chain
+            self.llm_cache
+        self.startup_timings["__init__"] = time.perf_counter() - init_start
+
+    def _component(self, name: str, factory: Callable[[], Any]) -> Any:
+        if name not in self._components:
+            with self._components_lock:
+                if name not in self._components:
+                    start = time.perf_counter()
+                    self._components[name] = factory()
+                    self.startup_timings[name] = time.perf_counter() - start
+        return self._components[name]
+
+    @property
+    def llm(self):
+        ChatOpenAI = _lazy_import("langchain_openai", "ChatOpenAI")
+        return self._component("llm", lambda: ChatOpenAI(openai_api_key=self.openai_api_key, model_name=self.llm_model, temperature=0.0))
+
+    @property
+    def embeddings(self):
+        create_embeddings = _lazy_import(f"{__package__}.embedding_providers", "create_embeddings")
+        return self._component("embeddings", lambda: create_embeddings(self.embedding_provider, self.embedding_model, self.openai_api_key))
+
+    @property
+    def embedding_store(self) -> EmbeddingStore:
+        return self._component("embedding_store", lambda: EmbeddingStore(os.path.join(self.index_cache_path, "embeddings.sqlite3"), self.embedding_model))
+
+    @property
+    def docs(self) -> list[Document]:
+        return self._component("docs", lambda: self._load_documents(self.docs_path))
+
+    @property
+    def chunks(self) -> list[Document]:
+        return self._component("chunks", lambda: self._split_documents(self.docs))
+
+    @property
+    def lexical_index(self) -> BM25Index:
+        return self._component("lexical_index", lambda: BM25Index(
+            [f"{doc.metadata.get('source', '')}\n{doc.page_content}" for doc in self.chunks]))
+
+    @property
+    def vector_store(self):
+        return self._component("vector_store", self._build_vector_store)
+
+    def _build_vector_store(self):
+        documents = self.docs
+        with span("vector_store", use_index_cache=self.use_index_cache):
+            return self._load_or_create_vector_store(documents)
+
+    @property
+    def initial_rag_chain(self):
+        return self._component("initial_rag_chain", self._setup_initial_rag_chain)
+
+    @property
+    def feedback_rag_chain(self):
+        return self._component("feedback_rag_chain", self._setup_feedback_rag_chain)
+
+    def startup_report(self) -> str:
+        """Human-readable breakdown of import and construction time spent so far."""
+        lines = [f"Startup report (module import: {_MODULE_IMPORT_TIME:.3f}s)"]
+        for module_name, seconds in _IMPORT_TIMINGS.items():
+            lines.append(f"  import {module_name}: {seconds:.3f}s")
+        for name, seconds in self.startup_timings.items():
+            lines.append(f"  build {name}: {seconds:.3f}s")
+        not_built = [name for name in ("llm", "embeddings", "docs", "lexical_index", "vector_store", "initial_docs_chain", "feedback_docs_chain")
+                     if name not in self._components]
+        if not_built:
+            lines.append(f"  not built (lazy): {', '.join(not_built)}")
+        return "\n".join(lines)
 
     def _load_documents(self, path: str) -> list[Document]:
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except FileNotFoundError:
-            project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-            raise FileNotFoundError(f"Doc file not found: {path}. Project root: {project_root}")
-        except json.JSONDecodeError:
-            raise ValueError(f"Error decoding JSON: {path}")
-        return [Document(page_content=item['content'], metadata={"source": item['source']}) for item in data]
+        with span("load_documents", path=path) as attributes:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+                raise FileNotFoundError(f"Doc file not found: {path}. Project root: {project_root}")
+            except json.JSONDecodeError:
+                raise ValueError(f"Error decoding JSON: {path}")
+            Document = _lazy_import("langchain_core.documents", "Document")
+            attributes["documents"] = len(data)
+            return [Document(page_content=item['content'], metadata={"source": item['source']}) for item in data]
 
-    def _create_vector_store(self, documents: list[Document]):
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    def _docs_file_hash(self) -> str:
+        hasher = hashlib.sha256()
+        with open(self.docs_path, 'rb') as f:
+            hasher.update(f.read())
+        return hasher.hexdigest()
+
+    def _index_cache_key(self) -> str:
+        """Hash of the settings that shape the index layout: embedding model, splitter and index build parameters."""
+        key = f"provider={self.embedding_provider}|model={self.embedding_model}|chunk_size={CHUNK_SIZE}|chunk_overlap={CHUNK_OVERLAP}"
+        if self.index_builder.cache_key():
+            key += f"|{self.index_builder.cache_key()}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _chunk_id(doc: Document) -> str:
+        source = doc.metadata.get("source", "")
+        return hashlib.sha256(f"{source}\0{doc.page_content}".encode("utf-8")).hexdigest()
+
+    def _split_documents(self, documents: list[Document]) -> list[Document]:
+        RecursiveCharacterTextSplitter = _lazy_import("langchain.text_splitter", "RecursiveCharacterTextSplitter")
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
         split_documents = text_splitter.split_documents(documents)
+        if not split_documents and documents and any(doc.page_content for doc in documents):
+            split_documents = documents
+        return split_documents
+
+    def _load_or_create_vector_store(self, documents: list[Document]):
+        FAISS = _lazy_import("langchain_community.vectorstores", "FAISS")
+        if not self.use_index_cache:
+            logging.info("RAG: Index cache disabled, building vector store from scratch.")
+            return self._create_vector_store(documents)
+
+        cache_path = os.path.join(self.index_cache_path, self._index_cache_key())
+        manifest_path = os.path.join(cache_path, "manifest.json")
+        docs_hash = self._docs_file_hash()
+
+        vector_store = None
+        if os.path.exists(os.path.join(cache_path, "index.faiss")):
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    cached_docs_hash = json.load(f).get("docs_hash")
+                if cached_docs_hash == docs_hash:
+                    vector_store, mapped = self._load_vector_store(cache_path, mmap=self.mmap_index)
+                    logging.info(f"RAG: Index cache hit, loaded vector store from: {cache_path}"
+                                 f"{' (memory-mapped)' if mapped else ''}")
+                    return vector_store
+                # A stale index is updated in place, so it is read into memory rather than mapped.
+                vector_store, _ = self._load_vector_store(cache_path, mmap=False)
+                logging.info(f"RAG: Index cache stale (docs changed), updating vector store incrementally: {cache_path}")
+            except (OSError, ValueError, RuntimeError) as e:
+                logging.warning(f"RAG: Failed to load cached index from {cache_path}: {e}. Rebuilding.")
+                vector_store = None
+        else:
+            logging.info(f"RAG: Index cache miss, building vector store (cache: {cache_path})")
+
+        split_documents = self._split_documents(documents)
         if not split_documents:
-            if documents and any(doc.page_content for doc in documents):
-                split_documents = documents 
+            logging.warning("No processable content for vector store. Retriever might not find context.")
+            return FAISS.from_texts(["placeholder for empty faiss index to avoid error"], self.embeddings)
+
+        vector_store = self._sync_vector_store(vector_store, split_documents)
+        try:
+            os.makedirs(cache_path, exist_ok=True)
+            vector_store.save_local(cache_path)
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump({"docs_hash": docs_hash, "embedding_provider": self.embedding_provider,
+                           "embedding_model": self.embedding_model,
+                           "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP,
+                           "index_type": self.index_builder.index_type, "index_params": self.index_builder.params}, f, indent=2)
+            logging.info(f"RAG: Saved vector store to index cache: {cache_path}")
+        except OSError as e:
+            logging.warning(f"RAG: Could not save vector store to index cache {cache_path}: {e}")
+        return vector_store
+
+    def _load_vector_store(self, cache_path: str, mmap: bool):
+        """
+        Loads a vector store written by save_local, reading index.faiss through the index builder
+        (optionally memory-mapped) instead of FAISS.load_local. Returns (vector store, whether mapped).
+        """
+        FAISS = _lazy_import("langchain_community.vectorstores", "FAISS")
+        index, mapped = self.index_builder.read(os.path.join(cache_path, "index.faiss"), mmap=mmap)
+        # The cache directory is written only by this class, so loading its pickled docstore is safe.
+        with open(os.path.join(cache_path, "index.pkl"), 'rb') as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        return FAISS(self.embeddings, index, docstore, index_to_docstore_id), mapped
+
+    def _new_vector_store(self, text_embeddings: list, metadatas: list = None, ids: list = None):
+        """Builds a vector store over precomputed embeddings, on an index of the configured type."""
+        FAISS = _lazy_import("langchain_community.vectorstores", "FAISS")
+        InMemoryDocstore = _lazy_import("langchain_community.docstore.in_memory", "InMemoryDocstore")
+        asarray = _lazy_import("numpy", "asarray")
+        index = self.index_builder.build(asarray([vector for _, vector in text_embeddings], dtype="float32"))
+        vector_store = FAISS(self.embeddings, index, InMemoryDocstore(), {})
+        vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        return vector_store
+
+    def _sync_vector_store(self, vector_store, split_documents: list[Document]):
+        """
+        Brings `vector_store` in line with `split_documents`: chunks no longer present are deleted
+        in place, new chunks are added, and only chunks unknown to the embedding store are embedded.
+        If `vector_store` is None a new index is built the same way.
+        """
+        wanted: Dict[str, Document] = {}
+        for doc in split_documents:
+            wanted.setdefault(self._chunk_id(doc), doc)
+
+        existing_ids = set(vector_store.index_to_docstore_id.values()) if vector_store is not None else set()
+        removed_ids = [chunk_id for chunk_id in existing_ids if chunk_id not in wanted]
+        added_ids = [chunk_id for chunk_id in wanted if chunk_id not in existing_ids]
+
+        if removed_ids and (len(removed_ids) == len(existing_ids) or not self.index_builder.supports_delete):
+            # FAISS cannot be left empty between delete and add, and HNSW cannot delete at all; start
+            # over instead (unchanged chunks come from the embedding store, so nothing is re-embedded).
+            vector_store, removed_ids, added_ids = None, [], list(wanted)
+        elif removed_ids:
+            vector_store.delete(removed_ids)
+
+        new_embedding_count = 0
+        if added_ids:
+            texts = [wanted[chunk_id].page_content for chunk_id in added_ids]
+            metadatas = [wanted[chunk_id].metadata for chunk_id in added_ids]
+            with span("embed", chunks=len(texts)) as attributes:
+                vectors, new_embedding_count = self.embedding_store.embed_texts(texts, self.embeddings.embed_documents)
+                attributes["embedded"] = new_embedding_count
+            text_embeddings = list(zip(texts, vectors))
+            if vector_store is None:
+                vector_store = self._new_vector_store(text_embeddings, metadatas=metadatas, ids=added_ids)
             else:
+                vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=added_ids)
+
+        logging.info(f"RAG: Index sync: {len(added_ids)} chunk(s) added, {len(removed_ids)} removed, "
+                     f"{len(wanted) - len(added_ids)} unchanged; {new_embedding_count} chunk(s) sent to the embedding model.")
+        return vector_store
+
+    def _create_vector_store(self, documents: list[Document]):
+        FAISS = _lazy_import("langchain_community.vectorstores", "FAISS")
+        split_documents = self._split_documents(documents)
+        with span("create_vector_store", chunks=len(split_documents)):
+            if not split_documents:
                 logging.warning("No processable content for vector store. Retriever might not find context.")
                 return FAISS.from_texts(["placeholder for empty faiss index to avoid error"], self.embeddings)
-        return FAISS.from_documents(split_documents, self.embeddings)
+            texts = [doc.page_content for doc in split_documents]
+            vectors = self.embeddings.embed_documents(texts)
+            return self._new_vector_store(list(zip(texts, vectors)), metadatas=[doc.metadata for doc in split_documents])
 
     def _strip_markdown(self, code: str) -> str:
-        code = code.strip()
-        if code.startswith("```python"):
-            code = code[len("```python"):].strip()
-        elif code.startswith("```"):
-            code = code[len("```"):].strip()
-        if code.endswith("```"):
-            code = code[:-len("```")].strip()
-        return code
+        stream = CodeStream()
+        stream.feed(code)
+        return stream.close()
+
+    @property
+    def retriever(self):
+        return self._component("retriever", lambda: self.vector_store.as_retriever())
+
+    @property
+    def initial_docs_chain(self):
+        return self._component("initial_docs_chain", lambda: self._setup_docs_chain(_INITIAL_SYSTEM_PROMPT_TEMPLATE))
+
+    @property
+    def feedback_docs_chain(self):
+        return self._component("feedback_docs_chain", lambda: self._setup_docs_chain(_RETRY_SYSTEM_PROMPT_TEMPLATE))
+
+    @property
+    def patch_docs_chain(self):
+        return self._component("patch_docs_chain", lambda: self._setup_docs_chain(_PATCH_RETRY_SYSTEM_PROMPT_TEMPLATE))
+
+    @property
+    def llm_cache(self) -> LLMResponseCache | None:
+        if not self.use_llm_cache:
+            return None
+        return self._component("llm_cache", lambda: LLMResponseCache(self.llm_cache_path, bypass=self.llm_cache_bypass))
+
+    @property
+    def fix_cache(self) -> FailureFixCache | None:
+        if not self.use_fix_cache:
+            return None
+        return self._component("fix_cache", lambda: FailureFixCache(self.fix_cache_path, patcher=self.script_patcher))
+
+    def _setup_docs_chain(self, template: str, temperature: float = 0.0):
+        ChatPromptTemplate = _lazy_import("langchain_core.prompts", "ChatPromptTemplate")
+        create_stuff_documents_chain = _lazy_import("langchain.chains.combine_documents", "create_stuff_documents_chain")
+        prompt = ChatPromptTemplate.from_template(template)
+        llm = self.llm.bind(temperature=temperature) if temperature else self.llm
+        return create_stuff_documents_chain(llm, prompt)
+
+    def _docs_chain(self, name: str, template: str, temperature: float = 0.0):
+        """The `name` docs chain, or a copy sampling at `temperature` (built once per temperature)."""
+        if not temperature:
+            return getattr(self, name)
+        return self._component(f"{name}@t={temperature}", lambda: self._setup_docs_chain(template, temperature))
+
+    @staticmethod
+    def _candidate_variant(candidate: int = None) -> tuple[float, int]:
+        """
+        (temperature, retrieval k) for a speculative candidate. Candidate 0 (or a single chain) is the
+        normal deterministic generation; the others sample at rising temperatures, and every second
+        one also sees twice the usual context, so the candidates fail in different ways.
+        """
+        if not candidate:
+            return 0.0, RETRIEVAL_K
+        temperature = CANDIDATE_TEMPERATURES[(candidate - 1) % len(CANDIDATE_TEMPERATURES)]
+        return temperature, 2 * RETRIEVAL_K if candidate % 2 == 0 else RETRIEVAL_K
 
     def _setup_initial_rag_chain(self):
-        retriever = self.vector_store.as_retriever()
-        prompt = ChatPromptTemplate.from_template(_INITIAL_SYSTEM_PROMPT_TEMPLATE)
-        combine_docs_chain = create_stuff_documents_chain(self.llm, prompt)
-        return create_retrieval_chain(retriever, combine_docs_chain)
+        create_retrieval_chain = _lazy_import("langchain.chains", "create_retrieval_chain")
+        return create_retrieval_chain(self.retriever, self.initial_docs_chain)
 
     def _setup_feedback_rag_chain(self):
-        retriever = self.vector_store.as_retriever()
-        prompt = ChatPromptTemplate.from_template(_RETRY_SYSTEM_PROMPT_TEMPLATE)
-        feedback_document_chain = create_stuff_documents_chain(self.llm, prompt)
-        return create_retrieval_chain(retriever, feedback_document_chain)
+        create_retrieval_chain = _lazy_import("langchain.chains", "create_retrieval_chain")
+        return create_retrieval_chain(self.retriever, self.feedback_docs_chain)
+
+    def retrieve(self, query: str, k: int = None) -> list[Document]:
+        """
+        Returns the top `k` chunks for `query` according to `retrieval_mode`:
+        "vector" embeds the query and searches FAISS, "lexical" uses only the BM25 index (no embedding
+        call), and "hybrid" fuses both rankings, falling back to lexical results if the vector search fails.
+        """
+        k = k or RETRIEVAL_K
+        with span("retrieval", mode=self.retrieval_mode, k=k):
+            logging.info(f"RAG: Retrieving {k} chunks ({self.retrieval_mode}) for: \"{query[:100]}...\"")
+            if self.retrieval_mode == "vector":
+                return self.vector_store.similarity_search(query, k=k)
+
+            fetch_k = max(3 * k, 10)
+            lexical_docs = [self.chunks[index] for index, _ in self.lexical_index.search(query, k=fetch_k)]
+            if self.retrieval_mode == "lexical":
+                return lexical_docs[:k]
+
+            try:
+                vector_docs = self.vector_store.similarity_search(query, k=fetch_k)
+            except Exception as e:
+                logging.warning(f"RAG: Vector search failed ({e}); using lexical results only.")
+                return lexical_docs[:k]
+
+            docs_by_id = {self._chunk_id(doc): doc for doc in vector_docs + lexical_docs}
+            fused_ids = reciprocal_rank_fusion(
+                [[self._chunk_id(doc) for doc in vector_docs], [self._chunk_id(doc) for doc in lexical_docs]], k=k)
+            return [docs_by_id[chunk_id] for chunk_id in fused_ids]
+
+    def _invoke_with_cache(self, docs_chain, template: str, variables: Dict[str, str], docs: list[Document],
+                           on_chunk: Callable[[str], None] = None, phase: str = "llm", temperature: float = 0.0) -> str:
+        """
+        Runs `docs_chain` on the already retrieved `docs`, packed into the context token budget, serving
+        the answer from the LLM response cache when the model, template, variables and packed chunks all match.
+        With `on_chunk`, the answer is streamed and every piece is passed to it as it arrives (a cached
+        answer is passed in one piece). The call is recorded as span `phase` with its token counts.
+        `temperature` is the sampling temperature `docs_chain` was built with; it is part of the cache key.
+        """
+        model_key = f"{self.llm_model}@t={temperature}" if temperature else self.llm_model
+        with span(phase, model=model_key, streamed=bool(on_chunk)) as attributes:
+            docs, cache_key, cached_answer = self._lookup_llm_cache(model_key, template, variables, docs, attributes)
+            if cached_answer is not None:
+                if on_chunk:
+                    on_chunk(cached_answer)
+                return cached_answer
+            if on_chunk:
+                pieces = []
+                for piece in docs_chain.stream({"context": docs, **variables}):
+                    pieces.append(piece)
+                    on_chunk(piece)
+                answer = "".join(pieces)
+            else:
+                answer = docs_chain.invoke({"context": docs, **variables})
+            self._store_llm_answer(cache_key, answer, attributes)
+            return answer
+
+    async def _ainvoke_with_cache(self, docs_chain, template: str, variables: Dict[str, str], docs: list[Document],
+                                  on_chunk: Callable[[str], None] = None, phase: str = "llm") -> str:
+        """Asyncio counterpart of _invoke_with_cache, using the chain's astream/ainvoke."""
+        with span(phase, model=self.llm_model, streamed=bool(on_chunk)) as attributes:
+            docs, cache_key, cached_answer = self._lookup_llm_cache(self.llm_model, template, variables, docs, attributes)
+            if cached_answer is not None:
+                if on_chunk:
+                    on_chunk(cached_answer)
+                return cached_answer
+            if on_chunk:
+                pieces = []
+                async for piece in docs_chain.astream({"context": docs, **variables}):
+                    pieces.append(piece)
+                    on_chunk(piece)
+                answer = "".join(pieces)
+            else:
+                answer = await docs_chain.ainvoke({"context": docs, **variables})
+            self._store_llm_answer(cache_key, answer, attributes)
+            return answer
 
+    def _lookup_llm_cache(self, model_key: str, template: str, variables: Dict[str, str], docs: list[Document],
+                          attributes: Dict[str, Any]):
+        """Packs `docs` into the context budget and checks the LLM cache. Returns (docs, cache key, cached answer)."""
+        docs = self.context_assembler.pack_documents(docs)
+        prompt_text = template.format(context="\n\n".join(doc.page_content for doc in docs), **variables)
+        prompt_tokens = self.context_assembler.count_tokens(prompt_text)
+        attributes.update(prompt_tokens=prompt_tokens, context_chunks=len(docs), cache_hit=False)
+        logging.info(f"RAG: Prompt tokens: {prompt_tokens} "
+                     f"({len(docs)} context chunks, {sum(self.context_assembler.count_tokens(doc.page_content) for doc in docs)} context tokens).")
+        cache = self.llm_cache
+        if cache is None:
+            return docs, None, None
+        cache_key = cache.make_key(model_key, template, variables, [doc.page_content for doc in docs])
+        cached_answer = cache.get(cache_key)
+        if cached_answer is not None:
+            logging.info("RAG: LLM response cache hit.")
+            attributes.update(cache_hit=True, completion_tokens=self.context_assembler.count_tokens(cached_answer))
+        return docs, cache_key, cached_answer
 
-    def _generate_code_initial(self, user_prompt: str, credentials: Dict[str, str]) -> str:
+    def _store_llm_answer(self, cache_key: str, answer: str, attributes: Dict[str, Any]):
+        attributes["completion_tokens"] = self.context_assembler.count_tokens(answer or "")
+        if self.llm_cache is not None and answer:
+            self.llm_cache.put(cache_key, answer)
+
+    def _generate_code_initial(self, user_prompt: str, credentials: Dict[str, str],
+                               plan: Dict[str, Any],
+                               on_code_chunk: Callable[[str], None] = None,
+                               stream_timings: Dict[str, Any] = None,
+                               synthesized_code: str = None,
+                               candidate: int = None) -> str:
+        temperature, k = self._candidate_variant(candidate)
+        if candidate:
+            # Speculative candidates always ask the LLM, at their own temperature and context size,
+            # and do not stream (the caller sees candidate 0's output).
+            synthesized_code = None
+            on_code_chunk = None
+        stream = CodeStream(on_code_chunk, started_at=(stream_timings or {}).get("started_at"))
+        if synthesized_code is not None:
+            return self._finish_initial_code(synthesized_code, stream, on_code_chunk, stream_timings, synthesized=True)
         logging.info(f"RAG: Initial generation for prompt: \"{user_prompt[:100]}...\"")
-        response = self.initial_rag_chain.invoke({
+        retrieved_docs = self._plan_docs(plan, user_prompt, k)
+        docs_chain = self._docs_chain("initial_docs_chain", _INITIAL_SYSTEM_PROMPT_TEMPLATE, temperature)
+        generated_code = self._invoke_with_cache(docs_chain, _INITIAL_SYSTEM_PROMPT_TEMPLATE,
+                                                 self._initial_variables(user_prompt, credentials),
+                                                 retrieved_docs, on_chunk=stream.feed if on_code_chunk else None,
+                                                 phase="llm.initial", temperature=temperature)
+        return self._finish_initial_code(generated_code, stream, on_code_chunk, stream_timings)
+
+    async def _agenerate_code_initial(self, user_prompt: str, credentials: Dict[str, str],
+                                      plan: Dict[str, Any],
+                                      on_code_chunk: Callable[[str], None] = None,
+                                      stream_timings: Dict[str, Any] = None,
+                                      synthesized_code: str = None) -> str:
+        """Asyncio counterpart of _generate_code_initial (no speculative candidates)."""
+        stream = CodeStream(on_code_chunk, started_at=(stream_timings or {}).get("started_at"))
+        if synthesized_code is not None:
+            return self._finish_initial_code(synthesized_code, stream, on_code_chunk, stream_timings, synthesized=True)
+        logging.info(f"RAG: Initial generation for prompt: \"{user_prompt[:100]}...\"")
+        retrieved_docs = await asyncio.to_thread(self._plan_docs, plan, user_prompt)
+        generated_code = await self._ainvoke_with_cache(self.initial_docs_chain, _INITIAL_SYSTEM_PROMPT_TEMPLATE,
+                                                        self._initial_variables(user_prompt, credentials),
+                                                        retrieved_docs, on_chunk=stream.feed if on_code_chunk else None,
+                                                        phase="llm.initial")
+        return self._finish_initial_code(generated_code, stream, on_code_chunk, stream_timings)
+
+    @staticmethod
+    def _initial_variables(user_prompt: str, credentials: Dict[str, str]) -> Dict[str, str]:
+        return {
             "input": user_prompt,
             "endpoint": credentials["endpoint"],
             "login": credentials["login"],
             "password": credentials["password"]
-        })
-        generated_code = response.get("answer", "")
-        if not generated_code:
-            logging.error("RAG: Initial generation returned no code/answer.")
-            raise ValueError("LLM did not return any code for the initial prompt.")
-        return self._strip_markdown(generated_code)
+        }
+
+    def _finish_initial_code(self, generated_code: str, stream: CodeStream, on_code_chunk: Callable[[str], None],
+                             stream_timings: Dict[str, Any], synthesized: bool = False) -> str:
+        if synthesized:
+            # Template scripts are complete already; they are only fed through the stream for the timings.
+            stream.feed(generated_code)
+            stream.close()
+            code = generated_code
+        else:
+            if not generated_code:
+                logging.error("RAG: Initial generation returned no code/answer.")
+                raise ValueError("LLM did not return any code for the initial prompt.")
+            code = stream.close() if on_code_chunk else self._strip_markdown(generated_code)
+        if stream_timings is not None and on_code_chunk:
+            stream_timings.update(stream.timings(), syntax_error=stream.syntax_error)
+        return code
 
     def _generate_code_with_feedback(self, original_request: str, previous_code: str, 
                                      execution_stdout: str, execution_stderr: str, 
-                                     credentials: Dict[str, str]) -> str:
+                                     credentials: Dict[str, str],
+                                     plan: Dict[str, Any],
+                                     on_code_chunk: Callable[[str], None] = None,
+                                     candidate: int = None) -> str:
         logging.info(f"RAG: Generating with feedback for request: \"{original_request[:100]}...\"")
-        
-        response = self.feedback_rag_chain.invoke({
+        temperature, k = self._candidate_variant(candidate)
+        if candidate:
+            on_code_chunk = None
+        retrieved_docs = self._plan_docs(plan, original_request, k)
+        execution_stdout = self.context_assembler.trim_stdout(execution_stdout)
+        execution_stderr = self.context_assembler.trim_stderr(execution_stderr)
+
+        if self.retry_mode == "patch":
+            patched_code = self._generate_patch_with_feedback(original_request, previous_code, execution_stdout,
+                                                              execution_stderr, retrieved_docs, temperature)
+            if patched_code is not None:
+                return patched_code
+            logging.info("RAG: Falling back to full script regeneration.")
+
+        stream = CodeStream(on_code_chunk)
+        docs_chain = self._docs_chain("feedback_docs_chain", _RETRY_SYSTEM_PROMPT_TEMPLATE, temperature)
+        corrected_code = self._invoke_with_cache(docs_chain, _RETRY_SYSTEM_PROMPT_TEMPLATE,
+                                                 self._feedback_variables(original_request, previous_code, execution_stdout,
+                                                                          execution_stderr, credentials),
+                                                 retrieved_docs, on_chunk=stream.feed if on_code_chunk else None,
+                                                 phase="llm.feedback", temperature=temperature)
+        return self._finish_feedback_code(corrected_code, previous_code, stream, on_code_chunk)
+
+    async def _agenerate_code_with_feedback(self, original_request: str, previous_code: str,
+                                            execution_stdout: str, execution_stderr: str,
+                                            credentials: Dict[str, str],
+                                            plan: Dict[str, Any],
+                                            on_code_chunk: Callable[[str], None] = None) -> str:
+        """Asyncio counterpart of _generate_code_with_feedback (no speculative candidates)."""
+        logging.info(f"RAG: Generating with feedback for request: \"{original_request[:100]}...\"")
+        retrieved_docs = await asyncio.to_thread(self._plan_docs, plan, original_request)
+        execution_stdout = self.context_assembler.trim_stdout(execution_stdout)
+        execution_stderr = self.context_assembler.trim_stderr(execution_stderr)
+
+        if self.retry_mode == "patch":
+            answer = await self._ainvoke_with_cache(self.patch_docs_chain, _PATCH_RETRY_SYSTEM_PROMPT_TEMPLATE,
+                                                    self._patch_variables(original_request, previous_code,
+                                                                          execution_stdout, execution_stderr),
+                                                    retrieved_docs, phase="llm.patch")
+            patched_code = self._apply_patch_answer(previous_code, answer)
+            if patched_code is not None:
+                return patched_code
+            logging.info("RAG: Falling back to full script regeneration.")
+
+        stream = CodeStream(on_code_chunk)
+        corrected_code = await self._ainvoke_with_cache(self.feedback_docs_chain, _RETRY_SYSTEM_PROMPT_TEMPLATE,
+                                                        self._feedback_variables(original_request, previous_code, execution_stdout,
+                                                                                 execution_stderr, credentials),
+                                                        retrieved_docs, on_chunk=stream.feed if on_code_chunk else None,
+                                                        phase="llm.feedback")
+        return self._finish_feedback_code(corrected_code, previous_code, stream, on_code_chunk)
+
+    @staticmethod
+    def _feedback_variables(original_request: str, previous_code: str, execution_stdout: str,
+                            execution_stderr: str, credentials: Dict[str, str]) -> Dict[str, str]:
+        return {
             "input": original_request, 
             "original_request": original_request, 
             "previous_code": previous_code,
@@ -312,9 +934,10 @@ class NetUnicornRAG:
             "endpoint": credentials["endpoint"],
             "login": credentials["login"],
             "password": credentials["password"]
-        })
-        corrected_code = response.get("answer", "")
-        
+        }
+
+    def _finish_feedback_code(self, corrected_code: str, previous_code: str, stream: CodeStream,
+                              on_code_chunk: Callable[[str], None]) -> str:
         if not corrected_code:
             logging.error("RAG: Feedback generation returned no code/answer.")
             raise ValueError("LLM did not return any code during feedback generation.")
@@ -323,21 +946,143 @@ class NetUnicornRAG:
             logging.info("RAG: LLM indicated previous code was correct.")
             return previous_code 
 
-        return self._strip_markdown(corrected_code)
+        return stream.close() if on_code_chunk else self._strip_markdown(corrected_code)
+
+    def _generate_patch_with_feedback(self, original_request: str, previous_code: str,
+                                      execution_stdout: str, execution_stderr: str,
+                                      retrieved_docs: list[Document], temperature: float = 0.0) -> str | None:
+        """
+        Asks for SEARCH/REPLACE edits against `previous_code` and applies them. Returns the patched
+        script, or None if the answer is empty, the edits do not apply, or the result does not compile.
+        """
+        docs_chain = self._docs_chain("patch_docs_chain", _PATCH_RETRY_SYSTEM_PROMPT_TEMPLATE, temperature)
+        answer = self._invoke_with_cache(docs_chain, _PATCH_RETRY_SYSTEM_PROMPT_TEMPLATE,
+                                         self._patch_variables(original_request, previous_code,
+                                                               execution_stdout, execution_stderr),
+                                         retrieved_docs, phase="llm.patch", temperature=temperature)
+        return self._apply_patch_answer(previous_code, answer)
+
+    @staticmethod
+    def _patch_variables(original_request: str, previous_code: str, execution_stdout: str,
+                         execution_stderr: str) -> Dict[str, str]:
+        return {
+            "original_request": original_request,
+            "previous_code": previous_code,
+            "execution_stdout": execution_stdout,
+            "execution_stderr": execution_stderr
+        }
 
-    def _get_final_save_path(self, user_prompt: str) -> str:
+    def _apply_patch_answer(self, previous_code: str, answer: str) -> str | None:
+        if not answer:
+            logging.warning("RAG: Patch generation returned no answer.")
+            return None
+        if answer.strip() == "PREVIOUS_CODE_CORRECT":
+            logging.info("RAG: LLM indicated previous code was correct.")
+            return previous_code
+        try:
+            patched_code = self.script_patcher.apply(previous_code, answer)
+            compile(patched_code, "<patched script>", "exec")
+        except (PatchError, SyntaxError) as e:
+            logging.warning(f"RAG: Patch could not be applied: {e}")
+            return None
+        logging.info(f"RAG: Applied patch ({len(answer)} characters of edits instead of a full script).")
+        return patched_code
+
+    def _get_final_save_path(self, user_prompt: str, work_tag: str = None) -> str:
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         sane_prompt = "".join(c if c.isalnum() or c.isspace() else "" for c in user_prompt)
         sane_prompt = sane_prompt.replace(" ", "_")[:50]
-        filename = f"nu_script_final_{timestamp}_{sane_prompt}.py"
+        tag = f"{work_tag}_" if work_tag else ""
+        filename = f"nu_script_final_{timestamp}_{tag}{sane_prompt}.py"
         return os.path.join(self.generated_scripts_base_path, filename)
 
     def generate_code(self, user_prompt: str, 
                       save_final_script: bool = True, 
                       enable_feedback_loop: bool = True, # Default to True
-                      max_retries: int = 3) -> Dict[str, Any]: # Default to 3
+                      max_retries: int = 3, # Default to 3
+                      work_tag: str = None,
+                      retrieved_docs: list[Document] = None,
+                      on_code_chunk: Callable[[str], None] = None) -> Dict[str, Any]:
+        """
+        Generates (and, with the feedback loop, executes and repairs) a script for `user_prompt`.
+
+        `work_tag` isolates concurrent calls: attempt scripts go to their own subdirectory of the
+        feedback attempts directory, the tag is added to the final script name, and every executed
+        script's experiment name gets a `_<work_tag>` suffix, so two calls with similar prompts in
+        the same second cannot overwrite each other's files or share a NetUnicorn experiment.
+
+        Context is retrieved once per call (or taken from `retrieved_docs`, e.g. the chunks already
+        shown by `log_retrieved_chunks`) and reused by the initial generation and every retry.
+
+        With `on_code_chunk`, generated code is streamed to it as the model writes it (Markdown fences
+        removed), and `result["stream_timings"]` reports the time from the call to the first code output
+        and to the syntax check of the initial script, which runs as soon as its code fence closes.
+
+        With `candidates` > 1 (see __init__), that many chains race and `result["winner"]` and
+        `result["candidates"]` report which one succeeded first; only candidate 0 is streamed.
+
+        `result["spans"]` holds per-phase timing spans (see spans.py): document loading, index build,
+        retrieval, each LLM call with its token counts, repair, validation, script saving and execution
+        (split into interpreter startup, remote prepare and result polling when the script prints the
+        usual progress lines). Inside an active spans.recording() the spans join that recording.
+        """
+        with recording() as spans, span("generate_code", work_tag=work_tag) as attributes:
+            plan = self._plan_generation(user_prompt, save_final_script, enable_feedback_loop, max_retries,
+                                         work_tag, retrieved_docs, on_code_chunk, time.perf_counter())
+            result = plan["feedback_handler"].run_generation_with_feedback(
+                user_prompt,
+                save_script_base_path=plan["attempts_path"],
+                final_script_name_override=plan["final_script_override_name"]
+            )
+            result = self._finish_generation(result, plan, save_final_script, on_code_chunk)
+            attributes["success"] = result["success"]
+        result["spans"] = spans
+        return result
+
+    async def agenerate_code(self, user_prompt: str,
+                             save_final_script: bool = True,
+                             enable_feedback_loop: bool = True,
+                             max_retries: int = 3,
+                             work_tag: str = None,
+                             retrieved_docs: list[Document] = None,
+                             on_code_chunk: Callable[[str], None] = None) -> Dict[str, Any]:
+        """
+        Asyncio counterpart of generate_code (same arguments and result). LLM calls use the chains'
+        ainvoke/astream and scripts run as asyncio subprocesses, so many feedback loops can share one
+        event loop instead of a thread each. Retrieval and other blocking setup run in worker threads.
+        Always a single chain: `candidates` applies to generate_code only.
+
+        Cancelling the awaiting task stops the loop at its current step and kills a running script.
+        """
+        with recording() as spans, span("generate_code", work_tag=work_tag) as attributes:
+            plan = await asyncio.to_thread(self._plan_generation, user_prompt, save_final_script, enable_feedback_loop,
+                                           max_retries, work_tag, retrieved_docs, on_code_chunk, time.perf_counter())
+            result = await plan["feedback_handler"].arun_generation_with_feedback(
+                user_prompt,
+                save_script_base_path=plan["attempts_path"],
+                final_script_name_override=plan["final_script_override_name"]
+            )
+            result = self._finish_generation(result, plan, save_final_script, on_code_chunk)
+            attributes["success"] = result["success"]
+        result["spans"] = spans
+        return result
+
+    def _has_netunicorn_credentials(self) -> bool:
+        return all([self.netunicorn_endpoint, self.netunicorn_login, self.netunicorn_password])
+
+    def _plan_generation(self, user_prompt: str, save_final_script: bool, enable_feedback_loop: bool, max_retries: int,
+                         work_tag: str, retrieved_docs: list[Document],
+                         on_code_chunk: Callable[[str], None], call_start: float) -> Dict[str, Any]:
+        """
+        Everything before the feedback loop: argument checks, final script path, template fast path,
+        context retrieval and the FeedbackHandler (with both blocking and async generators).
+        """
         if not user_prompt:
             raise ValueError("User prompt cannot be empty.")
+        if work_tag and not all(c.isalnum() or c in "_-" for c in work_tag):
+            raise ValueError(f"work_tag may only contain letters, digits, '_' and '-': {work_tag!r}")
+        if not self._has_netunicorn_credentials():
+            raise ValueError("NetUnicorn credentials not found. Ensure .env is in the project root.")
 
         credentials = {
             "endpoint": self.netunicorn_endpoint,
@@ -347,37 +1092,92 @@ class NetUnicornRAG:
         
         intended_final_script_path = None
         if save_final_script:
-            intended_final_script_path = self._get_final_save_path(user_prompt)
+            intended_final_script_path = self._get_final_save_path(user_prompt, work_tag)
             os.makedirs(os.path.dirname(intended_final_script_path), exist_ok=True)
 
         effective_max_retries = max_retries if enable_feedback_loop else 0
         
         logging.info(f"RAG: Starting generation. Feedback enabled: {enable_feedback_loop}, Max retries: {effective_max_retries}")
         
-        feedback_handler = FeedbackHandler(
-            initial_code_generator=self._generate_code_initial,
-            feedback_code_generator=self._generate_code_with_feedback,
+        synthesized_code = None
+        if self.template_synthesizer is not None:
+            with span("template") as attributes:
+                synthesized_code = self.template_synthesizer.synthesize(user_prompt, credentials)
+                attributes["hit"] = synthesized_code is not None
+        if synthesized_code is not None:
+            # The template path needs no context; the first retry (if any) retrieves it for all retries.
+            logging.info("RAG: Using the template fast path for the initial script (no LLM call).")
+        elif retrieved_docs is None:
+            try:
+                retrieved_docs = self.retrieve(user_prompt)
+            except Exception as e:
+                # Leave retrieval to the generators so the failure is recorded in the report log.
+                logging.error(f"RAG: Retrieval failed before generation: {e}")
+
+        stream_timings = {"started_at": call_start}
+        final_script_override_name = os.path.basename(intended_final_script_path) if intended_final_script_path else None
+        attempts_path = os.path.join(self.feedback_attempts_path, work_tag) if work_tag else self.feedback_attempts_path
+        plan = {
+            "intended_final_script_path": intended_final_script_path,
+            "final_script_override_name": final_script_override_name,
+            "attempts_path": attempts_path,
+            # Filled on first use if still None (template path, failed early retrieval) and then
+            # shared by every retry; "extra_docs" holds the larger contexts of candidates, by k.
+            "retrieved_docs": retrieved_docs,
+            "extra_docs": {},
+            "docs_lock": threading.Lock(),
+            "synthesized_code": synthesized_code,
+            "stream_timings": stream_timings,
+        }
+        plan["feedback_handler"] = FeedbackHandler(
+            initial_code_generator=functools.partial(self._generate_code_initial, plan=plan,
+                                                     on_code_chunk=on_code_chunk, stream_timings=stream_timings,
+                                                     synthesized_code=synthesized_code),
+            feedback_code_generator=functools.partial(self._generate_code_with_feedback, plan=plan,
+                                                      on_code_chunk=on_code_chunk),
+            async_initial_code_generator=functools.partial(self._agenerate_code_initial, plan=plan,
+                                                           on_code_chunk=on_code_chunk, stream_timings=stream_timings,
+                                                           synthesized_code=synthesized_code),
+            async_feedback_code_generator=functools.partial(self._agenerate_code_with_feedback,
+                                                            plan=plan, on_code_chunk=on_code_chunk),
             script_executor=self.script_executor,
             max_retries=effective_max_retries, 
-            netunicorn_credentials=credentials
-        )
-        
-        final_script_override_name = os.path.basename(intended_final_script_path) if intended_final_script_path else None
-        
-        result = feedback_handler.run_generation_with_feedback(
-            user_prompt,
-            save_script_base_path=self.feedback_attempts_path, 
-            final_script_name_override=final_script_override_name 
+            netunicorn_credentials=credentials,
+            script_validator=self.script_validator,
+            script_repairer=self.import_repairer,
+            fix_cache=self.fix_cache,
+            candidates=self.candidates,
+            speculate_on_failure=self.speculate_on_failure,
+            work_tag=work_tag
         )
+        return plan
+
+    def _plan_docs(self, plan: Dict[str, Any], user_prompt: str, k: int = RETRIEVAL_K) -> list[Document]:
+        """The plan's context of `k` chunks, retrieved once on first use and reused by every later attempt."""
+        with plan["docs_lock"]:
+            if k == RETRIEVAL_K:
+                if plan["retrieved_docs"] is None:
+                    plan["retrieved_docs"] = self.retrieve(user_prompt, k=k)
+                return plan["retrieved_docs"]
+            if k not in plan["extra_docs"]:
+                plan["extra_docs"][k] = self.retrieve(user_prompt, k=k)
+            return plan["extra_docs"][k]
 
+    def _finish_generation(self, result: Dict[str, Any], plan: Dict[str, Any], save_final_script: bool,
+                           on_code_chunk: Callable[[str], None]) -> Dict[str, Any]:
+        """Everything after the feedback loop: final script placement and result annotations."""
+        intended_final_script_path = plan["intended_final_script_path"]
+        retrieved_docs = plan["retrieved_docs"]
+        stream_timings = plan["stream_timings"]
         final_script_generated_path = result.get("final_script_path")
 
         if save_final_script and intended_final_script_path and final_script_generated_path:
             if os.path.abspath(final_script_generated_path) != os.path.abspath(intended_final_script_path):
                 try:
-                    with open(final_script_generated_path, "r", encoding="utf-8") as source_file:
-                        with open(intended_final_script_path, "w", encoding="utf-8") as dest_file:
-                            dest_file.write(source_file.read())
+                    with span("save_script", path=intended_final_script_path), \
+                            open(final_script_generated_path, "r", encoding="utf-8") as source_file, \
+                            open(intended_final_script_path, "w", encoding="utf-8") as dest_file:
+                        dest_file.write(source_file.read())
                     
                     log_message_verb = "Copied successful" if result["success"] else "Copied last attempted"
                     logging.info(f"{log_message_verb} script from {final_script_generated_path} to {intended_final_script_path}")
@@ -397,14 +1197,24 @@ class NetUnicornRAG:
             result['final_script_path'] = None
 
 
+        result["retrieved_chunk_ids"] = [self._chunk_id(doc) for doc in retrieved_docs or []]
+        result["generation_source"] = "template" if plan["synthesized_code"] is not None else "llm"
+        if on_code_chunk:
+            stream_timings.pop("started_at")
+            result["stream_timings"] = stream_timings
+        if self.llm_cache is not None:
+            result["llm_cache_stats"] = self.llm_cache.stats()
+            logging.info(f"RAG: LLM response cache stats: {result['llm_cache_stats']}")
+        if self.fix_cache is not None:
+            result["fix_cache_stats"] = self.fix_cache.stats()
+            logging.info(f"RAG: Fix cache stats: {result['fix_cache_stats']}")
         logging.info(f"RAG: Processing finished. Success: {result['success']}. Final script path: {result.get('final_script_path')}")
         return result
 
-    def log_retrieved_chunks(self, user_prompt: str, k: int = 3) -> str:
-        logging.info(f"RAG: Retrieving chunks for prompt: \"{user_prompt[:100]}...\"")
-        retriever = self.vector_store.as_retriever()
+    def log_retrieved_chunks(self, user_prompt: str, k: int = 3, retrieved_docs: list[Document] = None) -> str:
         try:
-            retrieved_docs = retriever.invoke(user_prompt) 
+            if retrieved_docs is None:
+                retrieved_docs = self.retrieve(user_prompt)
         except Exception as e:
             logging.error(f"Error during document retrieval for logging: {e}")
             return f"Error retrieving documents: {e}"
@@ -417,4 +1227,7 @@ class NetUnicornRAG:
             content_preview = doc.page_content.strip()[:300].replace('\n', ' ') 
             log_lines.append(f"Chunk {i+1} (source: {source}): \n")
             log_lines.append(f"```\n{content_preview}...\n```\n")
-        return "\n".join(log_lines)
\ No newline at end of file
+        return "\n".join(log_lines)
+
+
+_MODULE_IMPORT_TIME = time.perf_counter() - _MODULE_IMPORT_START
@@ -0,0 +1,43 @@
+import argparse
+
+from .netunicorn_rag import NetUnicornRAG, load_dry_run_scenario
+from .vector_index import parse_index_params
+
+
+def add_rag_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the NetUnicornRAG options shared by generate_netunicorn_script.py, evaluate_rag.py and rag_server.py."""
+    parser.add_argument('--bypass_llm_cache', dest='bypass_llm_cache', help='Ignore cached LLM responses (fresh answers are still cached)', action='store_true')
+    parser.add_argument('--no_llm_cache', dest='use_llm_cache', help='Disable the LLM response cache entirely', action='store_false')
+    parser.add_argument('--retrieval_mode', dest='retrieval_mode', help='Context retrieval: hybrid (BM25 + vector), vector, or lexical (no embedding calls)', choices=['hybrid', 'vector', 'lexical'], default='hybrid')
+    parser.add_argument('--embedding_provider', dest='embedding_provider', help='Embedding backend: openai, or local (CPU sentence-transformers, no network)', choices=['openai', 'local'], default='openai')
+    parser.add_argument('--warm_workers', dest='warm_workers', help='Run scripts in children forked from N pre-warmed interpreters (0 = fresh process per attempt)', type=int, default=0)
+    parser.add_argument('--dry_run', dest='dry_run', help='Run scripts against a local fake NetUnicorn client with fast-forwarded sleeps', action='store_true')
+    parser.add_argument('--dry_run_scenario', dest='dry_run_scenario', help='JSON file overriding the dry-run scenario (nodes, durations, outcomes)', type=str)
+    parser.add_argument('--retry_mode', dest='retry_mode', help='Feedback retries: full (regenerate the whole script) or patch (SEARCH/REPLACE edits, falls back to full)', choices=['full', 'patch'], default='full')
+    parser.add_argument('--no_templates', dest='use_templates', help='Always generate the initial script with the LLM (disable the template fast path)', action='store_false')
+    parser.add_argument('--no_fix_cache', dest='use_fix_cache', help='Always ask the LLM on failures (do not replay or learn cached fixes)', action='store_false')
+    parser.add_argument('--index_type', dest='index_type', help='FAISS index: flat (exact), ivf (clustered lists) or hnsw (graph)', choices=['flat', 'ivf', 'hnsw'], default='flat')
+    parser.add_argument('--index_params', dest='index_params', help='Index parameters, e.g. "nlist=1024,nprobe=32" (ivf) or "m=32,ef_search=128" (hnsw)', type=parse_index_params)
+    parser.add_argument('--no_mmap_index', dest='mmap_index', help='Read the cached index into memory instead of memory-mapping it', action='store_false')
+    parser.add_argument('--candidates', dest='candidates', help='Race N generate/execute/feedback chains per prompt (varied temperature and context); the first success wins and the rest are cancelled', type=int, default=1)
+    parser.add_argument('--speculate_on_failure', dest='speculate_on_failure', help='With --candidates, start the extra chains only after the first attempt of the main chain fails', action='store_true')
+
+
+def rag_from_args(args: argparse.Namespace) -> NetUnicornRAG:
+    """Builds a lazy NetUnicornRAG from the options added by add_rag_arguments."""
+    return NetUnicornRAG(lazy=True,
+                         use_llm_cache=args.use_llm_cache,
+                         llm_cache_bypass=args.bypass_llm_cache,
+                         retrieval_mode=args.retrieval_mode,
+                         embedding_provider=args.embedding_provider,
+                         warm_workers=args.warm_workers,
+                         dry_run=args.dry_run,
+                         dry_run_scenario=load_dry_run_scenario(args.dry_run_scenario),
+                         retry_mode=args.retry_mode,
+                         use_templates=args.use_templates,
+                         use_fix_cache=args.use_fix_cache,
+                         index_type=args.index_type,
+                         index_params=args.index_params,
+                         mmap_index=args.mmap_index,
+                         candidates=args.candidates,
+                         speculate_on_failure=args.speculate_on_failure)
@@ -0,0 +1,369 @@
+"""
+Long-lived RAG service: one resident NetUnicornRAG (index, embeddings, LLM clients and chains built
+once) serving generation, retrieval and judge requests over local HTTP or a Unix socket.
+
+Requests go through a bounded queue to a fixed number of worker threads. A full queue is rejected
+at once (HTTP 503) instead of piling up, and a request that has not finished within its timeout
+gets HTTP 504. A timed-out request that has not started yet is dropped from the queue; one that is
+already running cannot be interrupted, so it finishes in the background and its result is discarded.
+
+    POST /generate  {"prompt": ..., "save_final_script": true, "enable_feedback_loop": true,
+                     "max_retries": 3, "work_tag": "...", "context_log": false, "timeout_s": 600}
+    POST /retrieve  {"prompt": ..., "k": 4}
+    POST /judge     {"prompt": ..., "k": 3, "judge_model_name": "gpt-3.5-turbo"}
+    GET  /health    queue depth, worker count and request counters
+"""
+import http.client
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from .context_judge import ContextJudge, DEFAULT_JUDGE_MODEL
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_TIMEOUT_S = 900.0
+# Request bodies are a prompt and a few options; anything larger is a client bug.
+MAX_BODY_BYTES = 1 << 20
+
+REQUEST_KINDS = ("generate", "retrieve", "judge")
+
+
+class RAGServiceError(Exception):
+    """An error answered by the service (or the failure to reach it), with its HTTP status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"RAG service error {status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class _Job:
+    def __init__(self, job_id: int, kind: str, payload: Dict[str, Any]):
+        self.id = job_id
+        self.kind = kind
+        self.payload = payload
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.cancelled = False
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[Exception] = None
+
+
+class RAGService:
+    """
+    Runs requests against one shared NetUnicornRAG on `workers` threads fed by a queue of at most
+    `queue_size` waiting requests. Generation requests get a unique work tag, so concurrent
+    requests never share attempt or final script paths or NetUnicorn experiment names.
+    """
+
+    def __init__(self, rag, workers: int = DEFAULT_WORKERS, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 default_timeout_s: float = DEFAULT_TIMEOUT_S, judge_chat_model=None):
+        """
+        Args:
+            rag: The NetUnicornRAG instance to serve (ideally built with lazy=True; see warm_up).
+            workers: Number of requests processed concurrently.
+            queue_size: Requests allowed to wait for a worker; more are rejected.
+            default_timeout_s: Per-request timeout when the request does not set "timeout_s".
+            judge_chat_model: Prebuilt chat model for judge requests instead of ChatOpenAI.
+        """
+        self.rag = rag
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.default_timeout_s = default_timeout_s
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue(maxsize=self.queue_size)
+        self._judges: Dict[str, ContextJudge] = {}
+        self._judge_chat_model = judge_chat_model
+        self._lock = threading.Lock()
+        self._next_id = 0
+        # Request ids restart at 1 in every process; the instance id keeps work tags (and with them
+        # experiment names) apart across restarts and servers sharing one NetUnicorn account.
+        self.instance_id = os.urandom(3).hex()
+        self._threads: list[threading.Thread] = []
+        self.started_at = time.time()
+        self.warm_up_s: Optional[float] = None
+        self.counters = {"accepted": 0, "rejected": 0, "completed": 0, "failed": 0, "timed_out": 0, "dropped": 0}
+        self.running = 0
+
+    def warm_up(self) -> float:
+        """Builds the index, lexical index and chains before the first request. Returns seconds taken."""
+        started = time.perf_counter()
+        self.rag.lexical_index
+        if self.rag.retrieval_mode != "lexical":
+            self.rag.vector_store
+        # Generation retrieves itself and only needs the docs chains (the retrieval chains would
+        # build the vector store even in lexical mode).
+        self.rag.initial_docs_chain
+        self.rag.feedback_docs_chain
+        if self.rag.retry_mode == "patch":
+            self.rag.patch_docs_chain
+        self.warm_up_s = round(time.perf_counter() - started, 3)
+        logging.info(f"RAGService: Warm-up finished in {self.warm_up_s}s.")
+        return self.warm_up_s
+
+    def start(self) -> None:
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"rag_service_worker_{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def health(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"status": "ok", "workers": self.workers, "queue_size": self.queue_size,
+                    "queued": self._queue.qsize(), "running": self.running,
+                    "uptime_s": round(time.time() - self.started_at, 1), "warm_up_s": self.warm_up_s,
+                    **self.counters}
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queues a request and waits for its result. Raises RAGServiceError: 400 for a bad request,
+        503 if the queue is full, 504 on timeout, 500 if the request itself failed otherwise.
+        """
+        if kind not in REQUEST_KINDS:
+            raise RAGServiceError(404, f"Unknown request kind '{kind}'. Expected one of: {', '.join(REQUEST_KINDS)}")
+        if not isinstance(payload.get("prompt"), str) or not payload["prompt"].strip():
+            raise RAGServiceError(400, "'prompt' must be a non-empty string.")
+        try:
+            timeout_s = float(payload.get("timeout_s") or self.default_timeout_s)
+        except (TypeError, ValueError):
+            raise RAGServiceError(400, "'timeout_s' must be a number.")
+
+        with self._lock:
+            self._next_id += 1
+            job = _Job(self._next_id, kind, payload)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self.counters["rejected"] += 1
+            raise RAGServiceError(503, f"Queue full ({self.queue_size} requests waiting); retry later.")
+        with self._lock:
+            self.counters["accepted"] += 1
+
+        if not job.done.wait(timeout_s):
+            with self._lock:
+                job.cancelled = True
+                self.counters["timed_out"] += 1
+            raise RAGServiceError(504, f"Request {job.id} did not finish within {timeout_s:g}s.")
+        if job.error is not None:
+            if isinstance(job.error, RAGServiceError):
+                raise job.error
+            if isinstance(job.error, ValueError):
+                # NetUnicornRAG validates its inputs (prompt, work_tag) with ValueError.
+                raise RAGServiceError(400, str(job.error))
+            raise RAGServiceError(500, f"{type(job.error).__name__}: {job.error}")
+        return job.result
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.cancelled:
+                    self.counters["dropped"] += 1
+                    continue
+                self.running += 1
+            started = time.perf_counter()
+            try:
+                job.result = getattr(self, f"_{job.kind}")(job)
+                job.result.setdefault("service", {}).update(
+                    request_id=job.id, queue_wait_s=round(started - job.enqueued_at, 3),
+                    run_s=round(time.perf_counter() - started, 3))
+            except Exception as e:
+                logging.error(f"RAGService: Request {job.id} ({job.kind}) failed: {e}")
+                job.error = e
+            with self._lock:
+                self.running -= 1
+                self.counters["failed" if job.error is not None else "completed"] += 1
+            job.done.set()
+
+    def _generate(self, job: _Job) -> Dict[str, Any]:
+        payload = job.payload
+        # Also appended to the experiment names of the request's scripts.
+        work_tag = f"svc{self.instance_id}_{job.id:06d}"
+        if payload.get("work_tag"):
+            work_tag += f"_{payload['work_tag']}"
+        kwargs = {
+            "user_prompt": payload["prompt"],
+            "save_final_script": bool(payload.get("save_final_script", True)),
+            "enable_feedback_loop": bool(payload.get("enable_feedback_loop", True)),
+            "work_tag": work_tag,
+        }
+        if payload.get("max_retries") is not None:
+            kwargs["max_retries"] = int(payload["max_retries"])
+        retrieved_context = None
+        if payload.get("context_log"):
+            # Same flow as evaluate_rag.py: one retrieval for the context log and the generation.
+            kwargs["retrieved_docs"] = self.rag.retrieve(payload["prompt"])
+            retrieved_context = self.rag.log_retrieved_chunks(payload["prompt"], k=3, retrieved_docs=kwargs["retrieved_docs"])
+        result = self.rag.generate_code(**kwargs)
+        if retrieved_context is not None:
+            result["retrieved_context"] = retrieved_context
+        result["service"] = {"work_tag": work_tag}
+        return result
+
+    def _retrieve(self, job: _Job) -> Dict[str, Any]:
+        k = job.payload.get("k")
+        docs = self.rag.retrieve(job.payload["prompt"], k=int(k) if k else None)
+        return {"chunks": [{"chunk_id": self.rag._chunk_id(doc), "source": doc.metadata.get("source"),
+                            "content": doc.page_content} for doc in docs]}
+
+    def _judge_for(self, model_name: str) -> ContextJudge:
+        with self._lock:
+            if model_name not in self._judges:
+                self._judges[model_name] = ContextJudge(model_name, self.rag.openai_api_key, self._judge_chat_model)
+            return self._judges[model_name]
+
+    def _judge(self, job: _Job) -> Dict[str, Any]:
+        k = int(job.payload.get("k") or 3)
+        docs = self.rag.retrieve(job.payload["prompt"], k=k)
+        judge = self._judge_for(job.payload.get("judge_model_name") or DEFAULT_JUDGE_MODEL)
+        return {**judge.judge(job.payload["prompt"], docs), "judge_model_name": judge.model_name,
+                "retrieved_chunk_ids": [self.rag._chunk_id(doc) for doc in docs]}
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    server_version = "NL4NetUnicornRAG/1.0"
+    service: RAGService = None  # set on the per-server subclass
+
+    def address_string(self) -> str:
+        # Unix-socket peers have no (host, port) address.
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format: str, *args) -> None:
+        logging.info(f"RAGService: {self.address_string()} {format % args}")
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 503:
+            self.send_header("Retry-After", "5")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") == "/health":
+            self._send_json(200, self.service.health())
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self) -> None:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                raise RAGServiceError(413, f"Request body larger than {MAX_BODY_BYTES} bytes.")
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError as e:
+                raise RAGServiceError(400, f"Invalid JSON body: {e}")
+            if not isinstance(payload, dict):
+                raise RAGServiceError(400, "Request body must be a JSON object.")
+            self._send_json(200, self.service.submit(self.path.strip("/"), payload))
+        except RAGServiceError as e:
+            self._send_json(e.status, {"error": e.message})
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self) -> None:
+        socketserver.UnixStreamServer.server_bind(self)
+        # BaseHTTPRequestHandler reads these for logging and the Server header.
+        self.server_name, self.server_port = "localhost", 0
+
+
+def make_server(service: RAGService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, unix_socket: str = None):
+    """
+    HTTP server for `service` on `host:port`, or on the Unix socket path `unix_socket` (a stale
+    socket file from an earlier run is replaced). Call serve_forever() on the result.
+    """
+    handler = type("RAGServiceRequestHandler", (_RequestHandler,), {"service": service})
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        return _ThreadingUnixHTTPServer(unix_socket, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+class RAGServiceClient:
+    """
+    Thin client for a running RAG service. `address` is "http://host:port" or "unix:/path/to/socket".
+    Methods return the service's JSON answer as a dict and raise RAGServiceError on failure.
+    """
+
+    def __init__(self, address: str, timeout_s: float = DEFAULT_TIMEOUT_S):
+        self.address = address
+        # The socket timeout leaves the service time to answer 504 for its own timeout first.
+        self.timeout_s = timeout_s
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self.address.startswith("unix:"):
+            return _UnixHTTPConnection(self.address[len("unix:"):], self.timeout_s + 30)
+        parsed = urlparse(self.address if "://" in self.address else f"http://{self.address}")
+        return http.client.HTTPConnection(parsed.hostname, parsed.port or DEFAULT_PORT, timeout=self.timeout_s + 30)
+
+    def _request(self, method: str, path: str, payload: Dict[str, Any] = None) -> Dict[str, Any]:
+        connection = self._connection()
+        try:
+            body = json.dumps(payload).encode("utf-8") if payload is not None else None
+            connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            data = json.loads(response.read() or b"{}")
+        except (OSError, http.client.HTTPException, json.JSONDecodeError) as e:
+            raise RAGServiceError(0, f"Cannot reach RAG service at {self.address}: {e}")
+        finally:
+            connection.close()
+        if response.status != 200:
+            raise RAGServiceError(response.status, data.get("error", response.reason))
+        return data
+
+    def _post(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        payload = {key: value for key, value in payload.items() if value is not None}
+        payload.setdefault("timeout_s", self.timeout_s)
+        return self._request("POST", f"/{kind}", payload)
+
+    def health(self) -> Dict[str, Any]:
+        return self._request("GET", "/health")
+
+    def generate(self, prompt: str, save_final_script: bool = True, enable_feedback_loop: bool = True,
+                 max_retries: int = None, work_tag: str = None, context_log: bool = False) -> Dict[str, Any]:
+        return self._post("generate", {"prompt": prompt, "save_final_script": save_final_script,
+                                       "enable_feedback_loop": enable_feedback_loop, "max_retries": max_retries,
+                                       "work_tag": work_tag, "context_log": context_log})
+
+    def retrieve(self, prompt: str, k: int = None) -> Dict[str, Any]:
+        return self._post("retrieve", {"prompt": prompt, "k": k})
+
+    def judge(self, prompt: str, k: int = 3, judge_model_name: str = None) -> Dict[str, Any]:
+        return self._post("judge", {"prompt": prompt, "k": k, "judge_model_name": judge_model_name})
@@ -1,26 +1,365 @@
+import asyncio
+import codecs
 import subprocess
 import tempfile
 import os
+import json
+import re
+import signal
 import sys # Import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .spans import span
+
+# (name, stream, pattern) where stream is "stdout", "stderr" or "any". A match means the script
+# has already failed even if it keeps running (e.g. still inside a status polling loop).
+DEFAULT_FAILURE_SIGNATURES: List[Tuple[str, str, str]] = [
+    ("traceback", "stderr", r"^Traceback \(most recent call last\):"),
+    ("experiment_status_unknown", "stdout", r"ExperimentStatus\.UNKNOWN"),
+    ("prepare_error", "stdout", r"Prepared: False, Error: (?!None\b)\S"),
+]
+
+# (name, stream, pattern): the first matching line's time since process start is reported under
+# "milestones", splitting a run into interpreter startup, remote prepare and result polling.
+DEFAULT_MILESTONES: List[Tuple[str, str, str]] = [
+    ("first_output", "any", r"."),
+    ("prepare_started", "stdout", r"^Preparing experiment"),
+    ("execution_started", "stdout", r"^Starting execution"),
+    ("finished", "stdout", r"^Final experiment status"),
+]
+
+# arun_script reads output in chunks of this size and splits the lines itself (StreamReader.readline
+# discards a line longer than its limit). A line longer than _ASYNC_LINE_LIMIT is fed in pieces.
+_ASYNC_READ_SIZE = 1 << 16
+_ASYNC_LINE_LIMIT = 1 << 20
+
+
+class BoundedCapture:
+    """Keeps the first `head_chars` and the last `tail_chars` of a stream, dropping the middle."""
+
+    def __init__(self, head_chars: int = 20000, tail_chars: int = 20000):
+        self.head_chars = head_chars
+        self.tail_chars = tail_chars
+        self.head: List[str] = []
+        self.head_size = 0
+        self.tail: deque = deque()
+        self.tail_size = 0
+        self.dropped_chars = 0
+
+    def append(self, text: str) -> None:
+        if self.head_size < self.head_chars:
+            # A single huge line is split: what fits goes to the head, the rest to the tail.
+            room = self.head_chars - self.head_size
+            self.head.append(text[:room])
+            self.head_size += len(text[:room])
+            text = text[room:]
+            if not text:
+                return
+        if len(text) > self.tail_chars:
+            self.dropped_chars += len(text) - self.tail_chars
+            text = text[len(text) - self.tail_chars:]
+            if not text:
+                return
+        self.tail.append(text)
+        self.tail_size += len(text)
+        while self.tail_size > self.tail_chars:
+            excess = self.tail_size - self.tail_chars
+            oldest = self.tail.popleft()
+            if len(oldest) > excess:
+                # Trim the oldest entry instead of dropping it whole, so the tail stays full.
+                self.tail.appendleft(oldest[excess:])
+                oldest = oldest[:excess]
+            self.tail_size -= len(oldest)
+            self.dropped_chars += len(oldest)
+
+    @property
+    def truncated(self) -> bool:
+        return self.dropped_chars > 0
+
+    def getvalue(self) -> str:
+        middle = f"\n... [{self.dropped_chars} characters omitted] ...\n" if self.dropped_chars else ""
+        return "".join(self.head) + middle + "".join(self.tail)
+
+
+class _OutputMonitor:
+    """
+    Per-run output state shared by run_script and arun_script: bounded captures, milestone times
+    and the first failure signature seen.
+    """
+
+    def __init__(self, executor: "ScriptExecutor", process_started: float):
+        self.executor = executor
+        self.process_started = process_started
+        self.captures = {
+            "stdout": BoundedCapture(executor.head_chars, executor.tail_chars),
+            "stderr": BoundedCapture(executor.head_chars, executor.tail_chars),
+        }
+        self.milestones: Dict[str, float] = {}
+        self.failure_reason = None
+        self.failure_at = None
+        self._lock = threading.Lock()
+
+    def feed(self, stream_name: str, line: str) -> None:
+        self.captures[stream_name].append(line)
+        for name, stream, pattern in self.executor.milestones:
+            if name not in self.milestones and stream in (stream_name, "any") and pattern.search(line):
+                self.milestones.setdefault(name, round(time.monotonic() - self.process_started, 3))
+        if self.executor.on_output:
+            self.executor.on_output(stream_name, line)
+        matched = self.executor._match_failure(stream_name, line)
+        if matched:
+            with self._lock:
+                if self.failure_reason is None:
+                    self.failure_reason = matched
+                    self.failure_at = time.monotonic()
+
+    def abort_reason(self, started: float, cancelled: bool = False) -> Optional[str]:
+        """Why the still running script should be killed now, or None."""
+        now = time.monotonic()
+        if cancelled:
+            return "cancelled"
+        if self.executor.timeout is not None and now - started > self.executor.timeout:
+            return "timeout"
+        if (self.executor.abort_on_failure and self.failure_at is not None
+                and now - self.failure_at >= self.executor.abort_grace_seconds):
+            return self.failure_reason
+        return None
+
+    def result(self, returncode: int, filepath: str, aborted_reason: Optional[str]) -> dict:
+        stderr = self.captures["stderr"].getvalue()
+        if aborted_reason:
+            stderr += f"\n[ScriptExecutor] Script aborted early: {aborted_reason}. Output above is partial.\n"
+        return {
+            "success": returncode == 0 and aborted_reason is None,
+            "stdout": self.captures["stdout"].getvalue(),
+            "stderr": stderr,
+            "filepath": filepath,
+            "exit_code": returncode,
+            "aborted_early": aborted_reason is not None,
+            "abort_reason": aborted_reason,
+            "truncated": self.captures["stdout"].truncated or self.captures["stderr"].truncated,
+            "milestones": self.milestones
+        }
+
 
 class ScriptExecutor:
-    def run_script(self, script_content: str, script_filepath: str = None) -> dict:
+    def __init__(self,
+                 failure_signatures: Optional[List[Tuple[str, str, str]]] = None,
+                 abort_on_failure: bool = True,
+                 abort_grace_seconds: float = 2.0,
+                 timeout: Optional[float] = None,
+                 head_chars: int = 20000,
+                 tail_chars: int = 20000,
+                 on_output: Optional[Callable[[str, str], None]] = None,
+                 milestones: Optional[List[Tuple[str, str, str]]] = None):
+        """
+        Args:
+            failure_signatures: (name, stream, regex) triples; a matching output line marks the run as failed.
+                                Defaults to DEFAULT_FAILURE_SIGNATURES.
+            abort_on_failure: If True, the script is killed once a failure signature matches.
+            abort_grace_seconds: Time allowed after a match for the rest of the error (e.g. the full traceback) to arrive.
+            timeout: Optional wall-clock limit in seconds for one script.
+            head_chars: Characters kept from the start of each stream.
+            tail_chars: Characters kept from the end of each stream; anything in between is dropped.
+            on_output: Optional callback (stream_name, line) invoked for every line as it is produced.
+            milestones: (name, stream, regex) triples; the time of each one's first matching line is reported.
+                        Defaults to DEFAULT_MILESTONES.
+        """
+        signatures = DEFAULT_FAILURE_SIGNATURES if failure_signatures is None else failure_signatures
+        self.failure_signatures = [(name, stream, re.compile(pattern, re.MULTILINE)) for name, stream, pattern in signatures]
+        self.abort_on_failure = abort_on_failure
+        self.abort_grace_seconds = abort_grace_seconds
+        self.timeout = timeout
+        self.head_chars = head_chars
+        self.tail_chars = tail_chars
+        self.on_output = on_output
+        milestones = DEFAULT_MILESTONES if milestones is None else milestones
+        self.milestones = [(name, stream, re.compile(pattern)) for name, stream, pattern in milestones]
+
+    def _match_failure(self, stream_name: str, line: str) -> Optional[str]:
+        for name, stream, pattern in self.failure_signatures:
+            if stream in (stream_name, "any") and pattern.search(line):
+                return name
+        return None
+
+    def _command(self, script_path: str) -> Tuple[List[str], Optional[Dict[str, str]]]:
+        """The command line and environment (None = inherit) that run the script."""
+        python_executable = sys.executable
+        if not python_executable:
+            python_executable = "python"
+        return [python_executable, "-u", script_path], None
+
+    def _start_process(self, script_path: str):
+        """
+        Starts the script and returns a Popen-like handle (pid, stdout, stderr, poll(), wait(), returncode).
+        The script runs in its own session so the whole process group can be killed on abort.
+        """
+        command, env = self._command(script_path)
+        return subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            env=env,
+            start_new_session=(os.name == "posix")
+        )
+
+    async def _astart_process(self, script_path: str) -> asyncio.subprocess.Process:
+        """Like _start_process, as an asyncio subprocess with byte streams."""
+        command, env = self._command(script_path)
+        return await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+            start_new_session=(os.name == "posix")
+        )
+
+    @staticmethod
+    def _kill(process: subprocess.Popen) -> None:
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except (ProcessLookupError, PermissionError, OSError):
+            pass
+
+    def run_script(self, script_content: str, script_filepath: str = None,
+                   cancel_event: Optional[threading.Event] = None) -> dict:
         """
-        Runs the given Python script content in a separate process.
+        Runs the given Python script content in a separate process, streaming its output.
 
         Args:
             script_content: The Python script code as a string.
-            script_filepath: Optional. If provided, the script is saved here before execution. 
+            script_filepath: Optional. If provided, the script is saved here before execution.
                              Otherwise, a temporary file is used.
+            cancel_event: Optional. If set while the script runs, the script is killed and the run
+                          is reported as aborted with reason "cancelled".
 
         Returns:
             A dictionary with:
-                - "success": bool (True if exit code is 0, False otherwise)
-                - "stdout": str (captured standard output)
-                - "stderr": str (captured standard error)
+                - "success": bool (True if exit code is 0 and the script was not aborted, False otherwise)
+                - "stdout": str (captured standard output, middle dropped if too long)
+                - "stderr": str (captured standard error, middle dropped if too long)
                 - "filepath": str (path to the script that was executed)
-                - "exit_code": int (the exit code of the script)
+                - "exit_code": int (the exit code of the script; negative if it was killed)
+                - "aborted_early": bool (True if the script was killed on a failure signature, timeout or cancellation)
+                - "abort_reason": str or None (name of the matched failure signature, "timeout" or "cancelled")
+                - "truncated": bool (True if any output was dropped from the middle)
+                - "milestones": dict (seconds from process start to the first line matching each milestone that was seen)
         """
+        current_file_path, temp_file_created = self._write_script(script_content, script_filepath)
+        try:
+            process_started = time.monotonic()
+            process = self._start_process(current_file_path)
+            monitor = _OutputMonitor(self, process_started)
+
+            def pump(stream_name: str, pipe) -> None:
+                for line in iter(pipe.readline, ""):
+                    monitor.feed(stream_name, line)
+                pipe.close()
+
+            readers = [threading.Thread(target=pump, args=(name, getattr(process, name)), daemon=True)
+                       for name in ("stdout", "stderr")]
+            for reader in readers:
+                reader.start()
+
+            started = time.monotonic()
+            aborted_reason = None
+            while process.poll() is None:
+                aborted_reason = monitor.abort_reason(started, cancel_event is not None and cancel_event.is_set())
+                if aborted_reason:
+                    self._kill(process)
+                    break
+                time.sleep(0.05)
+            process.wait()
+            for reader in readers:
+                reader.join()
+
+            return monitor.result(process.returncode, current_file_path, aborted_reason)
+        finally:
+            self._remove_temp_script(current_file_path, temp_file_created)
+
+    async def arun_script(self, script_content: str, script_filepath: str = None) -> dict:
+        """
+        Asyncio counterpart of run_script: the script runs as an asyncio subprocess and its output is
+        read on the event loop, so many scripts can run concurrently without a thread each. Failure
+        signatures, timeout, capture limits and the result dict are the same as run_script.
+
+        Cancelling the awaiting task kills the script (and its process group) before CancelledError
+        propagates.
+        """
+        current_file_path, temp_file_created = self._write_script(script_content, script_filepath)
+        try:
+            process_started = time.monotonic()
+            process = await self._astart_process(current_file_path)
+            monitor = _OutputMonitor(self, process_started)
+
+            async def pump(stream_name: str, reader: asyncio.StreamReader) -> None:
+                decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+                pending = ""
+                while True:
+                    chunk = await reader.read(_ASYNC_READ_SIZE)
+                    pending += decoder.decode(chunk, final=not chunk)
+                    *lines, pending = pending.split("\n")
+                    for line in lines:
+                        monitor.feed(stream_name, line + "\n")
+                    if not chunk:
+                        break
+                    if len(pending) >= _ASYNC_LINE_LIMIT:
+                        monitor.feed(stream_name, pending)
+                        pending = ""
+                if pending:
+                    monitor.feed(stream_name, pending)
+
+            readers = [asyncio.ensure_future(pump(name, getattr(process, name))) for name in ("stdout", "stderr")]
+            started = time.monotonic()
+            aborted_reason = None
+            try:
+                while process.returncode is None:
+                    aborted_reason = monitor.abort_reason(started)
+                    if aborted_reason:
+                        self._kill(process)
+                        break
+                    try:
+                        await asyncio.wait_for(asyncio.shield(process.wait()), 0.05)
+                    except asyncio.TimeoutError:
+                        pass
+                await process.wait()
+                await asyncio.gather(*readers)
+            except asyncio.CancelledError:
+                self._kill(process)
+                for reader in readers:
+                    reader.cancel()
+                await asyncio.shield(process.wait())
+                raise
+            return monitor.result(process.returncode, current_file_path, aborted_reason)
+        finally:
+            self._remove_temp_script(current_file_path, temp_file_created)
+
+    async def _arun_script_in_thread(self, script_content: str, script_filepath: str = None) -> dict:
+        """
+        arun_script for executors whose processes cannot be asyncio subprocesses: run_script runs in a
+        worker thread, and cancelling the awaiting task cancels the script through its cancel_event.
+        """
+        cancel_event = threading.Event()
+        future = asyncio.ensure_future(asyncio.to_thread(self.run_script, script_content, script_filepath,
+                                                         cancel_event=cancel_event))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            cancel_event.set()
+            await future
+            raise
+
+    def _write_script(self, script_content: str, script_filepath: str = None) -> Tuple[str, bool]:
+        """Saves the script to `script_filepath` (or a temporary file). Returns (path, is_temporary)."""
         temp_file_created = False
         if script_filepath:
             script_dir = os.path.dirname(script_filepath)
@@ -31,36 +370,42 @@ class ScriptExecutor:
             with tempfile.NamedTemporaryFile(mode="w", delete=False, suffix=".py", encoding="utf-8") as tmp_file:
                 current_file_path = tmp_file.name
             temp_file_created = True
-
         try:
-            with open(current_file_path, "w", encoding="utf-8") as f:
-                f.write(script_content)
-
-            python_executable = sys.executable
-            if not python_executable: 
-                python_executable = "python"
-
-
-            process = subprocess.run(
-                [python_executable, current_file_path],
-                capture_output=True,
-                text=True,
-                check=False 
-            )
-            
-            success = process.returncode == 0
-            return {
-                "success": success,
-                "stdout": process.stdout,
-                "stderr": process.stderr,
-                "filepath": current_file_path,
-                "exit_code": process.returncode
-            }
-        finally:
-            if temp_file_created and os.path.exists(current_file_path):
-                try:
-                    os.remove(current_file_path)
-                except OSError as e:
-                    print(f"Warning: Could not delete temporary script file {current_file_path}: {e}", file=sys.stderr)
-            elif not temp_file_created and script_filepath:
-                pass 
\ No newline at end of file
+            with span("save_script", path=current_file_path):
+                with open(current_file_path, "w", encoding="utf-8") as f:
+                    f.write(script_content)
+        except BaseException:
+            self._remove_temp_script(current_file_path, temp_file_created)
+            raise
+        return current_file_path, temp_file_created
+
+    @staticmethod
+    def _remove_temp_script(path: str, temp_file_created: bool) -> None:
+        if temp_file_created and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Warning: Could not delete temporary script file {path}: {e}", file=sys.stderr)
+
+
+class DryRunScriptExecutor(ScriptExecutor):
+    """
+    ScriptExecutor that runs scripts against the local fake NetUnicorn client (fake_netunicorn.py)
+    with time.sleep fast-forwarded, so a script's whole experiment lifecycle completes in seconds
+    without credentials or live nodes.
+    """
+
+    def __init__(self, scenario: Optional[dict] = None, **kwargs):
+        """
+        Args:
+            scenario: Overrides for fake_netunicorn.DEFAULT_SCENARIO (node pool, prepare/run durations,
+                      prepare errors, final status, per-node results).
+            **kwargs: Passed to ScriptExecutor.
+        """
+        super().__init__(**kwargs)
+        self.scenario = scenario or {}
+
+    def _command(self, script_path: str) -> Tuple[List[str], Optional[Dict[str, str]]]:
+        bootstrap_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_netunicorn.py")
+        env = dict(os.environ, NL4NU_DRY_RUN_SCENARIO=json.dumps(self.scenario))
+        return [sys.executable or "python", "-u", bootstrap_path, script_path], env
@@ -0,0 +1,153 @@
+import difflib
+import re
+from typing import List, Optional, Tuple
+
+# Minimum similarity for a fuzzy match of an edit's original lines against the script.
+FUZZY_MATCH_RATIO = 0.85
+
+_SEARCH_MARKER = re.compile(r"^\s*<{5,}\s*SEARCH\b")
+_DIVIDER_MARKER = re.compile(r"^\s*={5,}\s*$")
+_REPLACE_MARKER = re.compile(r"^\s*>{5,}\s*REPLACE\b")
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+# (original lines, replacement lines, 0-based line hint or None)
+Edit = Tuple[List[str], List[str], Optional[int]]
+
+
+class PatchError(ValueError):
+    """Raised when a model response contains no usable edits or an edit cannot be located."""
+
+
+class ScriptPatcher:
+    """
+    Applies the edits of a patch-mode retry answer to the previous script. Understands
+    SEARCH/REPLACE blocks and unified diff hunks. An edit's original lines are located exactly,
+    then ignoring indentation and trailing whitespace, then by fuzzy similarity (difflib), preferring
+    the match closest to the hunk's line number.
+    """
+
+    def __init__(self, fuzzy_ratio: float = FUZZY_MATCH_RATIO):
+        self.fuzzy_ratio = fuzzy_ratio
+
+    def parse(self, response: str) -> List[Edit]:
+        if any(_SEARCH_MARKER.match(line) for line in response.splitlines()):
+            return self._parse_search_replace(response)
+        if any(_HUNK_HEADER.match(line) for line in response.splitlines()):
+            return self._parse_unified_diff(response)
+        raise PatchError("Response contains neither SEARCH/REPLACE blocks nor unified diff hunks.")
+
+    @staticmethod
+    def _parse_search_replace(response: str) -> List[Edit]:
+        edits: List[Edit] = []
+        search: Optional[List[str]] = None
+        replace: Optional[List[str]] = None
+        for line in response.splitlines():
+            if _SEARCH_MARKER.match(line):
+                search, replace = [], None
+            elif search is not None and replace is None and _DIVIDER_MARKER.match(line):
+                replace = []
+            elif replace is not None and _REPLACE_MARKER.match(line):
+                edits.append((search, replace, None))
+                search, replace = None, None
+            elif replace is not None:
+                replace.append(line)
+            elif search is not None:
+                search.append(line)
+        if search is not None:
+            raise PatchError("Unterminated SEARCH/REPLACE block.")
+        return edits
+
+    @staticmethod
+    def _parse_unified_diff(response: str) -> List[Edit]:
+        edits: List[Edit] = []
+        current: Optional[Edit] = None
+        for line in response.splitlines():
+            header = _HUNK_HEADER.match(line)
+            if header:
+                current = ([], [], max(int(header.group(1)) - 1, 0))
+                edits.append(current)
+            elif current is None or line.startswith(("---", "+++", "```")):
+                if line.startswith("```"):
+                    current = None
+            elif line.startswith("-"):
+                current[0].append(line[1:])
+            elif line.startswith("+"):
+                current[1].append(line[1:])
+            elif line.startswith(" ") or line == "":
+                current[0].append(line[1:])
+                current[1].append(line[1:])
+            elif line.startswith("\\"):
+                continue
+            else:
+                current = None
+        return edits
+
+    def _locate(self, lines: List[str], original: List[str], hint: Optional[int]) -> Tuple[int, bool]:
+        """Returns (start index, whether the match ignored indentation) of `original` in `lines`."""
+        size = len(original)
+        windows = range(len(lines) - size + 1)
+
+        def closest(candidates: List[int]) -> int:
+            return min(candidates, key=lambda start: abs(start - hint)) if hint is not None else candidates[0]
+
+        exact = [start for start in windows if lines[start:start + size] == original]
+        if exact:
+            return closest(exact), False
+        stripped_original = [line.strip() for line in original]
+        loose = [start for start in windows if [line.strip() for line in lines[start:start + size]] == stripped_original]
+        if loose:
+            return closest(loose), True
+
+        target = "\n".join(stripped_original)
+        best_ratio, best = 0.0, []
+        for start in windows:
+            ratio = difflib.SequenceMatcher(None, "\n".join(line.strip() for line in lines[start:start + size]), target).ratio()
+            if ratio > best_ratio + 1e-9:
+                best_ratio, best = ratio, [start]
+            elif abs(ratio - best_ratio) <= 1e-9:
+                best.append(start)
+        if best and best_ratio >= self.fuzzy_ratio:
+            return closest(best), True
+        raise PatchError(f"Could not locate edit (best similarity {best_ratio:.2f}):\n" + "\n".join(original[:5]))
+
+    @staticmethod
+    def _reindent(replacement: List[str], original: List[str], matched: List[str]) -> List[str]:
+        """Shifts the replacement by the indentation difference between the edit and the script."""
+        for edit_line, script_line in zip(original, matched):
+            if edit_line.strip():
+                delta = (len(script_line) - len(script_line.lstrip())) - (len(edit_line) - len(edit_line.lstrip()))
+                break
+        else:
+            return replacement
+        if delta > 0:
+            return [" " * delta + line if line.strip() else line for line in replacement]
+        if delta < 0:
+            return [line[-delta:] if line[:-delta].strip() == "" else line.lstrip() for line in replacement]
+        return replacement
+
+    def apply(self, code: str, response: str) -> str:
+        """
+        Applies every edit in `response` to `code` and returns the patched script.
+
+        Raises:
+            PatchError: If the response has no edits or any edit cannot be located.
+        """
+        edits = self.parse(response)
+        if not edits:
+            raise PatchError("Response contains no edits.")
+        lines = code.splitlines()
+        offset = 0
+        for original, replacement, hint in edits:
+            if hint is not None:
+                hint += offset
+            if not any(line.strip() for line in original):
+                if hint is None:
+                    raise PatchError("Edit has an empty SEARCH section.")
+                start, loose = min(hint, len(lines)), False
+            else:
+                start, loose = self._locate(lines, original, hint)
+            if loose:
+                replacement = self._reindent(replacement, original, lines[start:start + len(original)])
+            lines[start:start + len(original)] = replacement
+            offset += len(replacement) - len(original)
+        return "\n".join(lines) + ("\n" if code.endswith("\n") else "")
@@ -0,0 +1,140 @@
+import ast
+import builtins
+import importlib
+import importlib.util
+from typing import Dict, List, Optional, Set
+
+# Only imports from these packages are checked; anything else is left to the interpreter.
+CHECKED_IMPORT_PACKAGES = ("netunicorn", "returns")
+
+
+def find_undefined_names(tree: ast.AST) -> List[ast.Name]:
+    """
+    Returns every ast.Name that is loaded but never bound. Scopes are flattened: a name bound anywhere
+    counts as defined everywhere. This misses some errors but never flags valid scripts, which
+    matters more when the result blocks execution or rewrites the script.
+    """
+    bound: Set[str] = set(dir(builtins)) | {"__file__", "__name__"}
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                bound.add((alias.asname or alias.name).split(".")[0])
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            bound.add(node.id)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            bound.update(node.names)
+        elif isinstance(node, ast.MatchAs) and node.name:
+            bound.add(node.name)
+    return [node for node in ast.walk(tree)
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id not in bound]
+
+
+class ScriptValidator:
+    """
+    Static checks run on a generated script before it is executed. Each check only inspects the
+    AST (plus import lookups against the installed packages), so a whole pass takes milliseconds
+    instead of a subprocess start and possibly a remote experiment prepare.
+    """
+
+    def __init__(self, checked_packages: tuple = CHECKED_IMPORT_PACKAGES, check_structure: bool = True):
+        """
+        Args:
+            checked_packages: Top-level packages whose imports are verified against the installed modules.
+            check_structure: Whether to require the NetUnicorn script skeleton (client, experiment mapping, status polling).
+        """
+        self.checked_packages = checked_packages
+        self.check_structure = check_structure
+        self._module_cache: Dict[str, Optional[object]] = {}
+
+    def validate(self, script_content: str) -> List[str]:
+        """
+        Validates the script and returns a list of human-readable findings. An empty list means the
+        script passed every check.
+        """
+        try:
+            tree = ast.parse(script_content)
+        except SyntaxError as e:
+            line = (e.text or "").strip()
+            return [f"SyntaxError: {e.msg} (line {e.lineno}): {line}"]
+
+        findings: List[str] = []
+        findings.extend(self._check_imports(tree))
+        findings.extend(self._check_undefined_names(tree))
+        if self.check_structure:
+            findings.extend(self._check_structure(tree))
+        return findings
+
+    def _import_module(self, module_name: str) -> Optional[object]:
+        if module_name not in self._module_cache:
+            try:
+                self._module_cache[module_name] = importlib.import_module(module_name)
+            except Exception:
+                self._module_cache[module_name] = None
+        return self._module_cache[module_name]
+
+    def _package_installed(self, module_name: str) -> bool:
+        top_level = module_name.split(".")[0]
+        if top_level not in self.checked_packages:
+            return False
+        try:
+            return importlib.util.find_spec(top_level) is not None
+        except (ImportError, ValueError):
+            return False
+
+    def _check_imports(self, tree: ast.AST) -> List[str]:
+        findings = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    if self._package_installed(alias.name) and self._import_module(alias.name) is None:
+                        findings.append(f"ImportError (line {node.lineno}): module '{alias.name}' cannot be imported.")
+            elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+                if not self._package_installed(node.module):
+                    continue
+                module = self._import_module(node.module)
+                if module is None:
+                    findings.append(f"ImportError (line {node.lineno}): module '{node.module}' does not exist or cannot be imported.")
+                    continue
+                for alias in node.names:
+                    if alias.name == "*" or hasattr(module, alias.name):
+                        continue
+                    if self._import_module(f"{node.module}.{alias.name}") is None:
+                        findings.append(f"ImportError (line {node.lineno}): cannot import name '{alias.name}' from '{node.module}'.")
+        return findings
+
+    def _check_undefined_names(self, tree: ast.AST) -> List[str]:
+        findings = []
+        reported: Set[str] = set()
+        for node in find_undefined_names(tree):
+            if node.id not in reported:
+                reported.add(node.id)
+                findings.append(f"NameError (line {node.lineno}): name '{node.id}' is used but never imported or defined.")
+        return findings
+
+    def _check_structure(self, tree: ast.AST) -> List[str]:
+        called: Set[str] = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Call):
+                if isinstance(node.func, ast.Name):
+                    called.add(node.func.id)
+                elif isinstance(node.func, ast.Attribute):
+                    called.add(node.func.attr)
+
+        findings = []
+        if "RemoteClient" not in called:
+            findings.append("Structure: no RemoteClient(...) is created; the script must connect with RemoteClient(endpoint=..., login=..., password=...).")
+        if "Experiment" not in called or "map" not in called:
+            findings.append("Structure: no experiment mapping found; create the experiment with Experiment().map(pipeline, working_nodes).")
+        if "prepare_experiment" not in called:
+            findings.append("Structure: client.prepare_experiment(experiment, experiment_name) is never called.")
+        if "start_execution" not in called:
+            findings.append("Structure: client.start_execution(experiment_name) is never called.")
+        if "get_experiment_status" not in called:
+            findings.append("Structure: the experiment status is never polled; loop on client.get_experiment_status(experiment_name).")
+        return findings
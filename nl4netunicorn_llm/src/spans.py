@@ -0,0 +1,149 @@
+"""
+Per-phase timing spans for the generation pipeline.
+
+`recording()` starts collecting spans for the current thread or task (a contextvars.ContextVar,
+so concurrent evaluation workers never mix their spans); `span(name, **attributes)` times a block
+and appends it to the active recording, or does nothing if none is active. A span is a dict:
+
+    {"name": "llm.initial", "start": <epoch seconds>, "duration_s": 1.234, "parent": "generate_code",
+     "thread": "eval_worker_0", "attributes": {"prompt_tokens": 1480, "completion_tokens": 612}}
+
+Spans export as JSON lines (`write_jsonl`) and Prometheus text format (`to_prometheus`), and
+`phase_percentiles` summarizes p50/p95 per phase over many runs.
+"""
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+_current_spans: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("nl4nu_spans", default=None)
+_current_parent: ContextVar[Optional[str]] = ContextVar("nl4nu_span_parent", default=None)
+
+METRIC_PREFIX = "nl4nu"
+
+
+@contextmanager
+def recording(spans: Optional[List[Dict[str, Any]]] = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Collects the spans recorded inside the block into `spans` (a new list if None). Without an
+    explicit list, an already active recording is joined instead, so nested calls (e.g.
+    generate_code inside an evaluation worker) add to the outer run's spans.
+    """
+    active = _current_spans.get()
+    if spans is None and active is not None:
+        yield active
+        return
+    spans = [] if spans is None else spans
+    token = _current_spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _current_spans.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Times the block as phase `name`. Yields the attribute dict so the block can add values it only
+    knows at the end (token counts, cache hits). An exception escaping the block is recorded as
+    attributes["error"] and re-raised.
+    """
+    spans = _current_spans.get()
+    if spans is None:
+        yield attributes
+        return
+    record = {"name": name, "start": time.time(), "duration_s": None, "parent": _current_parent.get(),
+              "thread": threading.current_thread().name, "attributes": attributes}
+    parent_token = _current_parent.set(name)
+    started = time.perf_counter()
+    try:
+        yield attributes
+    except BaseException as e:
+        attributes["error"] = type(e).__name__
+        raise
+    finally:
+        record["duration_s"] = round(time.perf_counter() - started, 6)
+        _current_parent.reset(parent_token)
+        spans.append(record)
+
+
+def add_span(name: str, start: float, duration_s: float, **attributes: Any) -> None:
+    """Records an already measured phase (e.g. one reconstructed from a child process's output)."""
+    spans = _current_spans.get()
+    if spans is not None:
+        spans.append({"name": name, "start": start, "duration_s": round(duration_s, 6), "parent": _current_parent.get(),
+                      "thread": threading.current_thread().name, "attributes": attributes})
+
+
+def write_jsonl(spans: Iterable[Dict[str, Any]], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for record in spans:
+            f.write(json.dumps(record, default=str) + "\n")
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def phase_percentiles(spans: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Returns {phase: {"count", "total_s", "p50_s", "p95_s", "max_s"}} in order of first appearance."""
+    durations: Dict[str, List[float]] = {}
+    for record in spans:
+        durations.setdefault(record["name"], []).append(record["duration_s"])
+    summary = {}
+    for name, values in durations.items():
+        values.sort()
+        summary[name] = {"count": len(values), "total_s": round(sum(values), 3), "p50_s": round(_percentile(values, 0.5), 3),
+                         "p95_s": round(_percentile(values, 0.95), 3), "max_s": round(values[-1], 3)}
+    return summary
+
+
+def format_phase_table(summary: Dict[str, Dict[str, float]]) -> str:
+    width = max([len("phase")] + [len(name) for name in summary])
+    lines = [f"{'phase'.ljust(width)}  {'count':>5}  {'p50 s':>8}  {'p95 s':>8}  {'max s':>8}  {'total s':>9}"]
+    for name, stats in summary.items():
+        lines.append(f"{name.ljust(width)}  {stats['count']:>5}  {stats['p50_s']:>8.3f}  {stats['p95_s']:>8.3f}  "
+                     f"{stats['max_s']:>8.3f}  {stats['total_s']:>9.3f}")
+    return "\n".join(lines)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_prometheus(spans: Iterable[Dict[str, Any]], prefix: str = METRIC_PREFIX) -> str:
+    """
+    Renders the spans in Prometheus text exposition format: a summary of phase durations
+    (p50/p95 quantiles, sum, count) and counters of LLM prompt/completion tokens per phase.
+    """
+    spans = list(spans)
+    metric = f"{prefix}_phase_duration_seconds"
+    lines = [f"# HELP {metric} Time spent per generation pipeline phase.", f"# TYPE {metric} summary"]
+    for name, stats in phase_percentiles(spans).items():
+        label = f'phase="{_escape_label(name)}"'
+        lines.append(f'{metric}{{{label},quantile="0.5"}} {stats["p50_s"]}')
+        lines.append(f'{metric}{{{label},quantile="0.95"}} {stats["p95_s"]}')
+        lines.append(f"{metric}_sum{{{label}}} {stats['total_s']}")
+        lines.append(f"{metric}_count{{{label}}} {stats['count']}")
+
+    tokens: Dict[tuple, int] = {}
+    for record in spans:
+        for kind in ("prompt", "completion"):
+            count = record["attributes"].get(f"{kind}_tokens")
+            if count is not None:
+                tokens[(record["name"], kind)] = tokens.get((record["name"], kind), 0) + count
+    if tokens:
+        metric = f"{prefix}_llm_tokens_total"
+        lines += [f"# HELP {metric} LLM tokens per phase and kind.", f"# TYPE {metric} counter"]
+        for (name, kind), count in tokens.items():
+            lines.append(f'{metric}{{phase="{_escape_label(name)}",kind="{kind}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(spans: Iterable[Dict[str, Any]], path: str, prefix: str = METRIC_PREFIX) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(to_prometheus(spans, prefix))
@@ -0,0 +1,155 @@
+"""
+Structured catalog of the NetUnicorn symbols documented in netunicorn_docs.json: for each task or
+core class, the module it is imported from, its constructor signature (when documented) and the
+environment definition it needs. The catalog is precomputed into data/task_catalog.json:
+
+    python -m nl4netunicorn_llm.src.task_catalog [docs.json] [catalog.json]
+
+and loaded once per process by TaskCatalog.load for O(1) lookups by name.
+"""
+import json
+import os
+import re
+import sys
+from typing import Dict, List, Optional
+
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+DEFAULT_DOCS_PATH = os.path.join(DATA_DIR, "netunicorn_docs.json")
+DEFAULT_CATALOG_PATH = os.path.join(DATA_DIR, "task_catalog.json")
+
+TASKS_PACKAGE = "netunicorn.library.tasks"
+
+# Symbols every script needs but the docs only show in passing (or not at all).
+_CORE_SYMBOLS = [
+    ("RemoteClient", "netunicorn.client.remote"),
+    ("RemoteClientException", "netunicorn.client.remote"),
+    ("Experiment", "netunicorn.base.experiment"),
+    ("ExperimentStatus", "netunicorn.base.experiment"),
+    ("Pipeline", "netunicorn.base.pipeline"),
+    ("ShellExecution", "netunicorn.base.environment_definitions"),
+    ("DockerImage", "netunicorn.base.environment_definitions"),
+    ("is_successful", "returns.pipeline"),
+    ("Result", "returns.result"),
+    ("Success", "returns.result"),
+    ("Failure", "returns.result"),
+]
+
+# Standard library names generated scripts use without importing.
+STDLIB_IMPORTS = {
+    "time": "import time",
+    "os": "import os",
+    "sys": "import sys",
+    "json": "import json",
+    "pprint": "from pprint import pprint",
+}
+
+_IMPORT_LINE = re.compile(r"\bfrom\s+((?:netunicorn|returns)(?:\.\w+)+)\s+import\s+([\w ,]+)")
+_DOTTED_ENTRY = re.compile(r"^\s*-\s+`((?:[a-z_0-9]+\.)*)([A-Z]\w*)\((.*?)\)`")
+_DOC_MODULE = re.compile(r"(?:[Tt]asks|functions) (?:from|in) (?:submodules of )?`(netunicorn(?:\.\w+)+)`")
+_USAGE_SIGNATURE = re.compile(r"`(?:pipeline\.then\()?(\w+)\(([^`]*?)\)\)?`")
+
+
+def _environment(content: str) -> Optional[str]:
+    match = re.search(r"\*\*requires\*\*[^.]*?`(ShellExecution|DockerImage)`", content)
+    return match.group(1) if match else None
+
+
+def build_catalog(docs: List[dict]) -> Dict[str, List[dict]]:
+    """Extracts {name: [{"module", "signature", "environment", "kind", "source"}]} from the docs JSON entries."""
+    catalog: Dict[str, List[dict]] = {}
+
+    def add(name: str, module: str, kind: str, source: str, signature: Optional[str] = None, environment: Optional[str] = None) -> None:
+        entries = catalog.setdefault(name, [])
+        for entry in entries:
+            if entry["module"] == module:
+                entry["signature"] = entry["signature"] or signature
+                entry["environment"] = entry["environment"] or environment
+                return
+        entries.append({"module": module, "signature": signature, "environment": environment, "kind": kind, "source": source})
+
+    for name, module in _CORE_SYMBOLS:
+        add(name, module, "core", "builtin")
+
+    for doc in docs:
+        source, content = doc.get("source", ""), doc.get("content", "")
+        environment = _environment(content)
+        doc_module = _DOC_MODULE.search(content)
+        for line in content.splitlines():
+            if line.lstrip().startswith("#"):
+                continue
+            import_match = _IMPORT_LINE.search(line)
+            if import_match:
+                module = import_match.group(1)
+                for name in (part.strip() for part in import_match.group(2).split(",")):
+                    if not name:
+                        continue
+                    kind = "task" if module.startswith(TASKS_PACKAGE) else "core"
+                    add(name, module, kind, source, environment=environment if kind == "task" else None)
+                continue
+            entry_match = _DOTTED_ENTRY.match(line)
+            if entry_match and doc_module:
+                prefix, name = entry_match.group(1).rstrip("."), entry_match.group(2)
+                signature = entry_match.group(3).replace('\\"', '"')
+                base = doc_module.group(1)
+                if prefix and base.startswith(TASKS_PACKAGE):
+                    module = f"{TASKS_PACKAGE}.{prefix}"
+                else:
+                    module = f"{base}.{prefix}" if prefix else base
+                add(name, module, "task" if module.startswith(TASKS_PACKAGE) else "function", source,
+                    signature=None if signature == "..." else signature)
+
+        # Single-task entries document the constructor only through usage examples.
+        for name, arguments in _USAGE_SIGNATURE.findall(content):
+            for entry in catalog.get(name, []):
+                if entry["source"] == source and entry["signature"] is None and arguments and arguments != "...":
+                    entry["signature"] = arguments.replace('\\"', '"')
+    return catalog
+
+
+class TaskCatalog:
+    """
+    Name -> import path / signature / environment lookup over the precomputed catalog. Instances
+    are cached per path, so every component shares one parsed catalog.
+    """
+    _instances: Dict[str, "TaskCatalog"] = {}
+
+    def __init__(self, entries: Dict[str, List[dict]]):
+        self.entries = entries
+        self._modules = {name: {entry["module"] for entry in items} for name, items in entries.items()}
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_CATALOG_PATH) -> "TaskCatalog":
+        path = os.path.abspath(path)
+        if path not in cls._instances:
+            with open(path, "r", encoding="utf-8") as f:
+                cls._instances[path] = cls(json.load(f)["symbols"])
+        return cls._instances[path]
+
+    def lookup(self, name: str) -> List[dict]:
+        return self.entries.get(name, [])
+
+    def modules_for(self, name: str) -> set:
+        return self._modules.get(name, set())
+
+    def unique_module(self, name: str) -> Optional[str]:
+        modules = self._modules.get(name)
+        return next(iter(modules)) if modules and len(modules) == 1 else None
+
+    def environment_for(self, name: str) -> Optional[str]:
+        environments = {entry["environment"] for entry in self.entries.get(name, []) if entry["environment"]}
+        return environments.pop() if len(environments) == 1 else None
+
+
+def main() -> None:
+    docs_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DOCS_PATH
+    catalog_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_CATALOG_PATH
+    with open(docs_path, "r", encoding="utf-8") as f:
+        catalog = build_catalog(json.load(f))
+    with open(catalog_path, "w", encoding="utf-8") as f:
+        json.dump({"symbols": dict(sorted(catalog.items()))}, f, indent=1)
+        f.write("\n")
+    print(f"Wrote {len(catalog)} symbols to {catalog_path}")
+
+
+if __name__ == "__main__":
+    main()
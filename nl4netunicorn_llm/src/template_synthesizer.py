@@ -0,0 +1,306 @@
+import logging
+import re
+import shlex
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "single": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+_NUMBER = r"(\d+|" + "|".join(_NUMBER_WORDS) + r")"
+_NODE_COUNT_PATTERN = re.compile(r"\b" + _NUMBER + r"\s+(?:available\s+|random\s+|different\s+|separate\s+)?nodes?\b", re.IGNORECASE)
+
+# Words a plain "pick N nodes, run these tasks, print the results" request may contain besides the
+# task phrases themselves. Any other word makes the parser give the request to the LLM.
+_FILLER_WORDS = set("""
+a an the and then after afterward afterwards finally first next also both each every of them it its their on in at to
+for from with using use uses by is are be been that which this so please simple basic netunicorn script pipeline
+experiment generate generates create creates write writes build builds make makes construct constructs
+select selects selecting pick picks choose chooses take takes available random different separate node nodes
+run runs running execute executes executing perform performs performing do does task tasks test tests
+print prints printing printed show shows display displays report reports result results output outputs
+all ensure ensures connect connects connecting server wait waits seconds second secs
+""".split()) | set(_NUMBER_WORDS)
+
+_CAPTURE_FILE = "capture.pcap"
+_CAPTURE_TASK_NAME = "start_capture"
+
+
+def _number(text: str) -> int:
+    return int(text) if text.isdigit() else _NUMBER_WORDS[text.lower()]
+
+
+def _sleep(match: re.Match) -> Optional[str]:
+    return f"SleepTask({_number(match.group(1))})"
+
+
+def _random_sleep(match: re.Match) -> Optional[str]:
+    if not match.group(1):
+        return None
+    return f"RandomSleepTask({_number(match.group(1))}, {_number(match.group(2))})"
+
+
+def _shell_command(match: re.Match) -> Optional[str]:
+    try:
+        arguments = shlex.split(match.group("cmd"))
+    except ValueError:
+        return None
+    return f"ShellCommand(command={arguments!r})" if arguments else None
+
+
+def _ping(match: re.Match) -> Optional[str]:
+    count = f", count={int(match.group('count'))}" if match.group("count") else ""
+    return f"Ping(host={match.group('host')!r}{count})"
+
+
+# (task class, module, requires ShellExecution, phrase pattern, builder returning the constructor call or None)
+_TEMPLATE_TASKS: List[Tuple[str, str, bool, str, Callable[[re.Match], Optional[str]]]] = [
+    ("RandomSleepTask", "netunicorn.library.tasks.utils.sleep", False,
+     r"\brandom\s+sleep(?:\s+task)?(?:\s+(?:between|of|from)\s+" + _NUMBER + r"\s+(?:and|to|-)\s+" + _NUMBER + r"\s+seconds?)?",
+     _random_sleep),
+    ("SleepTask", "netunicorn.library.tasks.basic", False,
+     r"(?<!random )\bsleep(?:s|ing)?(?:\s+task)?(?:\s+(?:for|of|with))?\s+" + _NUMBER + r"\s*(?:seconds?|secs?|s)\b",
+     _sleep),
+    ("ShellCommand", "netunicorn.library.tasks.basic", True,
+     r"\b(?:shell\s+)?command\s*:?\s*(?P<q>[`'\"])(?P<cmd>.+?)(?P=q)",
+     _shell_command),
+    ("Ping", "netunicorn.library.tasks.measurements.ping", False,
+     r"\bping(?:s|ing)?(?:\s+test)?(?:\s+(?:to|against|of))?\s+(?P<host>(?:\d{1,3}\.){3}\d{1,3}|[a-z0-9-]+(?:\.[a-z0-9-]+)+)"
+     r"(?:\s+(?P<count>\d+)\s+times)?",
+     _ping),
+    ("OoklaSpeedtest", "netunicorn.library.tasks.measurements.ookla_speedtest", False,
+     r"\b(?:an\s+)?ookla\s+speed\s?test\b", lambda match: "OoklaSpeedtest()"),
+    ("NDT7SpeedTest", "netunicorn.library.tasks.measurements.ndt", False,
+     r"\b(?:an\s+)?ndt7?\s+speed\s?test\b", lambda match: "NDT7SpeedTest()"),
+    ("CloudflareSpeedTest", "netunicorn.library.tasks.measurements.cloudflare.speedtest", False,
+     r"\b(?:a\s+)?cloudflare\s+speed\s?test\b", lambda match: "CloudflareSpeedTest()"),
+    ("DummyTask", "netunicorn.library.tasks.basic", False,
+     r"\b(?:a\s+)?dummy\s+task\b", lambda match: "DummyTask()"),
+]
+
+# tcpdump captures wrap the rest of the pipeline: started first and stopped last.
+_CAPTURE_PATTERN = re.compile(
+    r"\b(?:(?:start(?:s|ing)?|begin(?:s|ning)?)\s+(?:a\s+)?)?tcpdump(?:\s+(?:packet\s+)?capture)?\b"
+    r"|\bcaptur(?:e|es|ing)\s+(?:the\s+)?(?:network\s+)?traffic\s+(?:using|with)\s+tcpdump\b"
+    r"|\b(?:and\s+)?stop(?:s|ping)?\s+the\s+capture(?:\s+afterwards?)?\b",
+    re.IGNORECASE)
+
+# Phrases that look like a supported task but need more than the fixed skeleton provides.
+_BLOCKING_PATTERN = re.compile(
+    r"server\s+selection|ookla\s+server|analy[sz]|filter|named?\b|by\s+name|all\s+(?:available\s+)?nodes|every\s+node",
+    re.IGNORECASE)
+
+_SCRIPT_TEMPLATE = '''import time
+from pprint import pprint
+
+from netunicorn.client.remote import RemoteClient, RemoteClientException
+from netunicorn.base.experiment import Experiment, ExperimentStatus
+from netunicorn.base.pipeline import Pipeline
+{environment_import}{task_imports}
+from returns.pipeline import is_successful
+from returns.result import Result
+
+NETUNICORN_ENDPOINT = {endpoint!r}
+NETUNICORN_LOGIN = {login!r}
+NETUNICORN_PASSWORD = {password!r}
+
+client = RemoteClient(endpoint=NETUNICORN_ENDPOINT, login=NETUNICORN_LOGIN, password=NETUNICORN_PASSWORD)
+print(f"Client Healthcheck: {{client.healthcheck()}}")
+
+pipeline = Pipeline()
+{pipeline_steps}
+
+node_pool = client.get_nodes()
+print(f"Available nodes: {{node_pool}}")
+working_nodes = node_pool.take({node_count})
+if not working_nodes or len(working_nodes) < {node_count}:
+    print(f"Not enough working nodes available (need {node_count}, got {{len(working_nodes) if working_nodes else 0}}). Exiting.")
+    exit()
+print(f"Selected working nodes: {{working_nodes}}")
+
+experiment = Experiment().map(pipeline, working_nodes)
+{environment_definition}
+experiment_name = f"{experiment_prefix}_{{time.strftime('%Y%m%d%H%M%S')}}"
+print(f"Using experiment name: {{experiment_name}}")
+
+try:
+    client.delete_experiment(experiment_name)
+    print(f"Successfully deleted pre-existing experiment: {{experiment_name}}")
+except RemoteClientException:
+    print(f"Info: Experiment '{{experiment_name}}' not found or couldn't be deleted (may not exist, this is not an error).")
+except Exception as e:
+    print(f"Warning: An unexpected error during experiment deletion for '{{experiment_name}}': {{e}}")
+
+client.prepare_experiment(experiment, experiment_name)
+print(f"Preparing experiment: {{experiment_name}}")
+
+while True:
+    status_info = client.get_experiment_status(experiment_name)
+    print(f"Current status of {{experiment_name}}: {{status_info.status}}")
+    if status_info.status == ExperimentStatus.READY:
+        break
+    if status_info.status in (ExperimentStatus.FINISHED, ExperimentStatus.UNKNOWN):
+        print(f"Experiment {{experiment_name}} reached {{status_info.status}} before READY. Error: {{status_info.error}}")
+        exit(1)
+    time.sleep(5)
+
+for deployment in status_info.experiment:
+    print(f"Node: {{deployment.node}}, Prepared: {{deployment.prepared}}, Error: {{deployment.error}}")
+
+client.start_execution(experiment_name)
+print(f"Starting execution of {{experiment_name}}")
+
+while True:
+    status_info = client.get_experiment_status(experiment_name)
+    print(f"Current status of {{experiment_name}}: {{status_info.status}}")
+    if status_info.status != ExperimentStatus.RUNNING:
+        break
+    time.sleep(10)
+
+final_status_info = client.get_experiment_status(experiment_name)
+print(f"Final experiment status: {{final_status_info.status}}")
+if final_status_info.status == ExperimentStatus.FINISHED and final_status_info.execution_result:
+    print("Experiment Finished Successfully. Processing results:")
+    for report in final_status_info.execution_result:
+        print(f"--- Report for Node: {{report.node.name}} ---")
+        print(f"  Error (if any): {{report.error}}")
+        actual_result_value, log_list = report.result
+        print(f"  Actual Result Type: {{type(actual_result_value)}}")
+        if isinstance(actual_result_value, Result):
+            processed_value = actual_result_value.unwrap() if is_successful(actual_result_value) else actual_result_value.failure()
+            print("  Processed Result (from returns.Result):")
+            pprint(processed_value)
+        else:
+            print("  Result (raw):")
+            pprint(actual_result_value)
+        print("  Logs:")
+        if log_list:
+            for log_entry in log_list:
+                print(f"    {{str(log_entry).strip()}}")
+        else:
+            print("    (No logs reported for this task)")
+        print("--- End Report ---")
+elif final_status_info.status != ExperimentStatus.FINISHED:
+    print(f"Experiment did not finish successfully. Final status: {{final_status_info.status}}")
+    if final_status_info.error:
+        print(f"Error details from final_status_info: {{final_status_info.error}}")
+    exit(1)
+else:
+    print(f"Experiment status is {{final_status_info.status}} but no execution results found or an issue occurred.")
+    exit(1)
+'''
+
+
+class TemplateSynthesizer:
+    """
+    LLM-free fast path for plain "take N nodes, run task A then task B, print the results" requests.
+    A conservative intent parser maps the prompt to catalogued tasks. The script is filled into the
+    same fixed skeleton the system prompt prescribes and checked statically before it is returned.
+    Anything the parser is not sure about (unknown words, tasks that need names, server selection or
+    node filtering) is left to the LLM.
+    """
+
+    def __init__(self, script_validator: Any = None, experiment_prefix: str = "nl4nu_tpl"):
+        """
+        Args:
+            script_validator: Optional. A ScriptValidator; a synthesized script with findings is discarded.
+            experiment_prefix: Prefix of the experiment names in synthesized scripts.
+        """
+        self.script_validator = script_validator
+        self.experiment_prefix = experiment_prefix
+        self.logger = logging.getLogger(f"TemplateSynthesizer.{id(self)}")
+        self._task_patterns = [(name, module, shell, re.compile(pattern, re.IGNORECASE), build)
+                               for name, module, shell, pattern, build in _TEMPLATE_TASKS]
+
+    def parse(self, user_prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns {"node_count", "tasks": [(class, module, call)], "shell_execution"} or None if the
+        request is not confidently a plain task pipeline.
+        """
+        if _BLOCKING_PATTERN.search(user_prompt):
+            return None
+        covered: List[Tuple[int, int]] = []
+        found: List[Tuple[int, str, str, str, bool]] = []
+        for name, module, shell, pattern, build in self._task_patterns:
+            for match in pattern.finditer(user_prompt):
+                if any(start < match.end() and match.start() < end for start, end in covered):
+                    continue
+                call = build(match)
+                if call is None:
+                    return None
+                covered.append(match.span())
+                found.append((match.start(), name, module, call, shell))
+        capture = False
+        for match in _CAPTURE_PATTERN.finditer(user_prompt):
+            capture = True
+            covered.append(match.span())
+        if not found:
+            return None
+
+        node_count = 1
+        node_matches = list(_NODE_COUNT_PATTERN.finditer(user_prompt))
+        if len({_number(match.group(1)) for match in node_matches}) > 1:
+            return None
+        for match in node_matches:
+            node_count = _number(match.group(1))
+            covered.append(match.span())
+
+        residual = list(user_prompt)
+        for start, end in covered:
+            residual[start:end] = " " * (end - start)
+        unknown = [word for word in re.findall(r"[a-z0-9']+", "".join(residual).lower())
+                   if word not in _FILLER_WORDS and not word.isdigit()]
+        if unknown:
+            self.logger.info(f"Template path not confident (unrecognized: {', '.join(sorted(set(unknown))[:8])}).")
+            return None
+
+        tasks = [(name, module, call) for _, name, module, call, _ in sorted(found)]
+        if capture:
+            capture_module = "netunicorn.library.tasks.capture.tcpdump"
+            tasks.insert(0, ("StartCapture", capture_module, f"StartCapture(filepath={_CAPTURE_FILE!r}).set_name({_CAPTURE_TASK_NAME!r})"))
+            tasks.append(("StopNamedCapture", capture_module, f"StopNamedCapture({_CAPTURE_TASK_NAME!r})"))
+        return {
+            "node_count": node_count,
+            "tasks": tasks,
+            "shell_execution": any(shell for _, _, _, _, shell in found),
+        }
+
+    def render(self, intent: Dict[str, Any], credentials: Dict[str, str]) -> str:
+        modules: Dict[str, List[str]] = {}
+        for name, module, _ in intent["tasks"]:
+            if name not in modules.setdefault(module, []):
+                modules[module].append(name)
+        task_imports = "".join(f"from {module} import {', '.join(names)}\n" for module, names in modules.items())
+        shell = intent["shell_execution"]
+        return _SCRIPT_TEMPLATE.format(
+            environment_import="from netunicorn.base.environment_definitions import ShellExecution\n" if shell else "",
+            task_imports=task_imports,
+            endpoint=credentials["endpoint"],
+            login=credentials["login"],
+            password=credentials["password"],
+            pipeline_steps="\n".join(f"pipeline.then({call})" for _, _, call in intent["tasks"]),
+            node_count=intent["node_count"],
+            environment_definition="experiment.environment_definition = ShellExecution()\n" if shell else "",
+            experiment_prefix=self.experiment_prefix,
+        )
+
+    def synthesize(self, user_prompt: str, credentials: Dict[str, str]) -> Optional[str]:
+        """
+        Returns a complete script for `user_prompt`, or None if the request should go to the LLM.
+        """
+        intent = self.parse(user_prompt)
+        if intent is None:
+            return None
+        code = self.render(intent, credentials)
+        try:
+            compile(code, "<synthesized script>", "exec")
+        except SyntaxError as e:
+            self.logger.warning(f"Synthesized script does not compile ({e}); using the LLM instead.")
+            return None
+        if self.script_validator is not None:
+            findings = self.script_validator.validate(code)
+            if findings:
+                self.logger.warning(f"Synthesized script failed validation ({'; '.join(findings)}); using the LLM instead.")
+                return None
+        self.logger.info(f"Synthesized script from template: {[name for name, _, _ in intent['tasks']]} on {intent['node_count']} node(s).")
+        return code
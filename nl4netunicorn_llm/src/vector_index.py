@@ -0,0 +1,134 @@
+import logging
+import math
+from typing import Any, Dict, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+
+# Build parameters change the on-disk index; search parameters only change how it is queried.
+DEFAULT_INDEX_PARAMS: Dict[str, Dict[str, Any]] = {
+    "flat": {},
+    # nlist=None picks ~4*sqrt(n) lists (capped so each list gets >= 39 training points).
+    # pq_m > 0 compresses vectors with product quantization (pq_m sub-vectors of 8 bits).
+    "ivf": {"nlist": None, "nprobe": 16, "pq_m": 0},
+    "hnsw": {"m": 32, "ef_construction": 200, "ef_search": 64},
+}
+SEARCH_PARAMS = {"nprobe", "ef_search"}
+
+# FAISS wants at least this many training points per IVF list / PQ centroid.
+MIN_POINTS_PER_CENTROID = 39
+PQ_CENTROIDS = 256
+
+
+def _faiss():
+    import faiss
+    return faiss
+
+
+class VectorIndexBuilder:
+    """
+    Creates, tunes and loads the FAISS index behind the vector store.
+
+    "flat" is exact search over every vector. "ivf" clusters the vectors into `nlist` lists and scans
+    the `nprobe` nearest ones (optionally PQ-compressed). "hnsw" walks a graph of `m` links per vector,
+    visiting `ef_search` candidates. Raising `nprobe` / `ef_search` trades latency for recall. All three
+    use L2 distance, like the langchain default.
+    """
+
+    def __init__(self, index_type: str = "flat", params: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            index_type: One of INDEX_TYPES.
+            params: Overrides for DEFAULT_INDEX_PARAMS[index_type] (unknown keys are rejected).
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index_type '{index_type}'. Expected one of: {', '.join(INDEX_TYPES)}")
+        unknown = set(params or {}) - set(DEFAULT_INDEX_PARAMS[index_type])
+        if unknown:
+            raise ValueError(f"Unknown {index_type} index parameter(s): {', '.join(sorted(unknown))}. "
+                             f"Expected: {', '.join(DEFAULT_INDEX_PARAMS[index_type]) or 'none'}")
+        self.index_type = index_type
+        self.params = {**DEFAULT_INDEX_PARAMS[index_type], **(params or {})}
+
+    @property
+    def supports_delete(self) -> bool:
+        """HNSW graphs cannot remove vectors; the index is rebuilt (from cached embeddings) instead."""
+        return self.index_type != "hnsw"
+
+    def cache_key(self) -> str:
+        """The settings that change the stored index, for the index cache key."""
+        build_params = {key: value for key, value in sorted(self.params.items()) if key not in SEARCH_PARAMS}
+        return f"index={self.index_type}|{build_params}" if self.index_type != "flat" else ""
+
+    def _nlist(self, count: int) -> int:
+        if self.params["nlist"]:
+            return max(1, min(self.params["nlist"], count))
+        return max(1, min(int(4 * math.sqrt(count)), count // MIN_POINTS_PER_CENTROID))
+
+    def build(self, vectors: "np.ndarray"):
+        """Returns an empty index for `vectors`' dimension, trained on `vectors` if the type needs it."""
+        import numpy as np
+        faiss = _faiss()
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        count, dimension = vectors.shape
+        if self.index_type == "flat":
+            index = faiss.IndexFlatL2(dimension)
+        elif self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dimension, self.params["m"])
+            index.hnsw.efConstruction = self.params["ef_construction"]
+        else:
+            nlist = self._nlist(count)
+            quantizer = faiss.IndexFlatL2(dimension)
+            pq_m = self.params["pq_m"]
+            if pq_m and (dimension % pq_m or count < PQ_CENTROIDS):
+                logging.warning(f"VectorIndex: pq_m={pq_m} needs a dimension divisible by it and at least "
+                                f"{PQ_CENTROIDS} vectors (have d={dimension}, n={count}); using uncompressed IVF.")
+                pq_m = 0
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, 8) if pq_m else faiss.IndexIVFFlat(quantizer, dimension, nlist)
+            index.train(vectors)
+            logging.info(f"VectorIndex: trained IVF index with {nlist} lists on {count} vectors.")
+        self.configure(index)
+        return index
+
+    def configure(self, index) -> None:
+        """Applies the search-time parameters (nprobe, ef_search) to a built or loaded index."""
+        faiss = _faiss()
+        if self.index_type == "ivf":
+            faiss.extract_index_ivf(index).nprobe = self.params["nprobe"]
+        elif self.index_type == "hnsw":
+            index.hnsw.efSearch = self.params["ef_search"]
+
+    def read(self, path: str, mmap: bool = True) -> Tuple[Any, bool]:
+        """
+        Loads an index written by faiss.write_index. With `mmap`, the vector data is memory-mapped
+        read-only, so processes on one host share the page cache instead of each holding a copy.
+        FAISS >= 1.9 (IO_FLAG_MMAP_IFC) maps flat, IVF and HNSW indexes; older versions map only IVF
+        lists and read the rest into memory. Falls back to a plain read if mapping fails.
+        Returns (index, whether mapping was requested successfully).
+        """
+        faiss = _faiss()
+        index, mapped = None, False
+        if mmap:
+            # The two mmap flags are alternatives: combined, FAISS rejects IVF indexes.
+            flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+            try:
+                index, mapped = faiss.read_index(path, flags), True
+            except RuntimeError as e:
+                logging.warning(f"VectorIndex: cannot memory-map {path} ({e}); loading it into memory.")
+        if index is None:
+            index = faiss.read_index(path)
+        self.configure(index)
+        return index, mapped
+
+
+def parse_index_params(text: Optional[str]) -> Dict[str, int]:
+    """Parses the CLI form "nprobe=32,ef_search=128" into {"nprobe": 32, "ef_search": 128}."""
+    params = {}
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        key, sep, value = item.partition("=")
+        if not sep or not value.strip().isdigit():
+            raise ValueError(f"Invalid index parameter '{item}'. Expected name=integer, e.g. nprobe=32.")
+        params[key.strip()] = int(value)
+    return params
@@ -0,0 +1,192 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import signal
+import socket
+import subprocess
+import sys
+import threading
+from typing import Optional, Sequence
+
+from .script_executor import ScriptExecutor
+
+WORKER_SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "warm_worker.py")
+
+# What every generated script imports before doing anything else.
+DEFAULT_PRELOAD_MODULES = (
+    "netunicorn.client.remote",
+    "netunicorn.base",
+    "netunicorn.library",
+    "returns.result",
+    "returns.pipeline",
+)
+
+
+class _WarmWorker:
+    """Client side of one warm_worker.py fork-server process."""
+
+    def __init__(self, preload_modules: Sequence[str]):
+        parent_sock, child_sock = socket.socketpair()
+        self.process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT_PATH, str(child_sock.fileno()), *preload_modules],
+            pass_fds=(child_sock.fileno(),),
+            stdin=subprocess.DEVNULL,
+        )
+        child_sock.close()
+        self.sock = parent_sock
+        self.reader = parent_sock.makefile("r", encoding="utf-8")
+        self.ready = False
+        self.broken = False
+
+    def read_message(self) -> dict:
+        line = self.reader.readline()
+        if not line:
+            raise EOFError("warm worker closed its socket")
+        return json.loads(line)
+
+    def wait_ready(self) -> None:
+        if not self.ready:
+            if not self.read_message().get("ready"):
+                raise EOFError("warm worker did not report ready")
+            self.ready = True
+
+    def alive(self) -> bool:
+        return not self.broken and self.process.poll() is None
+
+    def close(self) -> None:
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class _ForkedProcess:
+    """Popen-like handle for a script running in a child forked by a warm worker."""
+
+    def __init__(self, worker: _WarmWorker, release, pid: int, stdout, stderr):
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode: Optional[int] = None
+        self._worker = worker
+        self._release = release
+        self._done = threading.Event()
+        threading.Thread(target=self._wait_for_exit, daemon=True).start()
+
+    def _wait_for_exit(self) -> None:
+        try:
+            self.returncode = self._worker.read_message()["exit_code"]
+        except (OSError, EOFError, ValueError, KeyError):
+            self._worker.broken = True
+            self.returncode = -1
+        finally:
+            self._done.set()
+            self._release(self._worker)
+
+    def poll(self) -> Optional[int]:
+        return self.returncode if self._done.is_set() else None
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[int]:
+        self._done.wait(timeout)
+        return self.returncode
+
+    def kill(self) -> None:
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+class WarmScriptExecutor(ScriptExecutor):
+    """
+    ScriptExecutor that runs scripts in children forked from a pool of pre-warmed interpreters.
+
+    Each worker imports `preload_modules` once at startup, so an attempt no longer pays for starting
+    Python and importing netunicorn/returns. Every script still gets its own forked process with its
+    own stdout/stderr pipes, and the result dict is the same as ScriptExecutor.run_script. Falls back
+    to a cold subprocess on platforms without fork/SCM_RIGHTS or if a worker fails.
+    """
+
+    def __init__(self, pool_size: int = 2, preload_modules: Sequence[str] = DEFAULT_PRELOAD_MODULES, **kwargs):
+        """
+        Args:
+            pool_size: Number of warm worker processes (at most this many scripts start warm concurrently).
+            preload_modules: Modules each worker imports before serving scripts.
+            **kwargs: Passed to ScriptExecutor (failure signatures, timeout, capture sizes, ...).
+        """
+        super().__init__(**kwargs)
+        self.preload_modules = tuple(preload_modules)
+        self.logger = logging.getLogger(f"WarmScriptExecutor.{id(self)}")
+        self._idle: "queue.Queue[_WarmWorker]" = queue.Queue()
+        self._closed = False
+        if not (hasattr(os, "fork") and hasattr(socket, "send_fds")):
+            self.logger.warning("Warm executor needs fork() and SCM_RIGHTS; using cold subprocesses instead.")
+            pool_size = 0
+        self.pool_size = pool_size
+        for _ in range(pool_size):
+            self._idle.put(_WarmWorker(self.preload_modules))
+        atexit.register(self.close)
+
+    def _release(self, worker: _WarmWorker) -> None:
+        if self._closed:
+            worker.close()
+            return
+        if not worker.alive():
+            worker.close()
+            worker = _WarmWorker(self.preload_modules)
+        self._idle.put(worker)
+
+    async def arun_script(self, script_content: str, script_filepath: str = None) -> dict:
+        if self.pool_size == 0:
+            return await super().arun_script(script_content, script_filepath)
+        # Forked children are not asyncio subprocesses, so the blocking path runs in a thread.
+        return await self._arun_script_in_thread(script_content, script_filepath)
+
+    def _start_process(self, script_path: str):
+        if self.pool_size == 0:
+            return super()._start_process(script_path)
+
+        worker = self._idle.get()
+        if not worker.alive():
+            worker.close()
+            worker = _WarmWorker(self.preload_modules)
+
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        try:
+            worker.wait_ready()
+            request = json.dumps({"script": os.path.abspath(script_path), "cwd": os.getcwd()})
+            socket.send_fds(worker.sock, [request.encode("utf-8")], [stdout_w, stderr_w])
+            pid = worker.read_message()["pid"]
+        except (OSError, EOFError, ValueError, KeyError) as e:
+            self.logger.warning(f"Warm worker failed ({e}); running this script in a cold subprocess.")
+            os.close(stdout_r)
+            os.close(stderr_r)
+            worker.broken = True
+            self._release(worker)
+            return super()._start_process(script_path)
+        finally:
+            # The worker has its own copies of the write ends (or the request failed).
+            os.close(stdout_w)
+            os.close(stderr_w)
+
+        stdout = open(stdout_r, "r", encoding="utf-8", errors="replace")
+        stderr = open(stderr_r, "r", encoding="utf-8", errors="replace")
+        return _ForkedProcess(worker, self._release, pid, stdout, stderr)
+
+    def close(self) -> None:
+        """Shuts down idle workers. Workers busy with a script are closed when it finishes."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,105 @@
+"""
+Fork-server worker used by WarmScriptExecutor. Started as a standalone script:
+
+    python warm_worker.py <socket_fd> <module> [<module> ...]
+
+It imports the given modules once, then serves requests on the inherited socket. For each request
+it receives the script path plus the write ends of the caller's stdout/stderr pipes (SCM_RIGHTS),
+forks a child that runs the script as __main__ with those pipes as fd 1 and 2, reports the child's
+pid, waits for it and reports its exit code. Only the standard library is used here.
+"""
+import importlib
+import json
+import os
+import runpy
+import socket
+import sys
+import traceback
+
+
+def _send(sock: socket.socket, message: dict) -> None:
+    sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
+
+
+def _run_child(request: dict, stdout_fd: int, stderr_fd: int) -> None:
+    """Runs in the forked child; never returns."""
+    exit_code = 0
+    script_path = request["script"]
+    try:
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        for fd in (devnull, stdout_fd, stderr_fd):
+            os.close(fd)
+        # Same buffering as `python -u`: every write reaches the pipe immediately.
+        sys.stdin = open(0, "r", closefd=False)
+        sys.stdout = open(1, "w", buffering=1, encoding="utf-8", errors="replace", closefd=False)
+        sys.stderr = open(2, "w", buffering=1, encoding="utf-8", errors="backslashreplace", closefd=False)
+
+        os.chdir(request.get("cwd") or os.getcwd())
+        sys.argv = [script_path]
+        sys.path[0] = os.path.dirname(os.path.abspath(script_path))
+        runpy.run_path(script_path, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException:
+        # Drop the worker/runpy frames so the traceback looks like a plain `python script.py` run.
+        exc_type, exc_value, tb = sys.exc_info()
+        script_tb = tb
+        while script_tb is not None and script_tb.tb_frame.f_code.co_filename != script_path:
+            script_tb = script_tb.tb_next
+        traceback.print_exception(exc_type, exc_value, script_tb or tb)
+        exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+
+def serve(sock: socket.socket) -> None:
+    # The client sends one request at a time and waits for its exit code, so every
+    # recv carries exactly one request line together with its two descriptors.
+    while True:
+        data, fds, _flags, _addr = socket.recv_fds(sock, 65536, 2)
+        if not data:
+            return
+        request = json.loads(data.decode("utf-8"))
+        stdout_fd, stderr_fd = fds
+
+        pid = os.fork()
+        if pid == 0:
+            sock.close()
+            _run_child(request, stdout_fd, stderr_fd)
+        os.close(stdout_fd)
+        os.close(stderr_fd)
+        _send(sock, {"pid": pid})
+        _, status = os.waitpid(pid, 0)
+        _send(sock, {"exit_code": os.waitstatus_to_exitcode(status)})
+
+
+def main() -> None:
+    sock = socket.socket(fileno=int(sys.argv[1]))
+    for module_name in sys.argv[2:]:
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            print(f"warm_worker: could not pre-import {module_name}: {e}", file=sys.stderr)
+    _send(sock, {"ready": True})
+    try:
+        serve(sock)
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import os
+import sys
+import logging
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from nl4netunicorn_llm.src.rag_options import add_rag_arguments, rag_from_args
+from nl4netunicorn_llm.src.rag_service import (RAGService, make_server, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_QUEUE_SIZE,
+                                               DEFAULT_TIMEOUT_S, DEFAULT_WORKERS)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve generation, retrieval and judge requests from one resident NetUnicornRAG')
+    parser.add_argument('--host', dest='host', help='Address to listen on', type=str, default=DEFAULT_HOST)
+    parser.add_argument('--port', dest='port', help='TCP port to listen on', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--socket', dest='socket', help='Listen on this Unix socket path instead of TCP', type=str)
+    parser.add_argument('--workers', dest='workers', help='Requests processed concurrently', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--queue_size', dest='queue_size', help='Requests allowed to wait for a worker; more are rejected with 503', type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument('--timeout', dest='timeout', help='Default per-request timeout in seconds (requests may set timeout_s)', type=float, default=DEFAULT_TIMEOUT_S)
+    add_rag_arguments(parser)
+    args = parser.parse_args()
+
+    rag_system = rag_from_args(args)
+    service = RAGService(rag_system, workers=args.workers, queue_size=args.queue_size, default_timeout_s=args.timeout)
+    service.warm_up()
+    logger.info(rag_system.startup_report())
+    service.start()
+
+    server = make_server(service, host=args.host, port=args.port, unix_socket=args.socket)
+    address = f"unix:{args.socket}" if args.socket else f"http://{args.host}:{server.server_address[1]}"
+    logger.info(f"RAG service listening on {address} ({service.workers} worker(s), queue of {service.queue_size}). "
+                f"Use --server {address} with the command-line tools.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down RAG service...")
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == '__main__':
+    main()